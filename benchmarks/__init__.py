@@ -0,0 +1,4 @@
+"""
+Micro-benchmarks for the Popup Blocker
+Run from the project folder, e.g. python -m benchmarks.bench_matchers
+"""
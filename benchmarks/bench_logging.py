@@ -0,0 +1,114 @@
+"""
+Cost of debug logging on the scan path, with debug mode on and off: a full
+WindowDetector scan of the simulated desktop, and the debug calls alone
+(eager f-strings against lazy %-args)
+"""
+
+import os
+import random
+import tempfile
+import time
+
+from config import Config
+from logger import Logger, DEBUG, INFO
+from matchers import KeywordMatcher
+from runtime import RuntimeContext
+from desktop_simulator import DesktopSimulator
+from window_detector import WindowDetector
+from benchmarks.bench_matchers import SAMPLE_TITLES
+
+
+def make_config(log_dir: str, debug_mode: bool = False) -> Config:
+    """Settings for a scratch log file, with no settings, rule, journal or strategy files"""
+    config = Config()
+    config.log_file = os.path.join(log_dir, 'bench.log')
+    config.debug_mode = debug_mode
+    config.detection_mode = 'poll'
+    config.journal_dir = ''
+    config.config_file = ''
+    config.rules_file = ''
+    config.click_strategy_file = ''
+    return config
+
+
+def make_logger(log_dir: str, debug_mode: bool = False) -> Logger:
+    """A Logger writing to a scratch file, without console output"""
+    logger = Logger(make_config(log_dir, debug_mode))
+    logger.writer.console = False
+    return logger
+
+
+def run_scan(window_count: int = 2000, scans: int = 10) -> dict:
+    """
+    Milliseconds per cold WindowDetector.scan_changes (every window classified,
+    debug messages included) with debug mode off and on. Fastest of scans runs
+    """
+    simulator = DesktopSimulator(window_count=window_count, popup_ratio=0.05, seed=6)
+    results = {}
+    with tempfile.TemporaryDirectory() as log_dir:
+        for debug_mode, name in ((False, 'debug_off'), (True, 'debug_on')):
+            config = make_config(log_dir, debug_mode)
+            logger = Logger(config)
+            logger.writer.console = False
+            context = RuntimeContext(config, logger)
+            best = float('inf')
+            for _ in range(scans):
+                # A new detector and empty caches, so every window is classified again
+                context.classification_cache.clear()
+                detector = WindowDetector(context, simulator)
+                start = time.perf_counter()
+                detector.scan_changes()
+                best = min(best, time.perf_counter() - start)
+            logger.flush()
+            logger.close()
+            results[f'scan_{name}_ms'] = best * 1000
+    return results
+
+
+def _scan(logger: Logger, windows, matcher: KeywordMatcher, lazy: bool) -> float:
+    """
+    One simulated scan: classify every window and emit the same debug
+    messages WindowDetector does. Returns seconds taken
+    """
+    start = time.perf_counter()
+    for hwnd, title, class_name in windows:
+        is_popup = matcher.matches(title)
+        if lazy:
+            logger.debug("Popup detected - Title: '%s', Class: '%s', Dialog: %s, Popup: %s, Size OK: %s",
+                         title, class_name, is_popup, False, True)
+            logger.debug("Found popup candidate: %s (HWND: %s)", title, hwnd)
+        else:
+            logger.debug(f"Popup detected - Title: '{title}', Class: '{class_name}', "
+                         f"Dialog: {is_popup}, Popup: {False}, Size OK: {True}")
+            logger.debug(f"Found popup candidate: {title} (HWND: {hwnd})")
+    return time.perf_counter() - start
+
+
+def run(window_count: int = 500, scans: int = 20) -> dict:
+    """Returns average seconds per scan for each (debug on/off, eager/lazy) combination"""
+    rng = random.Random(1)
+    windows = [(0x10000 + i, rng.choice(SAMPLE_TITLES), '#32770') for i in range(window_count)]
+    matcher = KeywordMatcher(Config().popup_title_keywords)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = make_logger(log_dir)
+        for level, level_name in ((INFO, 'debug_off'), (DEBUG, 'debug_on')):
+            logger.level = level
+            for lazy, style in ((False, 'eager'), (True, 'lazy')):
+                total = sum(_scan(logger, windows, matcher, lazy) for _ in range(scans))
+                results[f'{level_name}_{style}_ms_per_scan'] = total / scans * 1000
+                logger.flush()
+        logger.close()
+    return results
+
+
+def main():
+    results = run_scan()
+    results.update(run())
+    for name, value in results.items():
+        print(f"{name:>32}: {value:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
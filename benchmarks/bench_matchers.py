@@ -0,0 +1,70 @@
+"""
+Per-window cost of title/class keyword matching with small and large rule lists
+"""
+
+import random
+import time
+from typing import List
+
+from config import Config
+from matchers import KeywordMatcher
+
+SAMPLE_TITLES = [
+    'Untitled - Notepad',
+    'Inbox - Outlook',
+    'Confirm Save As',
+    'Windows Security Alert',
+    'Document1 - Word',
+    'แจ้งเตือนการอัปเดต',
+    'Downloads',
+    'Microsoft Edge',
+    'Task Scheduler Library',
+    'Update available - restart now?',
+]
+
+
+def make_keywords(count: int, seed: int = 1) -> List[str]:
+    """The real title keywords padded with random words up to count entries"""
+    rng = random.Random(seed)
+    keywords = list(Config().popup_title_keywords)[:count]
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    while len(keywords) < count:
+        keywords.append(''.join(rng.choice(letters) for _ in range(rng.randint(5, 12))))
+    return keywords
+
+
+def _time_per_window(check, titles: List[str], repeat: int) -> float:
+    """Average seconds per title"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for title in titles:
+            check(title)
+    return (time.perf_counter() - start) / (repeat * len(titles))
+
+
+def run(keyword_counts=(10, 200), repeat: int = 2000) -> dict:
+    """Returns {'<n>_keywords': {'linear_ns': ..., 'matcher_ns': ...}}"""
+    results = {}
+    for count in keyword_counts:
+        keywords = make_keywords(count)
+        matcher = KeywordMatcher(keywords)
+
+        # The old per-window loop from WindowDetector._is_popup_window
+        def linear(title):
+            return any(keyword.lower() in title.lower() for keyword in keywords)
+
+        results[f'{count}_keywords'] = {
+            'linear_ns': _time_per_window(linear, SAMPLE_TITLES, repeat) * 1e9,
+            'matcher_ns': _time_per_window(matcher.matches, SAMPLE_TITLES, repeat) * 1e9,
+        }
+    return results
+
+
+def main():
+    for name, result in run().items():
+        print(f"{name:>14}: linear {result['linear_ns']:8.0f} ns/window | "
+              f"matcher {result['matcher_ns']:8.0f} ns/window")
+
+
+if __name__ == "__main__":
+    main()
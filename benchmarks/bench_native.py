@@ -0,0 +1,76 @@
+"""
+Cost of the ctypes calls in a full window scan: the old per-call style
+(new callback and new buffers every time, prototypes guessed by ctypes)
+against Win32Api (declared prototypes, reused callback and buffers)
+"""
+
+import ctypes
+import ctypes.wintypes
+import time
+
+from benchmarks.fake_user32 import FakeDesktop, FakeUser32, FakeKernel32
+from win32_api import Win32Api, WNDENUMPROC
+
+
+def _legacy_scan(user32) -> int:
+    """Enumerate and read every window the way WindowDetector used to"""
+    seen = []
+
+    def enum_proc(hwnd, lparam):
+        if user32.IsWindowVisible(hwnd):
+            user32.GetWindowLongW(hwnd, -16)
+            rect = ctypes.wintypes.RECT()
+            user32.GetWindowRect(hwnd, ctypes.byref(rect))
+            user32.GetWindowTextLengthW(hwnd)
+            class_buffer = ctypes.create_unicode_buffer(256)
+            user32.GetClassNameW(hwnd, class_buffer, 256)
+            text_buffer = ctypes.create_unicode_buffer(512)
+            user32.GetWindowTextW(hwnd, text_buffer, 512)
+            seen.append((hwnd, text_buffer.value, class_buffer.value))
+        return True
+
+    user32.EnumWindows(WNDENUMPROC(enum_proc), 0)
+    return len(seen)
+
+
+def _api_scan(api: Win32Api) -> int:
+    """Enumerate and read every window through Win32Api"""
+    seen = []
+    for hwnd in api.enum_windows():
+        if api.is_window_visible(hwnd):
+            api.get_window_style(hwnd)
+            api.get_window_rect(hwnd)
+            api.get_window_text_length(hwnd)
+            seen.append((hwnd, api.get_window_text(hwnd), api.get_class_name(hwnd)))
+    return len(seen)
+
+
+def _time(fn, scans: int) -> float:
+    start = time.perf_counter()
+    for _ in range(scans):
+        fn()
+    return (time.perf_counter() - start) / scans
+
+
+def run(window_count: int = 500, scans: int = 50) -> dict:
+    """Returns milliseconds per scan for both call styles"""
+    desktop = FakeDesktop(window_count)
+    legacy_user32 = FakeUser32(desktop)
+    api = Win32Api(FakeUser32(desktop), FakeKernel32())
+
+    legacy = _time(lambda: _legacy_scan(legacy_user32), scans)
+    tuned = _time(lambda: _api_scan(api), scans)
+    return {
+        'legacy_ms_per_scan': legacy * 1000,
+        'win32api_ms_per_scan': tuned * 1000,
+        'speedup': legacy / tuned if tuned else 0.0,
+    }
+
+
+def main():
+    for name, value in run().items():
+        print(f"{name:>24}: {value:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
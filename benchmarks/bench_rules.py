@@ -0,0 +1,95 @@
+"""
+Per-window cost of rule evaluation as the rule set grows: the compiled
+RuleEngine against checking every rule in order
+"""
+
+import random
+import time
+from typing import List, Tuple
+
+from rules import ACTIONS, CLICK_CONTROL, CLICK_NO, CLOSE, IGNORE, Rule, RuleEngine
+
+# (process, class, title) of windows seen on a typical desktop
+SAMPLE_WINDOWS = [
+    ('notepad.exe', 'Notepad', 'Untitled - Notepad'),
+    ('outlook.exe', 'rctrl_renwnd32', 'Inbox - Outlook'),
+    ('winword.exe', '#32770', 'Microsoft Word'),
+    ('setup.exe', '#32770', 'Restart required'),
+    ('msedge.exe', 'Chrome_WidgetWin_1', 'Microsoft Edge'),
+    ('updater.exe', 'PopupWindow', 'Update available'),
+    ('explorer.exe', 'CabinetWClass', 'Downloads'),
+    ('line.exe', 'PopupWindow', 'แจ้งเตือนข้อความใหม่'),
+]
+
+
+# Rules for the sample applications plus a couple of global ones, as a real file would start
+BASE_RULES = [
+    Rule('word', IGNORE, process='winword.exe', title='^Microsoft Word$'),
+    Rule('installer', CLICK_NO, process='setup.exe', title='restart', buttons=['Later']),
+    Rule('updater', CLICK_CONTROL, process='updater.exe', title='update (available|ready)', control_id=2),
+    Rule('toasts', CLOSE, class_name='PopupWindow'),
+    Rule('security', IGNORE, title='security alert'),
+]
+
+
+def make_rules(count: int, seed: int = 1) -> List[Rule]:
+    """BASE_RULES padded with rules for made-up applications up to count entries"""
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    classes = ['#32770', 'PopupWindow', 'Chrome_WidgetWin_1', None]
+    rules = []
+    for rule in BASE_RULES[:count]:
+        rules.append(Rule(rule.name, rule.action, rule.process, rule.class_name, rule.title,
+                          rule.control_id, rule.buttons, order=len(rules)))
+    while len(rules) < count:
+        action = rng.choice(ACTIONS)
+        process = ''.join(rng.choice(letters) for _ in range(8)) + '.exe'
+        title = ''.join(rng.choice(letters) for _ in range(rng.randint(4, 10))) if rng.random() < 0.8 else None
+        rules.append(Rule(f"rule {len(rules)}", action, process=process, class_name=rng.choice(classes),
+                          title=title, control_id=2 if action == CLICK_CONTROL else None, order=len(rules)))
+    return rules
+
+
+def linear_match(rules: List[Rule], window: Tuple[str, str, str]):
+    """First matching rule, checking every rule in turn"""
+    process, class_name, title = (window[0].lower(), window[1].lower(), window[2])
+    for rule in rules:
+        if rule.process is not None and rule.process != process:
+            continue
+        if rule.class_name is not None and rule.class_name != class_name:
+            continue
+        if rule.title_pattern is None or rule.title_pattern.search(title):
+            return rule
+    return None
+
+
+def _time_per_window(check, repeat: int) -> float:
+    """Average seconds per window"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for window in SAMPLE_WINDOWS:
+            check(window)
+    return (time.perf_counter() - start) / (repeat * len(SAMPLE_WINDOWS))
+
+
+def run(rule_counts=(10, 100, 1000), repeat: int = 2000) -> dict:
+    """Returns {'<n>_rules': {'linear_ns': ..., 'engine_ns': ...}}"""
+    results = {}
+    for count in rule_counts:
+        rules = make_rules(count)
+        engine = RuleEngine(rules)
+        results[f'{count}_rules'] = {
+            'linear_ns': _time_per_window(lambda window: linear_match(rules, window), repeat) * 1e9,
+            'engine_ns': _time_per_window(lambda window: engine.evaluate(*window), repeat) * 1e9,
+        }
+    return results
+
+
+def main():
+    for name, result in run().items():
+        print(f"{name:>14}: linear {result['linear_ns']:8.0f} ns/window | "
+              f"engine {result['engine_ns']:8.0f} ns/window")
+
+
+if __name__ == "__main__":
+    main()
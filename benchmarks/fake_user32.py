@@ -0,0 +1,161 @@
+"""
+In-process stand-ins for user32/kernel32 that follow the ctypes calling
+convention (buffers, byref structures, callbacks), so the native-call layer
+can be benchmarked on any platform
+"""
+
+import random
+from typing import Dict, List, Tuple
+
+from benchmarks.bench_matchers import SAMPLE_TITLES
+
+WS_VISIBLE = 0x10000000
+WS_POPUP = 0x80000000
+
+
+def _deref(arg):
+    """The structure behind a ctypes.byref() argument"""
+    return getattr(arg, '_obj', arg)
+
+
+def _export(method):
+    """Wrap a bound method in a plain function so restype/argtypes can be set on it"""
+    def function(*args):
+        return method(*args)
+    function.__name__ = method.__name__
+    return function
+
+
+class FakeDesktop:
+    """A fixed set of top-level windows, each with a couple of button children"""
+
+    def __init__(self, window_count: int = 500, seed: int = 1):
+        rng = random.Random(seed)
+        self.windows: Dict[int, Tuple[str, str, int, Tuple[int, int, int, int], int]] = {}
+        self.children: Dict[int, List[int]] = {}
+        self.order: List[int] = []
+        for i in range(window_count):
+            hwnd = 0x10000 + i * 16
+            popup = rng.random() < 0.1
+            title = rng.choice(SAMPLE_TITLES)
+            class_name = '#32770' if popup else 'Chrome_WidgetWin_1'
+            style = WS_VISIBLE | (WS_POPUP if popup else 0)
+            rect = (100, 100, 100 + rng.randint(150, 900), 100 + rng.randint(80, 700))
+            self.windows[hwnd] = (title, class_name, style, rect, 1000 + i % 40)
+            self.order.append(hwnd)
+            buttons = []
+            for j, text in enumerate(('Yes', 'No')):
+                child = hwnd + 1 + j
+                self.windows[child] = (text, 'Button', WS_VISIBLE, rect, 1000 + i % 40)
+                buttons.append(child)
+            self.children[hwnd] = buttons
+
+
+class FakeUser32:
+    def __init__(self, desktop: FakeDesktop):
+        self.desktop = desktop
+        for name in ('EnumWindows', 'EnumChildWindows', 'GetWindowTextW', 'GetWindowTextLengthW',
+                     'GetClassNameW', 'GetWindowRect', 'GetWindowLongW', 'GetWindowThreadProcessId',
+                     'IsWindow', 'IsWindowVisible', 'IsWindowEnabled', 'IsHungAppWindow',
+                     'GetAncestor', 'GetDlgItem', 'GetDlgCtrlID', 'SendMessageTimeoutW',
+                     'PostMessageW', 'GetCursorPos', 'SetCursorPos', 'mouse_event'):
+            setattr(self, name, _export(getattr(self, '_' + name)))
+
+    def _EnumWindows(self, proc, lparam):
+        for hwnd in self.desktop.order:
+            if not proc(hwnd, lparam):
+                break
+        return 1
+
+    def _EnumChildWindows(self, parent, proc, lparam):
+        for hwnd in self.desktop.children.get(parent, ()):
+            if not proc(hwnd, lparam):
+                break
+        return 1
+
+    def _GetWindowTextW(self, hwnd, buffer, size):
+        text = self.desktop.windows[hwnd][0][:size - 1]
+        buffer.value = text
+        return len(text)
+
+    def _GetWindowTextLengthW(self, hwnd):
+        return len(self.desktop.windows[hwnd][0])
+
+    def _GetClassNameW(self, hwnd, buffer, size):
+        name = self.desktop.windows[hwnd][1][:size - 1]
+        buffer.value = name
+        return len(name)
+
+    def _GetWindowRect(self, hwnd, rect):
+        rect = _deref(rect)
+        rect.left, rect.top, rect.right, rect.bottom = self.desktop.windows[hwnd][3]
+        return 1
+
+    def _GetWindowLongW(self, hwnd, index):
+        return self.desktop.windows[hwnd][2]
+
+    def _GetWindowThreadProcessId(self, hwnd, pid):
+        _deref(pid).value = self.desktop.windows[hwnd][4]
+        return 1
+
+    def _IsWindow(self, hwnd):
+        return int(hwnd in self.desktop.windows)
+
+    def _IsWindowVisible(self, hwnd):
+        return int(hwnd in self.desktop.windows)
+
+    def _IsWindowEnabled(self, hwnd):
+        return 1
+
+    def _IsHungAppWindow(self, hwnd):
+        return 0
+
+    def _GetAncestor(self, hwnd, flags):
+        return hwnd
+
+    def _GetDlgItem(self, hwnd, control_id):
+        return 0
+
+    def _GetDlgCtrlID(self, hwnd):
+        return 0
+
+    def _SendMessageTimeoutW(self, hwnd, msg, wparam, lparam, flags, timeout, result):
+        _deref(result).value = 0
+        return 1
+
+    def _PostMessageW(self, hwnd, msg, wparam, lparam):
+        return 1
+
+    def _GetCursorPos(self, point):
+        point = _deref(point)
+        point.x, point.y = 0, 0
+        return 1
+
+    def _SetCursorPos(self, x, y):
+        return 1
+
+    def _mouse_event(self, flags, dx, dy, data, extra):
+        return None
+
+
+class FakeKernel32:
+    def __init__(self):
+        for name in ('OpenProcess', 'CloseHandle', 'QueryFullProcessImageNameW', 'GetProcessTimes'):
+            setattr(self, name, _export(getattr(self, '_' + name)))
+
+    def _OpenProcess(self, access, inherit, pid):
+        return pid or 0
+
+    def _CloseHandle(self, handle):
+        return 1
+
+    def _QueryFullProcessImageNameW(self, handle, flags, buffer, size):
+        path = f"C:\\Program Files\\App{handle}\\app{handle}.exe"
+        buffer.value = path
+        _deref(size).value = len(path)
+        return 1
+
+    def _GetProcessTimes(self, handle, creation, exit_time, kernel, user):
+        creation = _deref(creation)
+        creation.dwHighDateTime, creation.dwLowDateTime = 0, handle
+        return 1
@@ -0,0 +1,244 @@
+"""
+Benchmark suite: scan, classification, button search, popup handling and logging
+throughput against the simulated desktop, with JSON output and baseline comparison
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --baseline results.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from config import Config
+from logger import Logger
+from runtime import RuntimeContext
+from desktop_simulator import DesktopSimulator, DIALOG
+from window_detector import WindowDetector
+from popup_blocker import PopupBlocker
+from benchmarks import bench_logging, bench_matchers, bench_native, bench_rules
+
+# Metrics ending with these are better when higher; everything else is a duration
+HIGHER_IS_BETTER = ('_per_sec', 'speedup')
+
+
+def make_context(log_dir: str) -> RuntimeContext:
+    """
+    A fresh context (empty caches) logging to a scratch file, without console output
+    and without reading or writing the settings, rules or click strategy files
+    """
+    config = Config()
+    config.log_file = os.path.join(log_dir, 'bench.log')
+    config.debug_mode = False
+    config.detection_mode = 'poll'
+    config.journal_dir = ''
+    config.config_file = ''
+    config.rules_file = ''
+    config.click_strategy_file = ''
+    logger = Logger(config)
+    logger.writer.console = False
+    return RuntimeContext(config, logger)
+
+
+def _best_of(fn: Callable[[], None], repeat: int) -> float:
+    """Fastest of repeat runs, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_scan(log_dir: str, sizes=(100, 1000, 10000), repeat: int = 5) -> Dict[str, float]:
+    """find_popup_windows on a cold detector and on an unchanged desktop"""
+    results = {}
+    for size in sizes:
+        simulator = DesktopSimulator(window_count=size, popup_ratio=0.02, seed=size)
+        context = make_context(log_dir)
+        detector = WindowDetector(context, simulator)
+
+        start = time.perf_counter()
+        detector.find_popup_windows()
+        results[f'scan.{size}.cold_ms'] = (time.perf_counter() - start) * 1000
+        results[f'scan.{size}.warm_ms'] = _best_of(detector.find_popup_windows, repeat) * 1000
+        context.logger.close()
+    return results
+
+
+def bench_classify(log_dir: str, window_count: int = 1000, repeat: int = 10) -> Dict[str, float]:
+    """Per-window cost of _is_popup_window, with and without the classification cache"""
+    simulator = DesktopSimulator(window_count=window_count, popup_ratio=0.05, seed=2)
+    context = make_context(log_dir)
+    detector = WindowDetector(context, simulator)
+    hwnds = simulator.enum_windows()
+
+    def classify_all():
+        for hwnd in hwnds:
+            detector._is_popup_window(hwnd)
+
+    def classify_uncached():
+        context.classification_cache.clear()
+        classify_all()
+
+    results = {
+        'classify.uncached_us': _best_of(classify_uncached, repeat) / len(hwnds) * 1e6,
+        'classify.cached_us': _best_of(classify_all, repeat) / len(hwnds) * 1e6,
+    }
+    context.logger.close()
+    return results
+
+
+def bench_button_search(log_dir: str, child_counts=(2, 50, 500), repeat: int = 200) -> Dict[str, float]:
+    """
+    find_button_by_text on dialogs whose 'No' button comes after many other
+    controls: enumerating the children each time, and from the layout cache
+    """
+    results = {}
+    simulator = DesktopSimulator(window_count=0, seed=3)
+    context = make_context(log_dir)
+    detector = WindowDetector(context, simulator)
+    target_buttons = context.config.target_buttons
+    for count in child_counts:
+        hwnd = simulator.spawn_popup(kind=DIALOG, extra_controls=count - 2)
+
+        def search_uncached():
+            context.layout_cache.invalidate(hwnd)
+            detector.find_button_by_text(hwnd, target_buttons)
+
+        results[f'button_search.{count}_children_us'] = _best_of(search_uncached, repeat) * 1e6
+        results[f'button_search.{count}_children_cached_us'] = _best_of(
+            lambda: detector.find_button_by_text(hwnd, target_buttons), repeat) * 1e6
+    context.logger.close()
+    return results
+
+
+def bench_handle_popup(log_dir: str, popups: int = 5) -> Dict[str, float]:
+    """_handle_popup from detection until the dialog is confirmed gone"""
+    simulator = DesktopSimulator(window_count=200, popup_ratio=0.0, seed=4)
+    context = make_context(log_dir)
+    blocker = PopupBlocker(context, backend=simulator)
+    latencies = []
+    for _ in range(popups):
+        hwnd = simulator.spawn_popup(kind=DIALOG)
+        start = time.perf_counter()
+        blocker._handle_popup(hwnd, simulator.get_window_text(hwnd))
+        latencies.append(time.perf_counter() - start)
+    blocker.dispatcher.shutdown()
+    context.logger.close()
+    latencies.sort()
+    return {
+        'handle_popup.median_ms': latencies[len(latencies) // 2] * 1000,
+        'handle_popup.max_ms': latencies[-1] * 1000,
+    }
+
+
+def bench_logger(log_dir: str, messages: int = 50000) -> Dict[str, float]:
+    """Logger.info throughput including the background writer draining to disk"""
+    context = make_context(log_dir)
+    logger = context.logger
+    start = time.perf_counter()
+    for i in range(messages):
+        logger.info("Detected popup: '%s' (HWND: %s)", 'Confirm Save', 0x10000 + i)
+    logger.flush()
+    seconds = time.perf_counter() - start
+    logger.close()
+    return {'logger.messages_per_sec': messages / seconds}
+
+
+def run(quick: bool = False) -> Dict[str, float]:
+    """Run every benchmark. Returns a flat {metric: value} dict"""
+    results: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as log_dir:
+        results.update(bench_scan(log_dir, sizes=(100, 1000) if quick else (100, 1000, 10000)))
+        results.update(bench_classify(log_dir))
+        results.update(bench_button_search(log_dir))
+        results.update(bench_handle_popup(log_dir, popups=2 if quick else 5))
+        results.update(bench_logger(log_dir, messages=10000 if quick else 50000))
+
+    logging_results = bench_logging.run_scan(window_count=1000 if quick else 2000, scans=3 if quick else 10)
+    logging_results.update(bench_logging.run(scans=5 if quick else 20))
+    for key, value in logging_results.items():
+        results[f'logging.{key}'] = value
+    for name, values in bench_matchers.run(repeat=200 if quick else 2000).items():
+        for key, value in values.items():
+            results[f'matchers.{name}.{key}'] = value
+    for name, values in bench_rules.run(repeat=200 if quick else 2000).items():
+        for key, value in values.items():
+            results[f'rules.{name}.{key}'] = value
+    for key, value in bench_native.run(scans=10 if quick else 50).items():
+        results[f'native.{key}'] = value
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> Dict[str, float]:
+    """
+    Compare results with a baseline
+    Returns {metric: relative change} for metrics that got worse by more than tolerance
+    """
+    regressions = {}
+    for name, value in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        change = (value - old) / old
+        if name.endswith(HIGHER_IS_BETTER):
+            change = -change
+        if change > tolerance:
+            regressions[name] = change
+    return regressions
+
+
+def _load(path: str) -> Dict[str, float]:
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get('results', data)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Popup Blocker benchmark suite")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--baseline', help="compare with results saved by an earlier --output")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown before a metric counts as a regression (default 0.25 = 25%%)")
+    parser.add_argument('--quick', action='store_true', help="smaller sizes, for a fast smoke run")
+    args = parser.parse_args(argv)
+
+    results = run(quick=args.quick)
+    baseline = _load(args.baseline) if args.baseline else {}
+
+    for name, value in results.items():
+        line = f"{name:>44}: {value:12.3f}"
+        if name in baseline:
+            line += f"   (baseline {baseline[name]:12.3f})"
+        print(line)
+
+    if args.output:
+        data = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'quick': args.quick,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for name, change in sorted(regressions.items(), key=lambda item: -item[1]):
+            print(f"REGRESSION {name}: {change * 100:+.1f}% worse than baseline")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Bounded worker pool for click dispatch
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+import threading
+
+
+class ClickDispatcher:
+    """
+    Runs click work on a small thread pool.
+    Each target (normally the process that owns the popup) may only have
+    per_target_limit jobs in flight, so one frozen application can tie up
+    at most that many workers while popups from other processes continue.
+    """
+
+    def __init__(self, max_workers: int = 4, per_target_limit: int = 1):
+        self.max_workers = max(1, max_workers)
+        self.per_target_limit = max(1, per_target_limit)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="click")
+        self.in_flight: Dict[str, int] = {}
+        # Shared with PopupBlocker.stats - target -> number of timed out / hung sends
+        self.timeouts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, target: str, fn: Callable, *args) -> Optional[Future]:
+        """
+        Run fn(*args) on the pool
+        Returns a Future, or None if the target already has its limit of jobs running
+        """
+        with self._lock:
+            if self.in_flight.get(target, 0) >= self.per_target_limit:
+                return None
+            self.in_flight[target] = self.in_flight.get(target, 0) + 1
+
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self._release(target)
+            raise
+        future.add_done_callback(lambda _: self._release(target))
+        return future
+
+    def record_timeout(self, target: str):
+        """Count a send that timed out or was skipped because the target was hung"""
+        with self._lock:
+            self.timeouts[target] = self.timeouts.get(target, 0) + 1
+
+    def busy(self, target: str) -> bool:
+        """Check if the target has no free slots"""
+        with self._lock:
+            return self.in_flight.get(target, 0) >= self.per_target_limit
+
+    def shutdown(self):
+        """Stop accepting work; running jobs finish on their own (sends are time-bounded)"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, target: str):
+        with self._lock:
+            count = self.in_flight.get(target, 0) - 1
+            if count > 0:
+                self.in_flight[target] = count
+            else:
+                self.in_flight.pop(target, None)
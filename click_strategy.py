@@ -0,0 +1,120 @@
+"""
+Learned click methods: which way of pressing a button actually dismisses
+popups of each application, kept across restarts in a small JSON file
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+import json
+import os
+import threading
+
+# Ways of pressing a button
+DIALOG_COMMAND = 'dialog_command'    # WM_COMMAND with the button's ID to the dialog
+SEND_BM_CLICK = 'bm_click'           # BM_CLICK sent to the button
+MOUSE_CLICK = 'mouse'                # real cursor click on the button
+BUTTON_MESSAGES = 'button_messages'  # WM_LBUTTONDOWN/UP sent to the button
+POST_BM_CLICK = 'post_bm_click'      # BM_CLICK posted to the button
+
+# Default order when nothing has been learned yet
+BUTTON_METHODS = (SEND_BM_CLICK, MOUSE_CLICK, BUTTON_MESSAGES, POST_BM_CLICK)
+DIALOG_METHODS = (DIALOG_COMMAND,) + BUTTON_METHODS
+
+
+class ClickStrategyStore:
+    """
+    Success counts per (process, window class) and click method.
+    order() puts the methods that worked for an application first and the
+    ones that keep failing last; methods never tried stay in default order.
+    Used from the click workers and the scanning thread, so access is locked.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 1000):
+        self.path = path
+        self.max_entries = max_entries
+        # "process|class" -> {method: [successes, attempts]}
+        self.entries: Dict[str, Dict[str, List[int]]] = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(process: str, class_name: str) -> str:
+        return f"{process or '?'}|{class_name or '?'}"
+
+    def order(self, process: str, class_name: str, methods: Sequence[str]) -> List[str]:
+        """methods, best first for this application"""
+        with self._lock:
+            stats = self.entries.get(self._key(process, class_name))
+            if not stats:
+                return list(methods)
+            # Laplace-smoothed success rate: an untried method scores 0.5,
+            # above one that keeps failing and below one that has worked
+            scores = {method: (stats[method][0] + 1) / (stats[method][1] + 2) if method in stats else 0.5
+                      for method in methods}
+        return sorted(methods, key=lambda method: -scores[method])
+
+    def record(self, process: str, class_name: str, method: str, success: bool):
+        """Note whether a click made with method dismissed the popup"""
+        key = self._key(process, class_name)
+        with self._lock:
+            stats = self.entries.get(key)
+            if stats is None:
+                if len(self.entries) >= self.max_entries:
+                    # Forget the application with the fewest recorded clicks
+                    smallest = min(self.entries, key=lambda k: sum(s[1] for s in self.entries[k].values()))
+                    del self.entries[smallest]
+                stats = self.entries[key] = {}
+            counts = stats.setdefault(method, [0, 0])
+            counts[0] += 1 if success else 0
+            counts[1] += 1
+            self.dirty = True
+
+    def success_rates(self, process: str, class_name: str) -> Dict[str, Tuple[int, int]]:
+        """{method: (successes, attempts)} for one application"""
+        with self._lock:
+            stats = self.entries.get(self._key(process, class_name), {})
+            return {method: (counts[0], counts[1]) for method, counts in stats.items()}
+
+    def load(self):
+        """
+        Read the store file; a missing file starts empty, one that isn't JSON
+        raises ValueError. Malformed entries are skipped
+        """
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"can't read {self.path}: {e}") from e
+        entries = {}
+        for key, stats in (data.items() if isinstance(data, dict) else ()):
+            if not isinstance(stats, dict):
+                continue
+            methods = {}
+            for method, counts in stats.items():
+                try:
+                    successes, attempts = int(counts[0]), int(counts[1])
+                except (TypeError, ValueError, KeyError, IndexError):
+                    continue
+                if 0 <= successes <= attempts and len(counts) == 2:
+                    methods[method] = [successes, attempts]
+            if methods:
+                entries[key] = methods
+        with self._lock:
+            self.entries = entries
+            self.dirty = False
+
+    def save(self):
+        """Write the store file atomically if anything changed"""
+        if not self.path or not self.dirty:
+            return
+        with self._lock:
+            data = json.dumps(self.entries, ensure_ascii=False, indent=1, sort_keys=True)
+            self.dirty = False
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(temp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -2,13 +2,45 @@
 Configuration settings for the Popup Blocker
 """
 
+import json
 import os
 
+# Settings a settings file can't change: where the files themselves are
+FILE_KEYS = ('config_file', 'rules_file')
+
+# Settings only read at startup - a reloaded settings file can change them,
+# but they take effect after a restart
+RESTART_KEYS = ('detection_mode', 'debug_mode', 'log_file', 'log_max_bytes', 'log_backup_count',
+                'log_batch_size', 'log_flush_interval', 'max_log_entries', 'click_workers',
+                'process_cache_size', 'process_cache_ttl', 'metrics_port', 'profile_mode',
+                'journal_dir', 'journal_segment_bytes', 'journal_max_segments', 'config_reload_interval',
+                'click_strategy_file')
+
+
+class ConfigError(ValueError):
+    """A settings file that can't be used"""
+
+
 class Config:
     def __init__(self):
         # How often to check for popups (in seconds)
         self.check_interval = float(os.getenv('CHECK_INTERVAL', '2.0'))
         
+        # The interval adapts between these limits (in seconds): it drops to the
+        # minimum right after a popup is found and doubles while nothing is found.
+        # Without MAX_CHECK_INTERVAL it never backs off past check_interval, so an
+        # existing CHECK_INTERVAL setting keeps its meaning when polling
+        self.min_check_interval = float(os.getenv('MIN_CHECK_INTERVAL', '0.25'))
+        self.max_check_interval = float(os.getenv('MAX_CHECK_INTERVAL', str(self.check_interval)))
+
+        # Detection mode: 'event' reacts to window events as they happen,
+        # 'poll' scans all windows every check_interval
+        self.detection_mode = os.getenv('DETECTION_MODE', 'event').lower()
+
+        # In event mode, how often to run a full safety-net scan (in seconds)
+        # This catches anything the window events missed
+        self.safety_sweep_interval = float(os.getenv('SAFETY_SWEEP_INTERVAL', '30.0'))
+
         # Button texts to look for - ONLY "No" buttons (no Cancel)
         self.target_buttons = [
             'No',
@@ -58,6 +90,16 @@ class Config:
         # Log file path
         self.log_file = os.getenv('LOG_FILE', 'popup_blocker.log')
         
+        # Rotate the log file when it reaches this size (bytes); older logs
+        # are kept gzip-compressed as <log>.1.gz ... <log>.N.gz
+        self.log_max_bytes = int(os.getenv('LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+        self.log_backup_count = int(os.getenv('LOG_BACKUP_COUNT', '3'))
+        
+        # Log lines are written in batches: when this many are waiting,
+        # or after LOG_FLUSH_INTERVAL_MS milliseconds
+        self.log_batch_size = int(os.getenv('LOG_BATCH_SIZE', '100'))
+        self.log_flush_interval = float(os.getenv('LOG_FLUSH_INTERVAL_MS', '200')) / 1000.0
+        
         # Maximum number of log entries to keep in memory
         self.max_log_entries = int(os.getenv('MAX_LOG_ENTRIES', '1000'))
         
@@ -65,6 +107,28 @@ class Config:
         # This prevents clicking too quickly on legitimate dialogs
         self.click_delay = float(os.getenv('CLICK_DELAY', '0.5'))
         
+        # How long a click message may wait for the target window (in milliseconds)
+        # before giving up - protects against applications that have stopped responding
+        self.click_timeout_ms = int(os.getenv('CLICK_TIMEOUT_MS', '1000'))
+        
+        # Number of worker threads used to send clicks
+        self.click_workers = int(os.getenv('CLICK_WORKERS', '4'))
+        
+        # After a click, how long to keep checking (with growing gaps) for the
+        # popup to close before the click counts as failed (in seconds)
+        self.verify_timeout = float(os.getenv('VERIFY_TIMEOUT', '2.0'))
+        
+        # A popup that survives every attempt is retried after RETRY_BACKOFF seconds,
+        # doubling each time up to RETRY_BACKOFF_MAX; after MAX_DISMISS_FAILURES
+        # failures it is left alone until it closes
+        self.retry_backoff = float(os.getenv('RETRY_BACKOFF', '5.0'))
+        self.retry_backoff_max = float(os.getenv('RETRY_BACKOFF_MAX', '300.0'))
+        self.max_dismiss_failures = int(os.getenv('MAX_DISMISS_FAILURES', '5'))
+        
+        # Which click method dismissed popups of each application, kept across
+        # restarts so the one that works is tried first (empty = don't keep)
+        self.click_strategy_file = os.getenv('CLICK_STRATEGY_FILE', 'click_strategies.json')
+        
         # Process names to ignore (don't click their popups)
         self.ignored_processes = [
             'explorer.exe',
@@ -73,3 +137,78 @@ class Config:
             'dwm.exe',
             'taskmgr.exe',
         ]
+        
+        # Process name cache: how many processes to remember, and how long (in seconds)
+        # before an entry is re-checked against the process creation time
+        self.process_cache_size = int(os.getenv('PROCESS_CACHE_SIZE', '512'))
+        self.process_cache_ttl = float(os.getenv('PROCESS_CACHE_TTL', '300.0'))
+        
+        # Metrics in Prometheus text format: served on http://127.0.0.1:<METRICS_PORT>/metrics
+        # and/or written to METRICS_FILE every METRICS_FILE_INTERVAL seconds (0 / empty = off)
+        self.metrics_port = int(os.getenv('METRICS_PORT', '0'))
+        self.metrics_file = os.getenv('METRICS_FILE', '')
+        self.metrics_file_interval = float(os.getenv('METRICS_FILE_INTERVAL', '15.0'))
+        
+        # Scan profiling (off unless PROFILE is set): 'cycles' profiles the next
+        # PROFILE_CYCLES scans, 'sample' keeps profiling one scan in every PROFILE_EVERY.
+        # Output (.pstats and .collapsed) goes next to the log file
+        self.profile_mode = os.getenv('PROFILE', '').lower()
+        self.profile_cycles = int(os.getenv('PROFILE_CYCLES', '10'))
+        self.profile_every = int(os.getenv('PROFILE_EVERY', '50'))
+        
+        # Event journal (detections, clicks, outcomes) - query it with `python -m journal`.
+        # Empty JOURNAL_DIR turns it off. Only the newest JOURNAL_MAX_SEGMENTS
+        # segments are kept (0 = keep everything)
+        self.journal_dir = os.getenv('JOURNAL_DIR', 'popup_journal')
+        self.journal_segment_bytes = int(os.getenv('JOURNAL_SEGMENT_BYTES', str(4 * 1024 * 1024)))
+        self.journal_max_segments = int(os.getenv('JOURNAL_MAX_SEGMENTS', '25'))
+        
+        # Per-application rules (see popup_rules.example.json). Its "defaults"
+        # section overrides the lists above; a missing file means no rules
+        self.rules_file = os.getenv('RULES_FILE', 'popup_rules.json')
+        
+        # Settings file (JSON, setting name -> value) applied on top of the above.
+        # It and the rule file are checked for changes every CONFIG_RELOAD_INTERVAL
+        # seconds and reloaded without a restart (0 = never)
+        self.config_file = os.getenv('CONFIG_FILE', 'popup_blocker.json')
+        self.config_reload_interval = float(os.getenv('CONFIG_RELOAD_INTERVAL', '2.0'))
+    
+    def read_settings(self, path: str) -> dict:
+        """
+        Read and check a settings file against this config's settings
+        Returns {name: value} without applying it; a missing file gives {}
+        Raises ConfigError for a file that can't be used
+        """
+        if not path or not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ConfigError(f"can't read {path}: {e}") from e
+        if not isinstance(data, dict):
+            raise ConfigError(f"{path} must contain a JSON object")
+        
+        settings = {}
+        for key, value in data.items():
+            if key in FILE_KEYS or key.startswith('_') or not hasattr(self, key):
+                raise ConfigError(f"unknown setting '{key}'")
+            current = getattr(self, key)
+            if isinstance(current, bool):
+                ok = isinstance(value, bool)
+            elif isinstance(current, int):
+                ok = isinstance(value, int) and not isinstance(value, bool) and value >= 0
+            elif isinstance(current, float):
+                ok = isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0
+            elif isinstance(current, str):
+                ok = isinstance(value, str)
+            elif isinstance(current, tuple):
+                ok = isinstance(value, list) and len(value) == len(current) and all(
+                    isinstance(n, int) and not isinstance(n, bool) for n in value)
+                value = tuple(value) if ok else value
+            else:
+                ok = isinstance(value, list) and all(isinstance(item, str) for item in value)
+            if not ok:
+                raise ConfigError(f"setting '{key}' has the wrong type (expected something like {current!r})")
+            settings[key] = float(value) if isinstance(current, float) else value
+        return settings
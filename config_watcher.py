@@ -0,0 +1,110 @@
+"""
+Reloads the settings file and the rule file while the blocker runs
+"""
+
+import os
+import threading
+from time import perf_counter
+from typing import Dict, Optional, Tuple
+
+from config import ConfigError
+from rules import RuleError
+from runtime import ConfigSnapshot, RuntimeContext, load_snapshot
+
+# (mtime in ns, size) of a file, or None if it doesn't exist
+FileStamp = Optional[Tuple[int, int]]
+
+
+class ConfigWatcher:
+    """
+    Watches the settings and rule files from a daemon thread. When one of them
+    changes, a complete new ConfigSnapshot is built on that thread; the scanning
+    thread picks it up with take() between cycles, so a scan never sees a mix
+    of old and new settings. A file that can't be used is rejected and the
+    running config stays as it is.
+    """
+
+    def __init__(self, context: RuntimeContext, interval: float = 2.0):
+        self.context = context
+        self.logger = context.logger
+        self.interval = interval
+        self.paths = [path for path in (context.config.config_file, context.config.rules_file) if path]
+        self._stamps = self._read_stamps()
+        self._pending: Optional[ConfigSnapshot] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.reloads = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+        # How long building the last snapshot took (seconds)
+        self.last_build_seconds = 0.0
+
+    def start(self):
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def check(self) -> bool:
+        """
+        Look for changed files now and build a snapshot if there are any
+        Returns True if a new snapshot is waiting for take()
+        """
+        stamps = self._read_stamps()
+        if stamps == self._stamps:
+            return False
+        self._stamps = stamps
+
+        started = perf_counter()
+        try:
+            snapshot = load_snapshot(self.context.base_config)
+        except (ConfigError, RuleError) as e:
+            self.rejected += 1
+            self.last_error = str(e)
+            self.logger.error(f"Rejected changed settings, keeping the current ones: {e}")
+            return False
+        except Exception as e:
+            self.rejected += 1
+            self.last_error = str(e)
+            self.logger.error(f"Error building new settings, keeping the current ones: {e}")
+            return False
+        self.last_build_seconds = perf_counter() - started
+        self.last_error = None
+
+        with self._lock:
+            self._pending = snapshot
+        return True
+
+    def take(self) -> Optional[ConfigSnapshot]:
+        """The newest snapshot not yet taken, or None"""
+        if self._pending is None:
+            return None
+        with self._lock:
+            snapshot, self._pending = self._pending, None
+        if snapshot is not None:
+            self.reloads += 1
+        return snapshot
+
+    def _read_stamps(self) -> Dict[str, FileStamp]:
+        stamps = {}
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                stamps[path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                stamps[path] = None
+        return stamps
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.debug("Error checking settings files: %s", e)
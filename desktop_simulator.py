@@ -0,0 +1,404 @@
+"""
+In-memory desktop for running the detection and click pipeline without Windows.
+Generates a synthetic set of top-level windows (10 to 10,000+) with a
+configurable share of popups whose buttons react to clicks and messages.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import random
+import sys
+import threading
+import time
+
+from window_backend import WindowBackend
+from window_events import ScriptedEventSource
+
+# Window styles
+WS_VISIBLE = 0x10000000
+WS_POPUP = 0x80000000
+WS_CHILD = 0x40000000
+WS_DLGFRAME = 0x00400000
+
+# Messages the blocker sends
+WM_CLOSE = 0x0010
+WM_COMMAND = 0x0111
+BM_CLICK = 0x00F5
+WM_LBUTTONUP = 0x0202
+MOUSEEVENTF_LEFTUP = 0x0004
+
+IDYES = 6
+IDNO = 7
+GA_PARENT = 1
+
+# Popup kinds
+DIALOG = 'dialog'      # standard dialog: answers WM_COMMAND and button clicks
+CUSTOM = 'custom'      # custom-drawn popup: only its buttons work, no control IDs
+STUBBORN = 'stubborn'  # ignores everything
+
+NORMAL_WINDOWS = [
+    ('Chrome_WidgetWin_1', 'chrome.exe', ['Inbox - Mail', 'Search results', 'Docs - Project plan']),
+    ('Notepad', 'notepad.exe', ['Untitled - Notepad', 'notes.txt - Notepad']),
+    ('CabinetWClass', 'explorer.exe', ['Downloads', 'Documents', 'This PC']),
+    ('XLMAIN', 'excel.exe', ['Budget.xlsx - Excel', 'Report.xlsx - Excel']),
+    ('ConsoleWindowClass', 'cmd.exe', ['Command Prompt', 'Windows PowerShell']),
+]
+
+POPUP_TITLES = [
+    'Update Notification', 'Confirm Save', 'Warning', 'Alert', 'Message from webpage',
+    'Confirm Delete', 'Popup', 'แจ้งเตือน', 'ยืนยัน', 'คำเตือน',
+]
+
+POPUP_PROCESSES = ['setup.exe', 'updater.exe', 'helper.exe', 'agent.exe']
+
+
+class SimWindow:
+    """One simulated window or button"""
+
+    def __init__(self, hwnd: int, title: str, class_name: str, style: int,
+                 rect: Tuple[int, int, int, int], pid: int, parent: int = 0, control_id: int = 0):
+        self.hwnd = hwnd
+        self.title = title
+        self.class_name = class_name
+        self.style = style
+        self.rect = rect
+        self.pid = pid
+        self.parent = parent
+        self.control_id = control_id
+        self.children: List[int] = []
+        self.kind: Optional[str] = None  # popup kind for top-level popups
+        self.hung = False
+        self.enabled = True
+
+
+class DesktopSimulator(WindowBackend):
+    """
+    WindowBackend over a synthetic desktop.
+    popup_ratio is the share of generated windows that are popups; custom_ratio,
+    stubborn_ratio and hung_ratio pick what kind of popup each one is.
+    Safe to use from the click workers.
+    """
+
+    def __init__(self, window_count: int = 500, popup_ratio: float = 0.05,
+                 custom_ratio: float = 0.3, stubborn_ratio: float = 0.0, hung_ratio: float = 0.0,
+                 seed: Optional[int] = None, screen: Tuple[int, int] = (1920, 1080)):
+        self.rng = random.Random(seed)
+        self.custom_ratio = custom_ratio
+        self.stubborn_ratio = stubborn_ratio
+        self.hung_ratio = hung_ratio
+        self.screen = screen
+        self.windows: Dict[int, SimWindow] = {}
+        self.z_order: List[int] = []  # top-level windows, topmost first
+        self.processes: Dict[int, Tuple[int, str]] = {}  # pid -> (creation_time, exe name)
+        self.cursor = (0, 0)
+        self.event_source: Optional[ScriptedEventSource] = None
+        self._next_hwnd = 0x10010
+        self._next_pid = 1000
+        self._lock = threading.RLock()
+
+        # Counters
+        self.popups_created = 0
+        self.answers: Dict[str, int] = {}  # button text -> popups dismissed with it
+        self.messages_received = 0
+
+        for _ in range(window_count):
+            if self.rng.random() < popup_ratio:
+                self.spawn_popup(notify=False)
+            else:
+                self.spawn_window()
+
+    # --- building the desktop ---
+
+    def spawn_window(self, title: Optional[str] = None) -> int:
+        """Add an ordinary application window (too big to be a popup)"""
+        with self._lock:
+            class_name, process, titles = self.rng.choice(NORMAL_WINDOWS)
+            width = self.rng.randint(900, self.screen[0])
+            height = self.rng.randint(650, self.screen[1])
+            left = self.rng.randint(0, self.screen[0] - width)
+            top = self.rng.randint(0, self.screen[1] - height)
+            window = self._add(title or self.rng.choice(titles), class_name, WS_VISIBLE,
+                               (left, top, left + width, top + height), self._pid_for(process))
+            self.z_order.append(window.hwnd)
+            return window.hwnd
+
+    def spawn_popup(self, kind: Optional[str] = None, title: Optional[str] = None,
+                    hung: Optional[bool] = None, notify: bool = True, extra_controls: int = 0) -> int:
+        """
+        Add a popup with Yes/No buttons on top of everything else
+        extra_controls adds that many check boxes ahead of the buttons.
+        The event source (if running) hears about it unless notify is False.
+        """
+        with self._lock:
+            if kind is None:
+                roll = self.rng.random()
+                if roll < self.stubborn_ratio:
+                    kind = STUBBORN
+                elif roll < self.stubborn_ratio + self.custom_ratio:
+                    kind = CUSTOM
+                else:
+                    kind = DIALOG
+            if hung is None:
+                hung = self.rng.random() < self.hung_ratio
+
+            class_name = 'PopupWindow' if kind == CUSTOM else '#32770'
+            style = WS_VISIBLE | WS_POPUP | (WS_DLGFRAME if kind != CUSTOM else 0)
+            left = self.rng.randint(0, self.screen[0] - 320)
+            top = self.rng.randint(0, self.screen[1] - 160)
+            pid = self._pid_for(self.rng.choice(POPUP_PROCESSES))
+            popup = self._add(title or self.rng.choice(POPUP_TITLES), class_name, style,
+                              (left, top, left + 320, top + 160), pid)
+            popup.kind = kind
+            popup.hung = hung
+
+            for i in range(extra_controls):
+                option = self._add(f'Option {i + 1}', 'Button', WS_VISIBLE | WS_CHILD,
+                                   (left + 10, top + 30, left + 110, top + 50), pid,
+                                   parent=popup.hwnd, control_id=1000 + i)
+                popup.children.append(option.hwnd)
+
+            for offset, text, control_id in ((120, 'Yes', IDYES), (220, 'No', IDNO)):
+                button = self._add(text, 'Button', WS_VISIBLE | WS_CHILD,
+                                   (left + offset, top + 110, left + offset + 80, top + 140), pid,
+                                   parent=popup.hwnd, control_id=control_id if kind != CUSTOM else 0)
+                popup.children.append(button.hwnd)
+
+            self.z_order.insert(0, popup.hwnd)
+            self.popups_created += 1
+            source = self.event_source
+
+        if notify and source is not None:
+            source.emit(popup.hwnd)
+        return popup.hwnd
+
+    def close(self, hwnd: int):
+        """Destroy a window and its children"""
+        with self._lock:
+            window = self.windows.pop(hwnd, None)
+            if window is None:
+                return
+            for child in window.children:
+                self.windows.pop(child, None)
+            if hwnd in self.z_order:
+                self.z_order.remove(hwnd)
+            source = self.event_source
+
+        if source is not None:
+            source.emit(hwnd)
+
+    def open_popups(self) -> List[int]:
+        """Top-level popups that are still on screen"""
+        with self._lock:
+            return [hwnd for hwnd in self.z_order if self.windows[hwnd].kind is not None]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                'windows': len(self.z_order),
+                'popups_created': self.popups_created,
+                'popups_open': sum(1 for hwnd in self.z_order if self.windows[hwnd].kind is not None),
+                'answers': dict(self.answers),
+                'messages_received': self.messages_received,
+            }
+
+    def _add(self, title: str, class_name: str, style: int, rect: Tuple[int, int, int, int],
+             pid: int, parent: int = 0, control_id: int = 0) -> SimWindow:
+        hwnd = self._next_hwnd
+        self._next_hwnd += 4
+        window = SimWindow(hwnd, title, class_name, style, rect, pid, parent, control_id)
+        self.windows[hwnd] = window
+        return window
+
+    def _pid_for(self, process: str) -> int:
+        # A handful of PIDs per executable, like several instances running
+        for pid, (_, name) in self.processes.items():
+            if name == process and self.rng.random() < 0.8:
+                return pid
+        pid = self._next_pid
+        self._next_pid += 4
+        self.processes[pid] = (pid * 10_000, process)
+        return pid
+
+    # --- reacting to input ---
+
+    def _dismiss(self, popup: SimWindow, answer: str) -> bool:
+        if popup.kind == STUBBORN:
+            return False
+        self.answers[answer] = self.answers.get(answer, 0) + 1
+        self.close(popup.hwnd)
+        return True
+
+    def _deliver(self, hwnd: int, msg: int, wparam: int) -> bool:
+        """Apply a message to a window. Returns False if it was ignored"""
+        with self._lock:
+            window = self.windows.get(hwnd)
+            if window is None:
+                return False
+            self.messages_received += 1
+            if msg == WM_COMMAND and window.kind == DIALOG:
+                for child in window.children:
+                    button = self.windows[child]
+                    if button.control_id == (wparam & 0xFFFF):
+                        return self._dismiss(window, button.title)
+            elif msg in (BM_CLICK, WM_LBUTTONUP) and window.parent:
+                return self._dismiss(self.windows[window.parent], window.title)
+            elif msg == WM_CLOSE and window.kind is not None:
+                return self._dismiss(window, 'close')
+            return False
+
+    def _root(self, hwnd: int) -> Optional[SimWindow]:
+        window = self.windows.get(hwnd)
+        while window is not None and window.parent:
+            window = self.windows.get(window.parent)
+        return window
+
+    def _window_at(self, x: int, y: int) -> Optional[int]:
+        """Topmost window (child first) under a screen point"""
+        for hwnd in self.z_order:
+            window = self.windows[hwnd]
+            left, top, right, bottom = window.rect
+            if left <= x < right and top <= y < bottom:
+                for child in window.children:
+                    left, top, right, bottom = self.windows[child].rect
+                    if left <= x < right and top <= y < bottom:
+                        return child
+                return hwnd
+        return None
+
+    # --- WindowBackend ---
+
+    def enum_windows(self) -> List[int]:
+        with self._lock:
+            return list(self.z_order)
+
+    def enum_child_windows(self, parent_hwnd: int) -> List[int]:
+        with self._lock:
+            window = self.windows.get(parent_hwnd)
+            return list(window.children) if window is not None else []
+
+    def get_window_text(self, hwnd: int) -> str:
+        window = self.windows.get(hwnd)
+        return window.title if window is not None else ""
+
+    def get_window_text_length(self, hwnd: int) -> int:
+        return len(self.get_window_text(hwnd))
+
+    def get_class_name(self, hwnd: int) -> str:
+        window = self.windows.get(hwnd)
+        return window.class_name if window is not None else ""
+
+    def get_window_rect(self, hwnd: int) -> Optional[Tuple[int, int, int, int]]:
+        window = self.windows.get(hwnd)
+        return window.rect if window is not None else None
+
+    def get_window_style(self, hwnd: int) -> int:
+        window = self.windows.get(hwnd)
+        return window.style if window is not None else 0
+
+    def get_window_pid(self, hwnd: int) -> int:
+        window = self.windows.get(hwnd)
+        return window.pid if window is not None else 0
+
+    def is_window(self, hwnd: int) -> bool:
+        return hwnd in self.windows
+
+    def is_window_visible(self, hwnd: int) -> bool:
+        window = self.windows.get(hwnd)
+        return window is not None and bool(window.style & WS_VISIBLE)
+
+    def is_window_enabled(self, hwnd: int) -> bool:
+        window = self.windows.get(hwnd)
+        return window is not None and window.enabled
+
+    def is_hung(self, hwnd: int) -> bool:
+        root = self._root(hwnd)
+        return root is not None and root.hung
+
+    def get_ancestor(self, hwnd: int, flags: int) -> Optional[int]:
+        with self._lock:
+            window = self.windows.get(hwnd)
+            if window is None:
+                return None
+            if flags == GA_PARENT:
+                return window.parent or None
+            root = self._root(hwnd)
+            return root.hwnd if root is not None else None
+
+    def get_dlg_item(self, hwnd: int, control_id: int) -> Optional[int]:
+        with self._lock:
+            window = self.windows.get(hwnd)
+            if window is None or not control_id:
+                return None
+            for child in window.children:
+                if self.windows[child].control_id == control_id:
+                    return child
+            return None
+
+    def get_dlg_ctrl_id(self, hwnd: int) -> int:
+        window = self.windows.get(hwnd)
+        return window.control_id if window is not None else 0
+
+    def send_message_timeout(self, hwnd: int, msg: int, wparam: int, lparam: int,
+                             flags: int, timeout_ms: int) -> Optional[int]:
+        if hwnd not in self.windows or self.is_hung(hwnd):
+            return None
+        self._deliver(hwnd, msg, wparam)
+        return 0
+
+    def post_message(self, hwnd: int, msg: int, wparam: int, lparam: int) -> bool:
+        if hwnd not in self.windows:
+            return False
+        if not self.is_hung(hwnd):  # a hung window never gets round to its queue
+            self._deliver(hwnd, msg, wparam)
+        return True
+
+    def get_cursor_pos(self) -> Tuple[int, int]:
+        return self.cursor
+
+    def set_cursor_pos(self, x: int, y: int):
+        self.cursor = (x, y)
+
+    def mouse_event(self, flags: int):
+        if not flags & MOUSEEVENTF_LEFTUP:
+            return
+        with self._lock:
+            hwnd = self._window_at(*self.cursor)
+            if hwnd is not None and not self.is_hung(hwnd):
+                self._deliver(hwnd, WM_LBUTTONUP, 0)
+
+    def query_process(self, pid: int, known_creation_time: Optional[int] = None) -> Optional[Tuple[int, Optional[str]]]:
+        process = self.processes.get(pid)
+        if process is None:
+            return None
+        creation_time, name = process
+        if known_creation_time is not None and creation_time == known_creation_time:
+            return creation_time, None
+        return creation_time, f"C:\\Program Files\\Simulated\\{name}"
+
+    def create_event_source(self):
+        if self.event_source is None:
+            self.event_source = ScriptedEventSource()
+        return self.event_source
+
+
+def main():
+    """Run the blocker against a simulated desktop until every popup is handled"""
+    from popup_blocker import PopupBlocker
+
+    window_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    simulator = DesktopSimulator(window_count=window_count, popup_ratio=0.02, seed=1)
+    print(f"Simulated desktop: {simulator.get_stats()}")
+
+    blocker = PopupBlocker(backend=simulator)
+    blocker.start_event_source()
+    start = time.perf_counter()
+    deadline = start + 30
+    while simulator.open_popups() and time.perf_counter() < deadline:
+        blocker.run_cycle()
+    elapsed = time.perf_counter() - start
+    blocker.stop()
+
+    print(f"Finished in {elapsed:.2f}s: {simulator.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Caches used by the window detector to avoid re-querying windows that haven't changed
+"""
+
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import threading
+import time
+
+# (style, title length, (left, top, right, bottom) or None)
+Fingerprint = Tuple[int, int, Optional[Tuple[int, int, int, int]]]
+
+# (hwnd, class name, normalized text, control ID) of a child control
+ChildControl = Tuple[int, str, str, int]
+
+
+def normalize_control_text(text: str) -> str:
+    """'&No ' -> 'no': mnemonic markers and surrounding space removed, lowercased"""
+    return text.replace('&', '').strip().lower()
+
+
+class ClassificationCache:
+    """
+    Popup verdicts keyed by HWND.
+    Each entry remembers a cheap fingerprint of the window; if the fingerprint
+    changes the entry is thrown away and the window is classified again.
+    """
+
+    def __init__(self):
+        # hwnd -> (fingerprint, is_popup, window_title)
+        self.entries: Dict[int, Tuple[Fingerprint, bool, str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, hwnd: int, fingerprint: Fingerprint) -> Optional[Tuple[bool, str]]:
+        """
+        Look up a cached verdict
+        Returns (is_popup, window_title) or None if not cached / stale
+        """
+        entry = self.entries.get(hwnd)
+        if entry is not None:
+            if entry[0] == fingerprint:
+                self.hits += 1
+                return entry[1], entry[2]
+            # Window changed since it was classified
+            del self.entries[hwnd]
+            self.evictions += 1
+        self.misses += 1
+        return None
+
+    def put(self, hwnd: int, fingerprint: Fingerprint, is_popup: bool, window_title: str):
+        """Store a verdict"""
+        self.entries[hwnd] = (fingerprint, is_popup, window_title)
+
+    def invalidate(self, hwnd: int):
+        """Forget a single window"""
+        if self.entries.pop(hwnd, None) is not None:
+            self.evictions += 1
+
+    def retain(self, live_hwnds: Iterable[int]):
+        """Drop every entry whose window was not seen in the latest full scan"""
+        live = live_hwnds if isinstance(live_hwnds, (set, frozenset)) else set(live_hwnds)
+        stale = [hwnd for hwnd in self.entries if hwnd not in live]
+        for hwnd in stale:
+            del self.entries[hwnd]
+        self.evictions += len(stale)
+
+    def clear(self):
+        """Forget everything (counters are kept)"""
+        self.entries.clear()
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters for diagnostics"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+class ControlLayout:
+    """Child controls of one dialog, plus the button lookups already answered from them"""
+
+    def __init__(self, controls: List[ChildControl]):
+        self.controls = controls
+        # tuple(target texts) -> matching button HWND (misses aren't kept: the button may appear later)
+        self.matches: Dict[Tuple[str, ...], int] = {}
+        # Set once the layout has been served from the cache - it may be missing newer controls
+        self.from_cache = False
+
+
+class ControlLayoutCache:
+    """
+    Child controls of dialogs, read with one enumeration per dialog and
+    reused by every button lookup and post-click check while the dialog's
+    fingerprint stays the same. Entries go when the dialog changes or
+    closes. Used from the click worker threads, so access is locked.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        # hwnd -> (fingerprint, layout)
+        self.entries: "OrderedDict[int, Tuple[Fingerprint, ControlLayout]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, hwnd: int, fingerprint: Fingerprint) -> Optional[ControlLayout]:
+        """The cached layout, or None if there is none or the dialog has changed"""
+        with self._lock:
+            entry = self.entries.get(hwnd)
+            if entry is not None:
+                if entry[0] == fingerprint:
+                    self.entries.move_to_end(hwnd)
+                    self.hits += 1
+                    return entry[1]
+                del self.entries[hwnd]
+            self.misses += 1
+            return None
+
+    def put(self, hwnd: int, fingerprint: Fingerprint, layout: ControlLayout):
+        with self._lock:
+            self.entries[hwnd] = (fingerprint, layout)
+            self.entries.move_to_end(hwnd)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, hwnd: int):
+        """Forget a dialog (closed, or its controls are known to have changed)"""
+        with self._lock:
+            self.entries.pop(hwnd, None)
+
+    def retain(self, live_hwnds: Iterable[int]):
+        """Drop layouts of dialogs that were not seen in the latest full scan"""
+        with self._lock:
+            if not self.entries:
+                return
+            live = live_hwnds if isinstance(live_hwnds, (set, frozenset, dict)) else set(live_hwnds)
+            for hwnd in [hwnd for hwnd in self.entries if hwnd not in live]:
+                del self.entries[hwnd]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class WindowDelta:
+    """
+    What changed on the desktop between two scans.
+    added/removed/changed are HWNDs of visible top-level windows; the popup
+    lists are filled in by the detector after the added/changed windows
+    have been classified.
+    """
+
+    def __init__(self, added: List[int], removed: List[int], changed: List[int]):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        # (hwnd, window_title) of windows that just became popups
+        self.new_popups: List[Tuple[int, str]] = []
+        # (hwnd, window_title) of known popups whose fingerprint changed
+        self.updated_popups: List[Tuple[int, str]] = []
+        # HWNDs of popups that closed, were hidden or stopped looking like popups
+        self.closed_popups: List[int] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def __repr__(self):
+        return (f"WindowDelta(added={len(self.added)}, removed={len(self.removed)}, "
+                f"changed={len(self.changed)}, new_popups={len(self.new_popups)})")
+
+
+class WindowSnapshot:
+    """Fingerprints of the visible top-level windows seen by the last scan"""
+
+    def __init__(self):
+        self.fingerprints: Dict[int, Fingerprint] = {}
+
+    def update(self, current: Dict[int, Fingerprint]) -> WindowDelta:
+        """Replace the snapshot with the latest scan and return what changed"""
+        previous = self.fingerprints
+        added = []
+        changed = []
+        for hwnd, fingerprint in current.items():
+            old = previous.get(hwnd)
+            if old is None:
+                added.append(hwnd)
+            elif old != fingerprint:
+                changed.append(hwnd)
+        removed = [hwnd for hwnd in previous if hwnd not in current]
+        self.fingerprints = current
+        return WindowDelta(added, removed, changed)
+
+    def record(self, hwnd: int, fingerprint: Optional[Fingerprint]):
+        """Update a single window outside a full scan (None = no longer visible)"""
+        if fingerprint is None:
+            self.fingerprints.pop(hwnd, None)
+        else:
+            self.fingerprints[hwnd] = fingerprint
+
+    def __contains__(self, hwnd: int) -> bool:
+        return hwnd in self.fingerprints
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+
+class ProcessNameCache:
+    """
+    Bounded LRU cache of pid -> process image name with a time-to-live.
+    Entries also remember the process creation time so a reused PID can be
+    detected when an expired entry is revalidated.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        # pid -> (creation_time, process_name, expires_at)
+        self.entries: "OrderedDict[int, Tuple[int, str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def get(self, pid: int) -> Optional[str]:
+        """Return the cached name if the entry is still fresh"""
+        entry = self.entries.get(pid)
+        if entry is not None and entry[2] > self.clock():
+            self.entries.move_to_end(pid)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def creation_time(self, pid: int) -> Optional[int]:
+        """Creation time stored for a PID (even if the entry has expired), or None"""
+        entry = self.entries.get(pid)
+        return entry[0] if entry is not None else None
+
+    def revalidate(self, pid: int, creation_time: int) -> Optional[str]:
+        """
+        Renew an expired entry if the process is still the same one
+        Returns the cached name, or None if the PID now belongs to another process
+        """
+        entry = self.entries.get(pid)
+        if entry is None:
+            return None
+        if entry[0] != creation_time:
+            # PID was reused by a different process
+            del self.entries[pid]
+            self.evictions += 1
+            return None
+        self.entries[pid] = (creation_time, entry[1], self.clock() + self.ttl)
+        self.entries.move_to_end(pid)
+        self.revalidations += 1
+        return entry[1]
+
+    def put(self, pid: int, creation_time: int, process_name: str):
+        """Store a process name, evicting the least recently used entry when full"""
+        self.entries[pid] = (creation_time, process_name, self.clock() + self.ttl)
+        self.entries.move_to_end(pid)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Forget everything (counters are kept)"""
+        self.entries.clear()
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters for diagnostics"""
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidations': self.revalidations,
+            'evictions': self.evictions,
+        }
@@ -8,14 +8,9 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import threading
 import time
-import sys
 import os
 from datetime import datetime
 
-# Import our existing modules
-from config import Config
-from logger import Logger
-
 # Only import Windows-specific modules when on Windows
 try:
     import ctypes
@@ -215,6 +210,14 @@ class PopupBlockerGUI:
                                          variable=self.prevent_lock_var)
         prevent_lock_cb.pack(anchor=tk.W)
         
+        # เช็คบ็อกซ์โปรไฟล์การสแกน (ใช้ตรวจสอบเมื่อโปรแกรมใช้ CPU มาก)
+        self.profile_var = tk.BooleanVar(value=False)
+        profile_cb = ttk.Checkbutton(settings_frame,
+                                     text="โปรไฟล์การสแกน (บันทึกไฟล์ไว้ข้างไฟล์ log)",
+                                     variable=self.profile_var,
+                                     command=self.toggle_profiling)
+        profile_cb.pack(anchor=tk.W)
+        
         # กรอบสถิติ
         stats_frame = ttk.LabelFrame(self.root, text="สถิติการทำงาน", padding="10")
         stats_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -250,11 +253,22 @@ class PopupBlockerGUI:
         self.log_text.insert(tk.END, log_entry)
         self.log_text.see(tk.END)  # เลื่อนไปข้อความล่าสุด
         
+    def add_blocker_logs(self, entries):
+        """เพิ่ม log จาก Popup Blocker (มี timestamp อยู่แล้ว)"""
+        self.log_text.insert(tk.END, "\n".join(entries) + "\n")
+        self.log_text.see(tk.END)
+        
     def clear_log(self):
         """ล้าง log"""
         self.log_text.delete(1.0, tk.END)
         self.add_log("ล้าง log แล้ว")
         
+    def toggle_profiling(self):
+        """เปิด/ปิดการโปรไฟล์การสแกน"""
+        if self.blocker:
+            self.blocker.set_profiling(self.profile_var.get())
+            self.add_log("📈 เปิดการโปรไฟล์การสแกน" if self.profile_var.get() else "📈 ปิดการโปรไฟล์การสแกน")
+        
     def start_blocker(self):
         """เริ่มโปรแกรม Popup Blocker"""
         if not WINDOWS_AVAILABLE:
@@ -263,10 +277,16 @@ class PopupBlockerGUI:
             
         if self.is_running:
             return
+        
+        # รอบก่อนยังปิดตัวไม่เสร็จ
+        if self.blocker_thread and self.blocker_thread.is_alive():
+            return
             
         try:
             # เริ่ม Popup Blocker
             self.blocker = PopupBlocker()
+            if self.profile_var.get():
+                self.blocker.set_profiling(True)
             self.blocker_thread = threading.Thread(target=self._run_blocker, daemon=True)
             self.blocker_thread.start()
             
@@ -296,48 +316,73 @@ class PopupBlockerGUI:
             return
             
         try:
-            # หยุด Popup Blocker
+            # หยุด Popup Blocker: แค่บอกให้หยุดและปลุกเธรดสแกน - blocker.stop() ถูกเรียก
+            # บนเธรดสแกนเมื่อรอบปัจจุบันจบ จึงไม่ชนกับการสแกนหรือการโปรไฟล์ที่กำลังทำอยู่
             self.is_running = False
             if self.blocker:
-                self.blocker.stop()
+                self.blocker.running = False
+                self.blocker.candidates.wake()
                 
             # หยุดป้องกันการล็อคหน้าจอ
             self.mouse_mover.stop()
             
-            # อัพเดตสถานะ
-            self.status_var.set("🔴 หยุดทำงานแล้ว")
-            self.start_button.config(state=tk.NORMAL)
+            # อัพเดตสถานะ (ปุ่มเริ่มจะกดได้อีกครั้งเมื่อปิดตัวเสร็จ)
+            self.status_var.set("🟡 กำลังหยุด...")
             self.stop_button.config(state=tk.DISABLED)
-            
-            self.add_log("⏹️ หยุดโปรแกรมแล้ว")
-            
-            # แสดงสถิติสุดท้าย
-            if self.blocker:
-                stats = self.blocker.stats
-                self.update_stats_display(stats)
                 
         except Exception as e:
             self.add_log(f"❌ ข้อผิดพลาดในการหยุดโปรแกรม: {e}")
     
+    def _on_blocker_stopped(self, stats):
+        """เรียกเมื่อเธรดสแกนปิด blocker เสร็จแล้ว"""
+        self.status_var.set("🔴 หยุดทำงานแล้ว")
+        self.start_button.config(state=tk.NORMAL)
+        self.stop_button.config(state=tk.DISABLED)
+        self.add_log("⏹️ หยุดโปรแกรมแล้ว")
+        
+        # แสดงสถิติสุดท้าย
+        self.update_stats_display(stats)
+    
     def _run_blocker(self):
         """รัน Popup Blocker ในเธรดแยก"""
+        blocker = self.blocker
         try:
-            while self.is_running and self.blocker:
-                # ตรวจสอบ popup
-                self.blocker._check_for_popups()
+            # เริ่มอ่าน log จากตำแหน่งปัจจุบัน (log ของรอบก่อนแสดงไปแล้ว)
+            log_cursor = blocker.logger.log_buffer.next_seq
+            blocker.start_metrics()
+            blocker.start_event_source()
+            blocker.config_watcher.start()
+            blocker.running = True
+            while self.is_running and blocker.running:
+                # ตรวจสอบ popup (สแกนเต็มเมื่อถึงเวลา แล้วรอ event ของหน้าต่าง)
+                blocker.run_cycle()
                 
                 # อัพเดตสถิติ
-                self.root.after(0, self.update_stats_display, self.blocker.stats.copy())
+                self.root.after(0, self.update_stats_display, blocker.stats.copy())
                 
-                # รอตามการตั้งค่า
-                time.sleep(self.blocker.config.check_interval)
+                # ดึงเฉพาะ log ใหม่ตั้งแต่รอบก่อน (ไม่ต้องคัดลอกทั้งหมด)
+                new_logs, log_cursor = blocker.logger.get_logs_since(log_cursor, limit=200)
+                if new_logs:
+                    self.root.after(0, self.add_blocker_logs, new_logs)
                 
         except Exception as e:
             self.root.after(0, self.add_log, f"❌ ข้อผิดพลาดในการทำงาน: {e}")
+        finally:
+            # ปิด blocker บนเธรดนี้ หลังรอบสุดท้ายจบแล้ว
+            try:
+                blocker.stop()
+            except Exception as e:
+                blocker.logger.error(f"Error stopping blocker: {e}")
+            try:
+                self.root.after(0, self._on_blocker_stopped, blocker.stats.copy())
+            except Exception:
+                pass  # หน้าต่างถูกปิดไปแล้ว
     
     def update_stats_display(self, stats):
         """อัพเดตการแสดงสถิติ"""
         stats_text = f"Popup ที่พบ: {stats['popups_detected']} | กดปุ่มแล้ว: {stats['buttons_clicked']} | ข้อผิดพลาด: {stats['errors']}"
+        if 'scan_interval' in stats:
+            stats_text += f" | รอบสแกน: {stats['scan_interval']:.2f}s"
         self.stats_text.config(text=stats_text)
     
     def on_closing(self):
@@ -345,9 +390,11 @@ class PopupBlockerGUI:
         if self.is_running:
             self.stop_blocker()
         
-        # รอให้เธรดจบ
-        if self.blocker_thread and self.blocker_thread.is_alive():
-            self.blocker_thread.join(timeout=2)
+        # รอให้เธรดจบ (ระหว่างรอต้องประมวลผล event ด้วย เพราะเธรดสแกนเรียก root.after)
+        deadline = time.monotonic() + 2
+        while self.blocker_thread and self.blocker_thread.is_alive() and time.monotonic() < deadline:
+            self.root.update()
+            self.blocker_thread.join(timeout=0.05)
             
         self.root.destroy()
     
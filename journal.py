@@ -0,0 +1,358 @@
+"""
+Append-only event journal (detections, click attempts, outcomes) stored as
+JSONL segments with a small per-segment index, plus a query CLI:
+
+    python -m journal top-processes --days 7 --limit 20
+    python -m journal events --since 2026-10-01 --process setup.exe --type outcome
+    python -m journal summary --days 30
+"""
+
+from bisect import bisect_right
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import atexit
+import json
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+
+# Event types
+DETECTED = 'detected'
+CLICK = 'click'
+OUTCOME = 'outcome'
+
+SEGMENT_PATTERN = re.compile(r'^segment-(\d{6})\.jsonl$')
+# One (timestamp, byte offset) index point per this many records
+INDEX_STRIDE = 256
+
+
+def _segment_name(number: int) -> str:
+    return f"segment-{number:06d}.jsonl"
+
+
+class SegmentIndex:
+    """
+    Summary of one segment: time range, record count, detections per process
+    and sparse (timestamp, offset) points for seeking by time
+    """
+
+    def __init__(self, first: float = 0.0, last: float = 0.0, count: int = 0,
+                 processes: Optional[Dict[str, int]] = None,
+                 offsets: Optional[List[Tuple[float, int]]] = None):
+        self.first = first
+        self.last = last
+        self.count = count
+        self.processes = processes or {}
+        self.offsets = offsets or []
+
+    def add(self, record: dict, offset: int):
+        ts = record['t']
+        if not self.count:
+            self.first = ts
+        self.last = ts
+        if self.count % INDEX_STRIDE == 0:
+            self.offsets.append((ts, offset))
+        self.count += 1
+        if record.get('e') == DETECTED:
+            process = record.get('p') or ''
+            self.processes[process] = self.processes.get(process, 0) + 1
+
+    def offset_for(self, since: float) -> int:
+        """Byte offset to start reading at to see every record with t >= since"""
+        position = bisect_right([ts for ts, _ in self.offsets], since) - 1
+        return self.offsets[position][1] if position >= 0 else 0
+
+    def to_dict(self) -> dict:
+        return {'first': self.first, 'last': self.last, 'count': self.count,
+                'processes': self.processes, 'offsets': self.offsets}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SegmentIndex':
+        return cls(data['first'], data['last'], data['count'], data['processes'],
+                   [tuple(point) for point in data['offsets']])
+
+
+class EventJournal:
+    """
+    Writes events to <directory>/segment-NNNNNN.jsonl. When a segment reaches
+    segment_max_bytes it is sealed: its index is saved as segment-NNNNNN.idx
+    and a new segment is started. Only the newest max_segments segments
+    (0 = all) are kept. Safe to call from several threads.
+    """
+
+    def __init__(self, directory: str, segment_max_bytes: int = 4 * 1024 * 1024,
+                 max_segments: int = 0):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_segments = max_segments
+        self.file = None
+        self.index = SegmentIndex()
+        self.segment_number = 0
+        self.records_written = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        numbers = _segment_numbers(directory)
+        # Always start a fresh segment so a torn last line from a crash stays isolated
+        self._open(numbers[-1] + 1 if numbers else 1)
+        atexit.register(self.close)
+
+    def record(self, event: str, **fields):
+        """Append one event; fields with None values are left out"""
+        record = {'t': round(time.time(), 3), 'e': event}
+        record.update((key, value) for key, value in fields.items() if value is not None)
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+        with self._lock:
+            if self.file is None:
+                return
+            offset = self.file.tell()
+            self.file.write(line)
+            self.index.add(record, offset)
+            self.records_written += 1
+            if offset + len(line) >= self.segment_max_bytes:
+                self._seal()
+                self._open(self.segment_number + 1)
+
+    def flush(self):
+        with self._lock:
+            if self.file is not None:
+                self.file.flush()
+
+    def close(self):
+        with self._lock:
+            if self.file is not None:
+                self._seal()
+
+    def _open(self, number: int):
+        self.segment_number = number
+        self.file = open(os.path.join(self.directory, _segment_name(number)), 'ab')
+        self.index = SegmentIndex()
+        if self.max_segments > 0:
+            self._prune()
+
+    def _prune(self):
+        """Delete the oldest segments (and their indexes) beyond max_segments"""
+        for old in _segment_numbers(self.directory)[:-self.max_segments]:
+            for path in (os.path.join(self.directory, _segment_name(old)), _index_path(self.directory, old)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _seal(self):
+        self.file.close()
+        self.file = None
+        if self.index.count:
+            _write_index(self.directory, self.segment_number, self.index)
+        else:
+            # Nothing was written - don't leave empty segments behind
+            try:
+                os.remove(os.path.join(self.directory, _segment_name(self.segment_number)))
+            except OSError:
+                pass
+
+
+def _segment_numbers(directory: str) -> List[int]:
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    return sorted(int(m.group(1)) for m in map(SEGMENT_PATTERN.match, names) if m)
+
+
+def _index_path(directory: str, number: int) -> str:
+    return os.path.join(directory, f"segment-{number:06d}.idx")
+
+
+def _write_index(directory: str, number: int, index: SegmentIndex):
+    path = _index_path(directory, number)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(index.to_dict(), f, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+
+
+def _iter_lines(path: str, start: int = 0) -> Iterator[bytes]:
+    """Lines of a segment from a byte offset, read through a memory map"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size <= start:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            mm.seek(start)
+            for line in iter(mm.readline, b''):
+                yield line
+
+
+class JournalReader:
+    """Queries over a journal directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def segments(self) -> List[Tuple[str, SegmentIndex]]:
+        """(segment path, index) for every segment; unsealed segments are indexed on the fly"""
+        result = []
+        for number in _segment_numbers(self.directory):
+            path = os.path.join(self.directory, _segment_name(number))
+            index = None
+            try:
+                with open(_index_path(self.directory, number), 'r', encoding='utf-8') as f:
+                    index = SegmentIndex.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError):
+                index = self._build_index(path)
+            result.append((path, index))
+        return result
+
+    def events(self, since: float = 0.0, until: Optional[float] = None, event: Optional[str] = None,
+               process: Optional[str] = None) -> Iterator[dict]:
+        """Matching records in time order"""
+        needle = f'"e":"{event}"'.encode('utf-8') if event else None
+        for path, index in self.segments():
+            if not index.count or index.last < since or (until is not None and index.first > until):
+                continue
+            for line in _iter_lines(path, index.offset_for(since)):
+                if needle is not None and needle not in line:
+                    continue  # cheap reject before parsing
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn line from a crash
+                ts = record.get('t', 0)
+                if ts < since:
+                    continue
+                if until is not None and ts > until:
+                    break
+                if process is not None and record.get('p') != process:
+                    continue
+                yield record
+
+    def top_processes(self, since: float = 0.0, limit: int = 20) -> List[Tuple[str, int]]:
+        """Processes with the most detected popups since a time"""
+        counts: Dict[str, int] = {}
+        for path, index in self.segments():
+            if not index.count or index.last < since:
+                continue
+            if index.first >= since:
+                # Whole segment is in range - the index already has the answer
+                for name, count in index.processes.items():
+                    counts[name] = counts.get(name, 0) + count
+                continue
+            for line in _iter_lines(path, index.offset_for(since)):
+                if b'"e":"detected"' not in line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('t', 0) >= since:
+                    name = record.get('p') or ''
+                    counts[name] = counts.get(name, 0) + 1
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def summary(self, since: float = 0.0) -> dict:
+        """Detections, outcomes, success rate and dismiss latency since a time"""
+        detected = done = failed = 0
+        latencies = []
+        close_latencies = []
+        methods: Dict[str, int] = {}
+        for record in self.events(since):
+            kind = record.get('e')
+            if kind == DETECTED:
+                detected += 1
+            elif kind == OUTCOME:
+                if record.get('ok'):
+                    done += 1
+                    if 'ms' in record:
+                        latencies.append(record['ms'])
+                    if 'cms' in record:
+                        close_latencies.append(record['cms'])
+                else:
+                    failed += 1
+            elif kind == CLICK and record.get('ok'):
+                method = record.get('m') or '?'
+                methods[method] = methods.get(method, 0) + 1
+        latencies.sort()
+        close_latencies.sort()
+        return {
+            'detected': detected,
+            'dismissed': done,
+            'failed': failed,
+            'success_rate': done / (done + failed) if done + failed else 0.0,
+            'median_dismiss_ms': latencies[len(latencies) // 2] if latencies else None,
+            'median_close_ms': close_latencies[len(close_latencies) // 2] if close_latencies else None,
+            'clicks_by_method': methods,
+        }
+
+    def _build_index(self, path: str) -> SegmentIndex:
+        index = SegmentIndex()
+        offset = 0
+        for line in _iter_lines(path):
+            try:
+                index.add(json.loads(line), offset)
+            except (ValueError, KeyError):
+                pass
+            offset += len(line)
+        return index
+
+
+def _parse_time(value: str) -> float:
+    """'2026-10-01' or '2026-10-01T12:00' -> epoch seconds"""
+    for fmt in ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%d'):
+        try:
+            return time.mktime(time.strptime(value, fmt))
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"can't parse time '{value}'")
+
+
+def main(argv: Optional[list] = None) -> int:
+    from config import Config
+
+    parser = argparse.ArgumentParser(prog='python -m journal', description="Query the popup event journal")
+    parser.add_argument('--dir', default=None, help="journal directory (default: JOURNAL_DIR)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_range(command):
+        command.add_argument('--days', type=float, help="only the last N days")
+        command.add_argument('--since', type=_parse_time, help="only events from this time (YYYY-MM-DD[THH:MM])")
+
+    top = commands.add_parser('top-processes', help="processes with the most popups")
+    add_range(top)
+    top.add_argument('--limit', type=int, default=20)
+
+    events = commands.add_parser('events', help="print matching events as JSON lines")
+    add_range(events)
+    events.add_argument('--until', type=_parse_time)
+    events.add_argument('--type', choices=(DETECTED, CLICK, OUTCOME))
+    events.add_argument('--process')
+
+    summary = commands.add_parser('summary', help="totals, success rate and latency")
+    add_range(summary)
+
+    args = parser.parse_args(argv)
+    directory = args.dir or Config().journal_dir
+    if not directory or not os.path.isdir(directory):
+        print(f"No journal found at '{directory}'", file=sys.stderr)
+        return 1
+
+    since = args.since or 0.0
+    if args.days:
+        since = max(since, time.time() - args.days * 86400)
+    reader = JournalReader(directory)
+
+    if args.command == 'top-processes':
+        for name, count in reader.top_processes(since, args.limit):
+            print(f"{count:8d}  {name or '(unknown)'}")
+    elif args.command == 'events':
+        for record in reader.events(since, args.until, args.type, args.process):
+            print(json.dumps(record, ensure_ascii=False))
+    else:
+        for key, value in reader.summary(since).items():
+            print(f"{key:>18}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Fixed-capacity in-memory store for recent log records
+"""
+
+import threading
+from typing import List, Optional, Tuple
+
+# (sequence number, timestamp from time.time(), level, message)
+LogRecord = Tuple[int, float, int, str]
+
+
+class LogRingBuffer:
+    """
+    Ring buffer of log records.
+    Appending never copies or shifts existing records; once full, the oldest
+    record is overwritten. Every record gets an increasing sequence number so
+    readers can ask for "everything after N" without copying the whole buffer.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._records: List[Optional[LogRecord]] = [None] * self.capacity
+        self._next_seq = 0     # sequence number of the next record
+        self._first_seq = 0    # oldest sequence number still readable
+        self._lock = threading.Lock()
+
+    def append(self, timestamp: float, level: int, message: str) -> int:
+        """Add a record. Returns its sequence number"""
+        with self._lock:
+            seq = self._next_seq
+            self._records[seq % self.capacity] = (seq, timestamp, level, message)
+            self._next_seq = seq + 1
+            if self._next_seq - self._first_seq > self.capacity:
+                self._first_seq = self._next_seq - self.capacity
+            return seq
+
+    def read_since(self, seq: int, limit: Optional[int] = None) -> Tuple[List[LogRecord], int]:
+        """
+        Get records with sequence number >= seq (oldest first)
+        Returns (records, cursor) - pass cursor back in to continue reading.
+        Records that were already overwritten are skipped.
+        """
+        with self._lock:
+            start = max(seq, self._first_seq)
+            end = self._next_seq
+            if limit is not None and end - start > limit:
+                end = start + limit
+            records = [self._records[i % self.capacity] for i in range(start, end)]
+            return records, end
+
+    def recent(self, count: int) -> List[LogRecord]:
+        """Get the newest count records (all of them if count <= 0), oldest first"""
+        with self._lock:
+            start = self._first_seq
+            if count > 0:
+                start = max(start, self._next_seq - count)
+            return [self._records[i % self.capacity] for i in range(start, self._next_seq)]
+
+    @property
+    def next_seq(self) -> int:
+        """Sequence number the next record will get (a cursor for 'only new records')"""
+        return self._next_seq
+
+    def clear(self):
+        """Drop all records (sequence numbers keep counting up)"""
+        with self._lock:
+            self._records = [None] * self.capacity
+            self._first_seq = self._next_seq
+
+    def __len__(self) -> int:
+        return self._next_seq - self._first_seq
@@ -0,0 +1,199 @@
+"""
+Background log writer: batches log lines to the console and log file
+without blocking the caller, and rotates the file by size
+"""
+
+import atexit
+import gzip
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+
+class _Control:
+    """Flush/stop request passed through the queue"""
+
+    def __init__(self, stop: bool):
+        self.stop = stop
+        self.done = threading.Event()
+
+
+class AsyncLogWriter:
+    """
+    Queue-backed writer thread.
+    The log file stays open; queued lines are written in batches and flushed
+    when batch_size lines are pending or every flush_interval seconds.
+    When the file grows past max_bytes it is gzip-compressed to <file>.1.gz
+    (older archives shift to .2.gz, ...) and a new file is started.
+    Queued items that aren't strings are turned into lines by formatter,
+    on the writer thread.
+    """
+
+    def __init__(self, path: Optional[str], max_bytes: int = 5 * 1024 * 1024,
+                 backup_count: int = 3, batch_size: int = 100,
+                 flush_interval: float = 0.2, console: bool = True,
+                 header: Optional[str] = None,
+                 formatter: Optional[Callable[[Any], str]] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.console = console
+        self.formatter = formatter or str
+        self.file = None
+        self.file_opens = 0
+        self.rotations = 0
+        self.rotation_failures = 0
+        self.dropped_errors = 0
+        # Size at which the file is rotated next; pushed out after a failed rotation
+        self._rotate_at = max_bytes
+
+        self.queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+
+        if self.path:
+            self._open()
+            # Written before the thread starts, file only (not to the console)
+            if self.file is not None and header:
+                self.file.write(header)
+
+        self.thread = threading.Thread(target=self._writer_loop, name="log-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, line: Any):
+        """Queue one line (without trailing newline) or a record for the formatter"""
+        if not self._closed:
+            self.queue.put(line)
+
+    def flush(self, timeout: float = 2.0) -> bool:
+        """Block until everything queued so far is written. Returns False on timeout"""
+        if self._closed or not self.thread.is_alive():
+            return False
+        control = _Control(stop=False)
+        self.queue.put(control)
+        return control.done.wait(timeout)
+
+    def close(self, timeout: float = 2.0):
+        """Write out pending lines and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        if self.thread.is_alive():
+            self.queue.put(_Control(stop=True))
+            self.thread.join(timeout)
+        if self.file:
+            try:
+                self.file.close()
+            except Exception:
+                pass
+            self.file = None
+
+    def _open(self):
+        """Open the log file for appending"""
+        try:
+            self.file = open(self.path, 'a', encoding='utf-8')
+            self.file_opens += 1
+        except Exception as e:
+            self._console_write([f"Warning: Cannot write to log file {self.path}: {e}"])
+            self.file = None
+            self.path = None
+
+    def _writer_loop(self):
+        """Collect lines into batches and write them out"""
+        pending: List[Any] = []
+        last_flush = time.monotonic()
+
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self.queue.get(timeout=timeout if pending else None)
+            except queue.Empty:
+                item = None
+
+            control = None
+            if isinstance(item, _Control):
+                control = item
+            elif item is not None:
+                pending.append(item)
+                # Grab whatever else is already waiting without blocking
+                while len(pending) < self.batch_size:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, _Control):
+                        control = item
+                        break
+                    pending.append(item)
+
+            due = (time.monotonic() - last_flush) >= self.flush_interval
+            if pending and (control is not None or due or len(pending) >= self.batch_size):
+                self._write_batch(pending)
+                pending = []
+                last_flush = time.monotonic()
+
+            if control is not None:
+                control.done.set()
+                if control.stop:
+                    return
+
+    def _write_batch(self, items: List[Any]):
+        """Write a batch to console and file, then rotate if needed"""
+        lines = [item if isinstance(item, str) else self.formatter(item) for item in items]
+        if self.console:
+            self._console_write(lines)
+
+        if self.file is None:
+            return
+        try:
+            self.file.write('\n'.join(lines) + '\n')
+            self.file.flush()
+            if self.max_bytes > 0 and self.file.tell() >= self._rotate_at:
+                self._rotate()
+        except Exception as e:
+            self.dropped_errors += 1
+            self._console_write([f"Warning: Cannot write to log file: {e}"])
+
+    def _console_write(self, lines: List[str]):
+        # sys.stdout is None in windowed (no console) builds
+        if sys.stdout is None:
+            return
+        try:
+            sys.stdout.write('\n'.join(lines) + '\n')
+            sys.stdout.flush()
+        except Exception:
+            pass
+
+    def _rotate(self):
+        """
+        Compress the current file to .1.gz, shifting older archives up
+        If that fails (disk full, file locked by a scanner...) logging carries
+        on in the same file and the next rotation is tried max_bytes later
+        """
+        size = self.file.tell()
+        self.file.close()
+        self.file = None
+
+        try:
+            if self.backup_count > 0:
+                for index in range(self.backup_count - 1, 0, -1):
+                    src = f"{self.path}.{index}.gz"
+                    if os.path.exists(src):
+                        os.replace(src, f"{self.path}.{index + 1}.gz")
+                with open(self.path, 'rb') as src, gzip.open(f"{self.path}.1.gz", 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+            os.remove(self.path)
+            self.rotations += 1
+            self._rotate_at = self.max_bytes
+        except Exception as e:
+            self.rotation_failures += 1
+            self._rotate_at = size + self.max_bytes
+            self._console_write([f"Warning: Cannot rotate log file: {e}"])
+        finally:
+            self._open()
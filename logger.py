@@ -5,73 +5,134 @@ Logging utility for the Popup Blocker
 import time
 import os
 from datetime import datetime
-from typing import List
+from typing import Any, Callable, List, Tuple, Union
 from config import Config
+from log_buffer import LogRingBuffer, LogRecord
+from log_writer import AsyncLogWriter
+
+# Log levels
+DEBUG = 10
+INFO = 20
+WARN = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARN: "WARN", ERROR: "ERROR"}
+
+# A message is either a string (optionally with %-style args) or a
+# callable returning the string, so formatting can be skipped entirely
+Message = Union[str, Callable[[], str]]
+
+# strftime is only needed once per second of log output. The writer thread and
+# get_logs_since() on other threads both format records, so the (second, stamp)
+# pair is read and replaced as one tuple and can never be half-updated
+_stamp_cache: Tuple[int, str] = (-1, "")
+
+def format_record(record: LogRecord) -> str:
+    """Format a log record as '[YYYY-mm-dd HH:MM:SS] LEVEL: message'"""
+    global _stamp_cache
+    seq, timestamp, level, message = record
+    second = int(timestamp)
+    cached_second, stamp = _stamp_cache
+    if second != cached_second:
+        stamp = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+        _stamp_cache = (second, stamp)
+    return f"[{stamp}] {LEVEL_NAMES[level]}: {message}"
 
 class Logger:
-    def __init__(self):
-        self.config = Config()
-        self.log_entries: List[str] = []
+    def __init__(self, config: Config = None):
+        self.config = config or Config()
+        # Recent records, kept unformatted until someone reads them
+        self.log_buffer = LogRingBuffer(self.config.max_log_entries)
         self.log_file_path = self.config.log_file
         
-        # Create log file if it doesn't exist
-        self._ensure_log_file()
-    
-    def _ensure_log_file(self):
-        """Ensure log file exists and is writable"""
-        try:
-            with open(self.log_file_path, 'a', encoding='utf-8') as f:
-                f.write(f"\n=== Popup Blocker Started at {datetime.now()} ===\n")
-        except Exception as e:
-            print(f"Warning: Cannot write to log file {self.log_file_path}: {e}")
+        # Messages below this level are dropped before any formatting happens
+        self.level = DEBUG if self.config.debug_mode else INFO
+        
+        # Console and file output happen on a background thread
+        self.writer = AsyncLogWriter(
+            self.log_file_path,
+            max_bytes=self.config.log_max_bytes,
+            backup_count=self.config.log_backup_count,
+            batch_size=self.config.log_batch_size,
+            flush_interval=self.config.log_flush_interval,
+            header=f"\n=== Popup Blocker Started at {datetime.now()} ===\n",
+            formatter=format_record,
+        )
+        
+        # The writer reports (and disables) an unwritable log file
+        if self.writer.file is None:
             self.log_file_path = None
     
-    def _log(self, level: str, message: str):
+    def is_enabled(self, level: int) -> bool:
+        """Check if messages at this level will be logged"""
+        return level >= self.level
+    
+    def _log(self, level: int, message: Message, args: tuple = ()):
         """Internal logging method"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {level}: {message}"
+        # Deferred formatting: only done for messages that are actually logged
+        if callable(message):
+            message = message()
+        elif args:
+            message = message % args
         
-        # Print to console
-        print(log_entry)
+        timestamp = time.time()
         
-        # Add to memory log
-        self.log_entries.append(log_entry)
+        # Add to memory log (oldest entry is overwritten once full)
+        seq = self.log_buffer.append(timestamp, level, message)
         
-        # Trim log entries if too many
-        if len(self.log_entries) > self.config.max_log_entries:
-            self.log_entries = self.log_entries[-self.config.max_log_entries:]
-        
-        # Write to file if available
-        if self.log_file_path:
-            try:
-                with open(self.log_file_path, 'a', encoding='utf-8') as f:
-                    f.write(log_entry + '\n')
-                    f.flush()
-            except Exception as e:
-                print(f"Warning: Cannot write to log file: {e}")
+        # Console and file are written (and formatted) in batches by the writer thread
+        self.writer.write((seq, timestamp, level, message))
     
-    def info(self, message: str):
+    def info(self, message: Message, *args: Any):
         """Log info message"""
-        self._log("INFO", message)
+        if self.level <= INFO:
+            self._log(INFO, message, args)
     
-    def warning(self, message: str):
+    def warning(self, message: Message, *args: Any):
         """Log warning message"""
-        self._log("WARN", message)
+        if self.level <= WARN:
+            self._log(WARN, message, args)
     
-    def error(self, message: str):
+    def error(self, message: Message, *args: Any):
         """Log error message"""
-        self._log("ERROR", message)
+        self._log(ERROR, message, args)
+    
+    def debug(self, message: Message, *args: Any):
+        """
+        Log debug message (only if debug mode is enabled)
+        Pass values as args, e.g. debug("Window %s", hwnd), so nothing is
+        formatted when debug mode is off
+        """
+        if self.level <= DEBUG:
+            self._log(DEBUG, message, args)
     
-    def debug(self, message: str):
-        """Log debug message (only if debug mode is enabled)"""
-        if self.config.debug_mode:
-            self._log("DEBUG", message)
+    @property
+    def log_entries(self) -> List[str]:
+        """All in-memory log entries, formatted"""
+        return self.get_recent_logs(0)
     
     def get_recent_logs(self, count: int = 50) -> List[str]:
         """Get recent log entries"""
-        return self.log_entries[-count:] if count > 0 else self.log_entries
+        return [format_record(record) for record in self.log_buffer.recent(count)]
+    
+    def get_logs_since(self, cursor: int, limit: int = None) -> Tuple[List[str], int]:
+        """
+        Get log entries logged since cursor (a value returned by a previous call,
+        or 0 for everything still in memory)
+        Returns (entries, new_cursor)
+        """
+        records, cursor = self.log_buffer.read_since(cursor, limit)
+        return [format_record(record) for record in records], cursor
+    
+    def flush(self):
+        """Wait until all queued messages have been written"""
+        self.writer.flush()
+    
+    def close(self):
+        """Flush and close the log file"""
+        self.writer.close()
     
     def clear_logs(self):
         """Clear in-memory log entries"""
-        self.log_entries.clear()
+        self.log_buffer.clear()
         self.info("Log entries cleared")
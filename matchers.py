@@ -0,0 +1,56 @@
+"""
+Precompiled keyword matching for window titles and class names
+"""
+
+import re
+from typing import Iterable, Optional
+
+
+class KeywordMatcher:
+    """
+    Case-insensitive "does the text contain any of these keywords" check.
+    The keywords are casefolded once and compiled into a single regex whose
+    alternatives are merged into a prefix tree, so the cost of a search grows
+    with the length of the text rather than with the number of keywords.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = [k.casefold() for k in keywords if k]
+        if self.keywords:
+            self._search = re.compile(self._build_pattern(self.keywords)).search
+        else:
+            self._search = None
+
+    def matches(self, text: str) -> bool:
+        """Check if text contains any keyword"""
+        if self._search is None or not text:
+            return False
+        return self._search(text.casefold()) is not None
+
+    def find(self, text: str) -> Optional[str]:
+        """Return the (casefolded) keyword found in text, or None"""
+        if self._search is None or not text:
+            return None
+        match = self._search(text.casefold())
+        return match.group(0) if match else None
+
+    @staticmethod
+    def _build_pattern(keywords) -> str:
+        """Build a prefix-tree regex, e.g. ['alert', 'alarm'] -> 'al(?:arm|ert)'"""
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node[''] = {}  # end of keyword
+
+        def node_pattern(node) -> str:
+            # A keyword ends here - for a containment test the longer ones add nothing
+            if '' in node:
+                return ''
+            branches = [re.escape(ch) + node_pattern(child) for ch, child in sorted(node.items())]
+            if len(branches) == 1:
+                return branches[0]
+            return '(?:' + '|'.join(branches) + ')'
+
+        return node_pattern(trie)
@@ -0,0 +1,179 @@
+"""
+In-process metrics (histograms, counters, gauges) exported in Prometheus text format,
+either over a localhost HTTP endpoint or as a periodically rewritten file
+"""
+
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence
+import os
+import threading
+
+# Bucket upper bounds (seconds) for phase timings: 50us .. 10s
+TIME_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bucket upper bounds for window counts
+COUNT_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram, optionally split by one label
+    (e.g. phase="classify"). observe() is cheap enough for the scan loop.
+    """
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = TIME_BUCKETS,
+                 label: Optional[str] = None):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.label = label
+        # label value -> [per-bucket counts (+Inf last), sum, count]
+        self.series: Dict[Optional[str], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, label_value: Optional[str] = None):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(label_value)
+            if series is None:
+                series = self.series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def summary(self) -> Dict[Optional[str], tuple]:
+        """{label value: (count, sum)}"""
+        with self._lock:
+            return {key: (series[2], series[1]) for key, series in self.series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(series[0]), series[1], series[2]) for key, series in sorted(
+                self.series.items(), key=lambda item: item[0] or '')]
+        for label_value, counts, total, count in snapshot:
+            labels = f'{self.label}="{label_value}",' if self.label and label_value is not None else ''
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels}le="{_format_value(bound)}"}} {cumulative}')
+            suffix = f'{{{labels.rstrip(",")}}}' if labels else ''
+            lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+class Value:
+    """A counter or gauge whose value is read from a callback at export time"""
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float], kind: str = 'gauge'):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.read())
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}",
+                f"{self.name} {_format_value(value)}"]
+
+
+class MetricsRegistry:
+    """The blocker's metrics, shared through the runtime context"""
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+        # Standard instruments used by the detector and the blocker
+        self.phase_seconds = self.add(Histogram(
+            'popup_blocker_phase_seconds',
+            'Time spent per phase (enumerate, classify, process_lookup, button_search, click, verify)',
+            label='phase'))
+        self.cycle_seconds = self.add(Histogram(
+            'popup_blocker_cycle_seconds', 'Duration of a full popup scan'))
+        self.windows_scanned = self.add(Histogram(
+            'popup_blocker_windows_scanned', 'Top-level windows enumerated per scan', COUNT_BUCKETS))
+        self.dismiss_seconds = self.add(Histogram(
+            'popup_blocker_dismiss_seconds', 'Time from detecting a popup until it was confirmed gone'))
+        self.close_seconds = self.add(Histogram(
+            'popup_blocker_close_seconds', 'Time from the successful click until the popup was confirmed gone'))
+
+    def add(self, metric):
+        """Register a Histogram or Value (replacing one with the same name)"""
+        with self._lock:
+            self.metrics[metric.name] = metric
+        return metric
+
+    def value(self, name: str, help_text: str, read: Callable[[], float], kind: str = 'gauge') -> Value:
+        return self.add(Value(name, help_text, read, kind))
+
+    def render(self) -> str:
+        """Everything in Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, path: str):
+        """Write render() to path atomically, for scrapers that read files"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+
+class MetricsServer:
+    """Serves /metrics on localhost from a daemon thread"""
+
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = '127.0.0.1'):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # scrapes don't belong in the blocker log
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.thread = None
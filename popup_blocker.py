@@ -6,49 +6,160 @@ Uses built-in Windows capabilities only - no external dependencies required
 
 import time
 import sys
-import os
-from typing import List, Tuple, Optional
+from time import perf_counter
+from typing import List, Optional
 import threading
 import signal
 
 # Only import Windows-specific modules when available
 try:
     import ctypes
-    import ctypes.wintypes
-    WINDOWS_AVAILABLE = True
+    WINDOWS_AVAILABLE = hasattr(ctypes, 'windll')
 except (ImportError, AttributeError):
     WINDOWS_AVAILABLE = False
 
-from config import Config
-from logger import Logger
-
-if WINDOWS_AVAILABLE:
-    from window_detector import WindowDetector
+from runtime import ConfigSnapshot, RuntimeContext, get_runtime
+from config import RESTART_KEYS
+from config_watcher import ConfigWatcher
+from click_strategy import (ClickStrategyStore, BUTTON_METHODS, DIALOG_METHODS, DIALOG_COMMAND,
+                            SEND_BM_CLICK, MOUSE_CLICK, BUTTON_MESSAGES, POST_BM_CLICK)
+from window_events import CandidateQueue, WindowEventSource
+from popup_handler import FailureBackoff, PopupHandlerScheduler, PopupTask, DONE
+from click_dispatcher import ClickDispatcher
+from scan_scheduler import AdaptiveScanScheduler
+from metrics import MetricsServer
+from profiling import CycleProfiler, output_dir_for, CYCLES, SAMPLE
+from journal import DETECTED, CLICK, OUTCOME
+from rules import CLICK_CONTROL, CLOSE
+from window_backend import WindowBackend
+from window_detector import WindowDetector
 
 # Windows API constants
 WM_COMMAND = 0x0111
 BM_CLICK = 0x00F5
 WM_LBUTTONDOWN = 0x0201
 WM_LBUTTONUP = 0x0202
+WM_CLOSE = 0x0010
 IDNO = 7
 IDCANCEL = 2
+SMTO_ABORTIFHUNG = 0x0002
+STANDARD_DIALOG_CLASS = '#32770'
+MOUSE_SETTLE_SECONDS = 0.02
+# How often learned click methods are written to disk (seconds)
+STRATEGY_SAVE_INTERVAL = 30.0
 
 class PopupBlocker:
-    def __init__(self):
-        # Check if Windows is available
-        if not WINDOWS_AVAILABLE:
+    def __init__(self, context: Optional[RuntimeContext] = None,
+                 event_source: Optional[WindowEventSource] = None,
+                 backend: Optional[WindowBackend] = None):
+        # Check if Windows is available (any other backend works everywhere)
+        if backend is None and not WINDOWS_AVAILABLE:
             raise RuntimeError("This program only works on Windows")
             
-        self.config = Config()
-        self.logger = Logger()
-        self.detector = WindowDetector()
+        # Config, logger and caches are built once per process and shared
+        self.context = context or get_runtime()
+        self.config = self.context.config
+        self.logger = self.context.logger
+        self.journal = self.context.journal  # None when JOURNAL_DIR is empty
+        self.detector = WindowDetector(self.context, backend)
+        self.backend = self.detector.backend
         self.running = False
+        
+        # Event-driven detection: the event source pushes candidate HWNDs into
+        # this queue and only those are classified between full sweeps
+        self.candidates = CandidateQueue()
+        if event_source is None and self.config.detection_mode == 'event':
+            event_source = self.backend.create_event_source()
+        self.event_source = event_source
+        self.events_active = False
+        
+        # Full scans speed up after detections/failures and back off when idle
+        self.scan_scheduler = AdaptiveScanScheduler(
+            floor=self.config.min_check_interval,
+            ceiling=self.config.max_check_interval,
+            initial=self.config.check_interval,
+        )
+        self._failures_since_scan = 0
+        # Popups already counted in stats - forgotten once the window closes
+        self._seen_popups = set()
+        
+        # Each popup is handled by its own state machine so waiting for one
+        # popup to close never holds up scanning or other popups
+        self.handlers = PopupHandlerScheduler(
+            click=self._attempt_click,
+            is_dismissed=self._is_dismissed,
+            max_attempts=3,  # คลิกซ้ำสูงสุด 3 ครั้ง
+            verify_timeout=self.config.verify_timeout,  # รอให้หน้าต่างปิดได้นานสุดเท่านี้
+            retry_delay=0.3,
+        )
+        
+        # Which click method works for each application, learned from dismissals
+        self.strategies = ClickStrategyStore(self.config.click_strategy_file)
+        try:
+            self.strategies.load()
+        except ValueError as e:
+            self.logger.error(f"Error loading click strategies, starting fresh: {e}")
+        self._strategies_saved_at = time.monotonic()
+        
+        # Popups that survived every attempt wait longer and longer before the
+        # next try, and are left alone after too many failures
+        self.backoff = FailureBackoff(
+            base_delay=self.config.retry_backoff,
+            max_delay=self.config.retry_backoff_max,
+            max_failures=self.config.max_dismiss_failures,
+        )
+        
+        # Clicks run on a small worker pool with time-bounded sends, so a hung
+        # application can't freeze the blocker or starve other popups
+        self.dispatcher = ClickDispatcher(self.config.click_workers)
+        self._mouse_lock = threading.Lock()  # only one worker may drive the real cursor
+        
         self.stats = {
             'popups_detected': 0,
             'buttons_clicked': 0,
-            'errors': 0
+            'errors': 0,
+            'hung_skipped': 0,
+            'click_timeouts': self.dispatcher.timeouts,  # target process -> count
+            'scan_interval': self.scan_scheduler.interval,
+            'config_reloads': 0,
+            'button_searches_avoided': 0,  # child window walks saved by the IDNO lookup
+            'backoff_skipped': 0,  # detections not clicked because the popup failed before
+            'given_up': 0,
         }
         
+        # Phase timings come from the shared registry; counters are read from stats on export
+        self.metrics = self.context.metrics
+        self.metrics_server: Optional[MetricsServer] = None
+        self._metrics_written_at = 0.0
+        for key, help_text in (('popups_detected', 'Popups detected'),
+                               ('buttons_clicked', 'Popups dismissed'),
+                               ('errors', 'Errors encountered'),
+                               ('hung_skipped', 'Click attempts skipped because the window was hung'),
+                               ('button_searches_avoided', 'Button searches avoided by looking up IDNO directly'),
+                               ('backoff_skipped', 'Detections not clicked because the popup could not be dismissed before'),
+                               ('given_up', 'Popups left alone after too many failed dismissals')):
+            self.metrics.value(f'popup_blocker_{key}_total', help_text,
+                               lambda key=key: self.stats[key], kind='counter')
+        self.metrics.value('popup_blocker_scan_interval_seconds', 'Current full scan interval',
+                           lambda: self.stats['scan_interval'])
+        self.metrics.value('popup_blocker_popups_in_progress', 'Popups currently being handled',
+                           lambda: len(self.handlers))
+        
+        # Settings and rule files are reloaded off the scanning thread and
+        # swapped in between cycles
+        self.config_watcher = ConfigWatcher(self.context, self.config.config_reload_interval)
+        self.metrics.value('popup_blocker_config_reloads_total', 'Settings reloads applied',
+                           lambda: self.stats['config_reloads'], kind='counter')
+        self.metrics.value('popup_blocker_config_rejected_total', 'Changed settings files that were rejected',
+                           lambda: self.config_watcher.rejected, kind='counter')
+        self.metrics.value('popup_blocker_config_build_seconds', 'Time taken to build the last reloaded settings',
+                           lambda: self.config_watcher.last_build_seconds)
+        
+        # Scan profiling is normally off; requests (env var or GUI) are picked
+        # up by the scanning thread at the start of the next cycle
+        self.profiler: Optional[CycleProfiler] = None
+        self._profiling_request: Optional[str] = self.config.profile_mode or None
+        
         # Setup signal handlers for graceful shutdown
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
@@ -61,20 +172,17 @@ class PopupBlocker:
     
     def start(self):
         """Start the popup blocker service"""
-        if not WINDOWS_AVAILABLE:
-            self.logger.error("This program only works on Windows")
-            return
-            
         self.logger.info("Starting Popup Blocker...")
-        self.logger.info(f"Check interval: {self.config.check_interval}s")
         self.logger.info(f"Target button texts: {self.config.target_buttons}")
         
         self.running = True
+        self.start_metrics()
+        self.start_event_source()
+        self.config_watcher.start()
         
         try:
             while self.running:
-                self._check_for_popups()
-                time.sleep(self.config.check_interval)
+                self.run_cycle()
         except KeyboardInterrupt:
             self.logger.info("Keyboard interrupt received")
         except Exception as e:
@@ -83,88 +191,522 @@ class PopupBlocker:
         finally:
             self.stop()
     
+    def start_metrics(self):
+        """Serve metrics on localhost if METRICS_PORT is set"""
+        if not self.config.metrics_port or self.metrics_server is not None:
+            return
+        try:
+            self.metrics_server = MetricsServer(self.metrics, self.config.metrics_port)
+            self.metrics_server.start()
+            self.logger.info(f"Metrics available at http://127.0.0.1:{self.metrics_server.port}/metrics")
+        except Exception as e:
+            self.logger.error(f"Error starting metrics endpoint: {e}")
+            self.metrics_server = None
+    
+    def _write_metrics_file(self, force: bool = False):
+        """Rewrite METRICS_FILE when its interval has passed"""
+        if not self.config.metrics_file:
+            return
+        now = time.monotonic()
+        if not force and now - self._metrics_written_at < self.config.metrics_file_interval:
+            return
+        self._metrics_written_at = now
+        try:
+            self.metrics.write_file(self.config.metrics_file)
+        except Exception as e:
+            self.logger.debug("Error writing metrics file: %s", e)
+    
+    def _save_strategies(self, force: bool = False):
+        """Write learned click methods when STRATEGY_SAVE_INTERVAL has passed"""
+        now = time.monotonic()
+        if not force and now - self._strategies_saved_at < STRATEGY_SAVE_INTERVAL:
+            return
+        self._strategies_saved_at = now
+        try:
+            self.strategies.save()
+        except Exception as e:
+            self.logger.debug("Error saving click strategies: %s", e)
+    
+    def start_event_source(self):
+        """Subscribe to window events, falling back to polling if unavailable"""
+        self.events_active = False
+        if self.event_source is not None:
+            try:
+                self.events_active = self.event_source.start(self.candidates)
+            except Exception as e:
+                self.logger.error(f"Error starting window event source: {e}")
+        
+        self._set_scan_limits()
+        if self.events_active:
+            self.logger.info(f"Detection mode: event-driven (safety sweep every {self.config.safety_sweep_interval}s)")
+        else:
+            self.logger.info(f"Detection mode: polling (check interval: {self.config.min_check_interval}s"
+                             f" - {self.config.max_check_interval}s)")
+        self.scan_scheduler.reset(self.config.check_interval)
+    
+    def _set_scan_limits(self):
+        """Scan interval floor and ceiling from the config"""
+        self.scan_scheduler.floor = max(0.0, self.config.min_check_interval)
+        # With events doing the detection, full scans only need to back off
+        # as far as the safety sweep interval
+        ceiling = self.config.safety_sweep_interval if self.events_active else self.config.max_check_interval
+        self.scan_scheduler.ceiling = max(self.scan_scheduler.floor, ceiling)
+    
+    def run_cycle(self):
+        """
+        Run one step of the main loop: a full sweep when one is due, then
+        wait for window events (or just sleep when polling) while advancing
+        any popups that are being handled
+        """
+        if self._profiling_request is not None:
+            self._apply_profiling_request()
+        
+        snapshot = self.config_watcher.take()
+        if snapshot is not None:
+            self.apply_config(snapshot)
+        
+        if self.scan_scheduler.due():
+            profiler = self.profiler
+            if profiler is None:
+                found = self._check_for_popups()
+            else:
+                found = profiler.run(self._check_for_popups)
+                if profiler.finished:
+                    self._finish_profiling()
+            self.scan_scheduler.record_scan(found, self._failures_since_scan)
+            self._failures_since_scan = 0
+            self.stats['scan_interval'] = self.scan_scheduler.interval
+            self._write_metrics_file()
+            self._save_strategies()
+            if self.journal is not None:
+                self.journal.flush()
+        
+        self._advance_handlers()
+        
+        # Wake up for the next sweep or the next popup step, whichever comes first
+        timeout = self.scan_scheduler.time_until_due()
+        handler_wait = self.handlers.time_until_next()
+        if handler_wait is not None:
+            timeout = min(timeout, handler_wait)
+        
+        if self.events_active:
+            self._check_event_candidates(timeout)
+        else:
+            time.sleep(timeout)
+        
+        self._advance_handlers()
+    
     def stop(self):
         """Stop the popup blocker service"""
         self.running = False
+        self.candidates.wake()
+        self.config_watcher.stop()
+        if self.event_source is not None and self.events_active:
+            try:
+                self.event_source.stop()
+            except Exception as e:
+                self.logger.debug("Error stopping window event source: %s", e)
+            self.events_active = False
+        self.dispatcher.shutdown()
+        if self.journal is not None:
+            self.journal.flush()
+        if self.profiler is not None:
+            self._finish_profiling()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        self._write_metrics_file(force=True)
+        self._save_strategies(force=True)
         self._print_stats()
         self.logger.info("Popup Blocker stopped")
+        self.logger.flush()
+    
+    def apply_config(self, snapshot: ConfigSnapshot):
+        """
+        Switch to reloaded settings (called by the scanning thread between cycles)
+        Popups already being handled finish with the rules they started with
+        """
+        old_config = self.config
+        self.context.apply_snapshot(snapshot)
+        self.config = snapshot.config
+        self.detector.reload()
+        self._set_scan_limits()
+        self.handlers.verify_timeout = self.config.verify_timeout
+        self.backoff.base_delay = self.config.retry_backoff
+        self.backoff.max_delay = max(self.config.retry_backoff, self.config.retry_backoff_max)
+        self.backoff.max_failures = self.config.max_dismiss_failures
+        self.scan_scheduler.reset()  # rescan now under the new settings
+        self.stats['config_reloads'] += 1
+        
+        self.logger.info(f"Settings reloaded ({len(snapshot.rules)} rules, "
+                         f"built in {self.config_watcher.last_build_seconds * 1000:.1f} ms)")
+        for key in RESTART_KEYS:
+            if getattr(old_config, key) != getattr(self.config, key):
+                self.logger.warning(f"Setting '{key}' changed - it takes effect after a restart")
     
-    def _check_for_popups(self):
-        """Check for popup windows and handle them"""
-        if not WINDOWS_AVAILABLE:
+    def set_profiling(self, enabled: bool, mode: str = SAMPLE):
+        """
+        Turn scan profiling on (CYCLES or SAMPLE mode) or off
+        Safe to call from another thread; takes effect at the next cycle
+        """
+        self._profiling_request = mode if enabled else ''
+    
+    def _apply_profiling_request(self):
+        mode, self._profiling_request = self._profiling_request, None
+        if self.profiler is not None:
+            self._finish_profiling()
+        if not mode:
             return
-            
+        if mode not in (CYCLES, SAMPLE):
+            self.logger.warning(f"Unknown profiling mode '{mode}' (use '{CYCLES}' or '{SAMPLE}')")
+            return
+        self.profiler = CycleProfiler(output_dir_for(self.logger.log_file_path), mode,
+                                      cycles=self.config.profile_cycles, every=self.config.profile_every)
+        if mode == CYCLES:
+            self.logger.info(f"Profiling the next {self.profiler.cycles} scans")
+        else:
+            self.logger.info(f"Profiling one scan in every {self.profiler.every}")
+    
+    def _finish_profiling(self):
+        profiler, self.profiler = self.profiler, None
         try:
-            popup_windows = self.detector.find_popup_windows()
+            profiler.finish()
+            if profiler.profiled:
+                self.logger.info(f"Profile of {profiler.profiled} scans written to {profiler.pstats_path}")
+        except Exception as e:
+            self.logger.error(f"Error writing profile: {e}")
+    
+    def _check_for_popups(self) -> int:
+        """
+        Check for popup windows and handle them
+        Returns the number of newly detected popups
+        """
+        found = 0
+        started = perf_counter()
+        try:
+            # Only windows that appeared or changed since the last sweep are classified
+            delta = self.detector.scan_changes()
             
-            for hwnd, window_title in popup_windows:
-                self.stats['popups_detected'] += 1
-                self.logger.info(f"Detected popup: '{window_title}' (HWND: {hwnd})")
-                
-                if self._handle_popup(hwnd, window_title):
-                    self.stats['buttons_clicked'] += 1
+            for hwnd in delta.closed_popups:
+                self._seen_popups.discard(hwnd)
+                self.backoff.forget(hwnd)
+            
+            for hwnd, window_title in delta.new_popups + delta.updated_popups:
+                if self._process_popup(hwnd, window_title):
+                    found += 1
+            
+            # Failed popups whose wait is over get another try, changed or not
+            for hwnd in self.backoff.due():
+                window_title = self.detector.popups.get(hwnd)
+                if window_title is None:
+                    self.backoff.forget(hwnd)
+                elif hwnd not in self.handlers:
+                    self._process_popup(hwnd, window_title)
                     
         except Exception as e:
             self.logger.error(f"Error checking for popups: {e}")
             self.stats['errors'] += 1
+        self.metrics.cycle_seconds.observe(perf_counter() - started)
+        return found
+    
+    def _check_event_candidates(self, timeout: float):
+        """Wait up to timeout seconds for window events and classify only those windows"""
+        try:
+            for hwnd in self.candidates.drain(timeout):
+                # A popup that was just clicked may have been destroyed or hidden - check it now
+                self.handlers.wake(hwnd)
+                window_title = self.detector.classify_window(hwnd)
+                if not window_title:
+                    self._seen_popups.discard(hwnd)
+                    self.backoff.forget(hwnd)
+                elif self._process_popup(hwnd, window_title):
+                    # More popups often follow - sweep again soon
+                    self.scan_scheduler.burst()
+                    self.stats['scan_interval'] = self.scan_scheduler.interval
+        except Exception as e:
+            self.logger.error(f"Error checking event candidates: {e}")
+            self.stats['errors'] += 1
+    
+    def _process_popup(self, hwnd: int, window_title: str) -> bool:
+        """
+        Start handling a popup (without waiting); a popup is counted and
+        logged as detected only once while its window stays open
+        Returns True if it was newly detected
+        """
+        if hwnd in self.handlers:
+            return False
+        process = self.detector.get_window_process_name(hwnd)
+        if not self.backoff.allowed(hwnd, process, window_title):
+            self.stats['backoff_skipped'] += 1
+            self.logger.debug("Not clicking popup that failed before: '%s' (HWND: %s)", window_title, hwnd)
+            return False
+        
+        task = self.handlers.add(hwnd, window_title)
+        # A popup handled again may have new controls: read them afresh
+        self.context.layout_cache.invalidate(hwnd)
+        task.process = process
+        task.window_class = self._get_class_name(hwnd)
+        task.rule = self.detector.rule_for(hwnd)
+        
+        is_new = hwnd not in self._seen_popups
+        if is_new:
+            self._seen_popups.add(hwnd)
+            self.stats['popups_detected'] += 1
+            self.logger.info(f"Detected popup: '{window_title}' (HWND: {hwnd})")
+            if self.journal is not None:
+                self.journal.record(DETECTED, h=hwnd, p=task.process, w=window_title)
+        else:
+            self.logger.debug("Popup changed, handling again: '%s' (HWND: %s)", window_title, hwnd)
+        self._advance_handlers()
+        return is_new
+    
+    def _advance_handlers(self):
+        """Step the popup state machines and record the ones that finished"""
+        try:
+            for task in self.handlers.step():
+                if self.journal is not None:
+                    close_ms = round(task.close_seconds * 1000, 1) if task.close_seconds is not None else None
+                    self.journal.record(OUTCOME, h=task.hwnd, p=task.process, ok=task.state == DONE,
+                                        a=task.attempt, m=task.method,
+                                        ms=round((task.finished_at - task.started_at) * 1000, 1), cms=close_ms)
+                self._record_click_method(task, task.state == DONE)
+                if task.state == DONE:
+                    self.backoff.record_success(task.hwnd, task.process, task.window_title)
+                    self.stats['buttons_clicked'] += 1
+                    self.metrics.dismiss_seconds.observe(task.finished_at - task.started_at)
+                    self.metrics.close_seconds.observe(task.close_seconds)
+                    self.logger.debug("Popup '%s' gone %.1f ms after the click",
+                                      task.window_title, task.close_seconds * 1000)
+                else:
+                    retry_in = self.backoff.record_failure(task.hwnd, task.process, task.window_title)
+                    if retry_in is None:
+                        self.stats['given_up'] += 1
+                        self.logger.warning(f"Failed to handle popup '{task.window_title}' after {task.attempt} attempts"
+                                            f" - leaving it alone")
+                    else:
+                        self.logger.warning(f"Failed to handle popup '{task.window_title}' after {task.attempt} attempts"
+                                            f" - trying again in {retry_in:.1f}s")
+                    self._failures_since_scan += 1
+                    self.scan_scheduler.burst()
+                    self.stats['scan_interval'] = self.scan_scheduler.interval
+        except Exception as e:
+            self.logger.error(f"Error handling popups: {e}")
+            self.stats['errors'] += 1
     
     def _handle_popup(self, hwnd: int, window_title: str) -> bool:
         """
-        Handle a detected popup window with retry mechanism
+        Handle a detected popup window with retry mechanism, blocking until done
         Returns True if a button was successfully clicked
         """
-        if not WINDOWS_AVAILABLE:
+        task = self.handlers.add(hwnd, window_title)
+        if task is not None:
+            self.context.layout_cache.invalidate(hwnd)
+            task.process = self.detector.get_window_process_name(hwnd)
+            task.window_class = self._get_class_name(hwnd)
+            task.rule = self.detector.rule_for(hwnd)
+        else:
+            task = self.handlers.tasks[hwnd]
+        self.handlers.run_until_finished(task)
+        self._record_click_method(task, task.state == DONE)
+        return task.state == DONE
+    
+    def _record_click_method(self, task: PopupTask, success: bool):
+        """Note whether the click method of the task's last attempt dismissed it"""
+        if task.click_method is not None:
+            self.strategies.record(task.process, task.window_class, task.click_method, success)
+            task.click_method = None
+    
+    def _attempt_click(self, task: PopupTask):
+        """
+        Start one click attempt on a popup (called by the handler state machine)
+        Returns a Future for the click running on the worker pool, False if the
+        window is hung, or None if its process already has a click in flight
+        """
+        target = task.process or self.detector.get_window_process_name(task.hwnd) or f"hwnd:{task.hwnd}"
+        
+        # The last attempt's click was delivered but the popup stayed - that method doesn't work here
+        self._record_click_method(task, False)
+        
+        # Don't even try to talk to a window whose UI thread is not responding
+        if self.backend.is_hung(task.hwnd):
+            self.logger.debug("Skipping hung window '%s' (%s)", task.window_title, target)
+            self.stats['hung_skipped'] += 1
+            self.dispatcher.record_timeout(target)
             return False
-            
+        
+        return self.dispatcher.submit(target, self._perform_click, task, target)
+    
+    def _perform_click(self, task: PopupTask, target: str) -> bool:
+        """
+        One click attempt on a popup (runs on a click worker)
+        Returns True if something was clicked
+        """
+        started = perf_counter()
+        task.method = self._click_popup(task, target)
+        if self.journal is not None:
+            self.journal.record(CLICK, h=task.hwnd, p=task.process, a=task.attempt, m=task.method,
+                                cm=task.click_method, ok=task.method is not None,
+                                ms=round((perf_counter() - started) * 1000, 1))
+        return task.method is not None
+    
+    def _click_popup(self, task: PopupTask, target: str) -> Optional[str]:
+        """
+        Do what the window's rule says, or by default try the standard dialog
+        button, then a button found by its text
+        Returns the method that clicked ('close', 'control', 'standard_dialog'
+        or 'button_text'), or None
+        """
+        hwnd, window_title = task.hwnd, task.window_title
+        phase_seconds = self.metrics.phase_seconds
         try:
-            max_retries = 3  # คลิกซ้ำสูงสุด 3 ครั้ง
+            self.logger.debug("Attempt %d to handle popup '%s'", task.attempt, window_title)
             
-            for attempt in range(max_retries):
-                self.logger.debug(f"Attempt {attempt + 1} to handle popup '{window_title}'")
-                
-                # First, try to find and click standard dialog buttons
-                if self._click_standard_dialog_button_with_retry(hwnd):
-                    self.logger.info(f"Clicked standard dialog button in '{window_title}' (attempt {attempt + 1})")
-                    
-                    # ตรวจสอบว่าปุ่มหายไปหรือยัง
-                    time.sleep(0.5)  # รอให้หน้าต่างประมวลผล
-                    if not self._popup_still_exists(hwnd):
-                        return True
-                    else:
-                        self.logger.debug(f"Popup still exists after standard click, retrying...")
-                        continue
-                
-                # If standard approach fails, try to find buttons by text
-                button_hwnd = self.detector.find_button_by_text(hwnd, self.config.target_buttons)
-                if button_hwnd:
-                    if self._click_button_enhanced(button_hwnd, window_title, attempt + 1):
-                        self.logger.info(f"Clicked 'No' button in '{window_title}' (attempt {attempt + 1})")
-                        
-                        # ตรวจสอบว่าปุ่มหายไปหรือยัง
-                        time.sleep(0.5)  # รอให้หน้าต่างประมวลผล
-                        if not self._popup_still_exists(hwnd):
-                            return True
-                        else:
-                            # ตรวจสอบว่าปุ่ม "no" ยังอยู่หรือไม่
-                            button_still_exists = self.detector.find_button_by_text(hwnd, self.config.target_buttons)
-                            if not button_still_exists:
-                                self.logger.info(f"No button disappeared after click")
-                                return True
-                            else:
-                                self.logger.debug(f"Button still exists, retrying...")
-                                continue
-                
-                # รอก่อนลองครั้งต่อไป
-                if attempt < max_retries - 1:
-                    time.sleep(0.3)
+            if task.rule is not None and task.rule.action in (CLOSE, CLICK_CONTROL):
+                started = perf_counter()
+                if task.rule.action == CLOSE:
+                    method = 'close' if self._close_window(hwnd, target) else None
+                else:
+                    method = 'control' if self._click_control(task, target) else None
+                phase_seconds.observe(perf_counter() - started, 'click')
+                if method:
+                    self.logger.info(f"Rule '{task.rule.name}' handled '{window_title}' (attempt {task.attempt})")
+                return method
             
-            self.logger.warning(f"Failed to handle popup '{window_title}' after {max_retries} attempts")
-            return False
+            # First, standard dialogs: look up the No button by its control ID
+            # (a rule with its own button texts wants something other than IDNO)
+            if not (task.rule is not None and task.rule.buttons) and task.window_class == STANDARD_DIALOG_CLASS:
+                started = perf_counter()
+                no_button = self.backend.get_dlg_item(hwnd, IDNO)
+                phase_seconds.observe(perf_counter() - started, 'button_search')
+                if no_button:
+                    self.stats['button_searches_avoided'] += 1
+                    if not self.backend.is_window_enabled(no_button):
+                        self.logger.debug("No button in '%s' is disabled, trying again later", window_title)
+                        return None
+                    started = perf_counter()
+                    clicked = self._press_button(task, no_button, DIALOG_METHODS, target)
+                    phase_seconds.observe(perf_counter() - started, 'click')
+                    if clicked:
+                        self.logger.info(f"Clicked standard dialog button in '{window_title}' (attempt {task.attempt})")
+                        return 'standard_dialog'
+                    return None
             
+            # No IDNO control - find the button by its text
+            started = perf_counter()
+            button_hwnd = self.detector.find_button_by_text(hwnd, self._target_buttons(task))
+            phase_seconds.observe(perf_counter() - started, 'button_search')
+            if button_hwnd:
+                started = perf_counter()
+                clicked = self._press_button(task, button_hwnd, BUTTON_METHODS, target)
+                phase_seconds.observe(perf_counter() - started, 'click')
+                if clicked:
+                    self.logger.info(f"Clicked 'No' button in '{window_title}' (attempt {task.attempt})")
+                    task.button_hwnd = button_hwnd
+                    return 'button_text'
         except Exception as e:
             self.logger.error(f"Error handling popup '{window_title}': {e}")
             self.stats['errors'] += 1
+        return None
+    
+    def _target_buttons(self, task: PopupTask) -> List[str]:
+        """Button texts to look for: the rule's own list, or the configured one"""
+        if task.rule is not None and task.rule.buttons:
+            return task.rule.buttons
+        return self.config.target_buttons
+    
+    def _close_window(self, hwnd: int, target: str = "unknown") -> bool:
+        """Ask the window to close (WM_CLOSE), posting it if the send fails"""
+        if self._send_message(hwnd, WM_CLOSE, 0, 0, target) is not None:
+            return True
+        return self.backend.post_message(hwnd, WM_CLOSE, 0, 0)
+    
+    def _click_control(self, task: PopupTask, target: str = "unknown") -> bool:
+        """
+        Click the control with the rule's control ID: the button itself if the
+        window has it, otherwise WM_COMMAND with that ID to the window
+        """
+        control_id = task.rule.control_id
+        button_hwnd = self.backend.get_dlg_item(task.hwnd, control_id)
+        if button_hwnd:
+            if self._press_button(task, button_hwnd, DIALOG_METHODS, target):
+                task.button_hwnd = button_hwnd
+                return True
             return False
+        return self._send_message(task.hwnd, WM_COMMAND, control_id, 0, target) is not None
+    
+    def _press_button(self, task: PopupTask, button_hwnd: int, methods, target: str = "unknown") -> bool:
+        """
+        Press a button of a popup with the method most likely to work for its
+        application, skipping methods already tried on this popup (once all of
+        them have been, the best ones are used again)
+        Returns True once a click was delivered - whether it worked is only
+        known when the popup is checked
+        """
+        order = self.strategies.order(task.process, task.window_class, methods)
+        untried = [method for method in order if method not in task.tried_methods]
+        for method in untried + [method for method in order if method in task.tried_methods]:
+            if method not in task.tried_methods:
+                task.tried_methods.append(method)
+            try:
+                if self._send_click(method, task.hwnd, button_hwnd, target):
+                    self.logger.debug("Clicked with %s (attempt %d)", method, task.attempt)
+                    task.click_method = method
+                    return True
+            except Exception as e:
+                self.logger.debug("Click with %s failed: %s", method, e)
+        return False
+    
+    def _send_click(self, method: str, dialog_hwnd: int, button_hwnd: int, target: str = "unknown") -> bool:
+        """
+        Deliver one click with the given method
+        Returns False if it couldn't be delivered (send timed out, no position for the mouse, ...)
+        """
+        if method == DIALOG_COMMAND:
+            # What the dialog would receive if the button were pressed
+            control_id = self.backend.get_dlg_ctrl_id(button_hwnd)
+            if self._send_message(dialog_hwnd, WM_COMMAND, control_id, 0, target) is not None:
+                return True
+            return self.backend.post_message(dialog_hwnd, WM_COMMAND, control_id, 0)
+        if method == SEND_BM_CLICK:
+            return self._send_message(button_hwnd, BM_CLICK, 0, 0, target) is not None
+        if method == MOUSE_CLICK:
+            return self._mouse_click(button_hwnd)
+        if method == BUTTON_MESSAGES:
+            # SendMessage returns once the button has handled each message - no waits needed
+            if self._send_message(button_hwnd, WM_LBUTTONDOWN, 1, 0, target) is None:
+                return False
+            return self._send_message(button_hwnd, WM_LBUTTONUP, 0, 0, target) is not None
+        if method == POST_BM_CLICK:
+            return self.backend.post_message(button_hwnd, BM_CLICK, 0, 0)
+        raise ValueError(f"unknown click method '{method}'")
+    
+    def _is_dismissed(self, task: PopupTask) -> bool:
+        """Check whether the last click got rid of the popup (called by the state machine)"""
+        started = perf_counter()
+        try:
+            return self._check_dismissed(task)
+        finally:
+            self.metrics.phase_seconds.observe(perf_counter() - started, 'verify')
+    
+    def _check_dismissed(self, task: PopupTask) -> bool:
+        """Look for the popup, and for the clicked button if there was one"""
+        # ตรวจสอบว่าปุ่มหายไปหรือยัง
+        if not self._popup_still_exists(task.hwnd):
+            return True
+        
+        if task.button_hwnd:
+            # ตรวจสอบว่าปุ่ม "no" ยังอยู่หรือไม่
+            if task.rule is not None and task.rule.action == CLICK_CONTROL:
+                if not self._popup_still_exists(task.button_hwnd):
+                    self.logger.info("Clicked control disappeared after click")
+                    return True
+            elif not self.detector.find_button_by_text(task.hwnd, self._target_buttons(task)):
+                self.logger.info("No button disappeared after click")
+                return True
+            self.logger.debug("Button still exists, retrying...")
+        else:
+            self.logger.debug("Popup still exists after standard click, retrying...")
+        return False
     
     def _click_button(self, button_hwnd: int) -> bool:
         """
@@ -172,132 +714,87 @@ class PopupBlocker:
         """
         return self._click_button_enhanced(button_hwnd, "unknown", 1)
     
-    def _click_button_enhanced(self, button_hwnd: int, window_title: str, attempt: int) -> bool:
+    def _send_message(self, hwnd: int, msg: int, wparam: int, lparam: int,
+                      target: str = "unknown") -> Optional[int]:
+        """
+        SendMessage that gives up after config.click_timeout_ms or if the
+        receiving thread is hung
+        Returns the message result, or None if the send failed or timed out
+        """
+        result = self.backend.send_message_timeout(hwnd, msg, wparam, lparam, SMTO_ABORTIFHUNG,
+                                                   self.config.click_timeout_ms)
+        if result is not None:
+            return result
+        
+        self.logger.debug("SendMessage 0x%04X to %s timed out (%s)", msg, hwnd, target)
+        self.dispatcher.record_timeout(target)
+        return None
+    
+    def _click_button_enhanced(self, button_hwnd: int, window_title: str, attempt: int,
+                               target: str = "unknown") -> bool:
         """
-        Enhanced button clicking with multiple methods and better error handling
+        Click a button with each method in turn until one is delivered
         Returns True if successful
         """
-        if not WINDOWS_AVAILABLE:
-            return False
-            
-        try:
-            self.logger.debug(f"Attempting to click button (method enhanced, attempt {attempt})")
-            
-            # Method 1: Send BM_CLICK message
+        self.logger.debug("Attempting to click button in '%s' (attempt %d)", window_title, attempt)
+        for method in BUTTON_METHODS:
             try:
-                result = ctypes.windll.user32.SendMessageW(button_hwnd, BM_CLICK, 0, 0)
-                time.sleep(0.2)  # รอให้ click ประมวลผล
-                if result is not None:  # ไม่ใช่ result == 0 เพราะอาจส่งคืนค่าอื่น
-                    self.logger.debug(f"BM_CLICK sent successfully")
+                if self._send_click(method, 0, button_hwnd, target):
+                    self.logger.debug("Clicked with %s", method)
                     return True
             except Exception as e:
-                self.logger.debug(f"BM_CLICK failed: {e}")
-            
-            # Method 2: Enhanced mouse click simulation
-            try:
-                rect = ctypes.wintypes.RECT()
-                if ctypes.windll.user32.GetWindowRect(button_hwnd, ctypes.byref(rect)):
-                    center_x = (rect.left + rect.right) // 2
-                    center_y = (rect.top + rect.bottom) // 2
-                    
-                    self.logger.debug(f"Clicking at position ({center_x}, {center_y})")
-                    
-                    # เก็บตำแหน่งเมาส์เดิม
-                    old_pos = ctypes.wintypes.POINT()
-                    ctypes.windll.user32.GetCursorPos(ctypes.byref(old_pos))
-                    
-                    # Set cursor position
-                    ctypes.windll.user32.SetCursorPos(center_x, center_y)
-                    time.sleep(0.1)
-                    
-                    # Multiple click attempts
-                    for i in range(2):  # คลิก 2 ครั้งเผื่อครั้งแรกไม่ติด
-                        # Left mouse down
-                        ctypes.windll.user32.mouse_event(0x0002, 0, 0, 0, 0)  # MOUSEEVENTF_LEFTDOWN
-                        time.sleep(0.05)
-                        # Left mouse up
-                        ctypes.windll.user32.mouse_event(0x0004, 0, 0, 0, 0)  # MOUSEEVENTF_LEFTUP
-                        time.sleep(0.1)
-                    
-                    # คืนตำแหน่งเมาส์เดิม
-                    ctypes.windll.user32.SetCursorPos(old_pos.x, old_pos.y)
-                    
-                    self.logger.debug(f"Mouse click completed")
-                    return True
-            except Exception as e:
-                self.logger.debug(f"Mouse click failed: {e}")
-            
-            # Method 3: Send WM_LBUTTONDOWN/UP messages directly to button
-            try:
-                ctypes.windll.user32.SendMessageW(button_hwnd, WM_LBUTTONDOWN, 1, 0)
-                time.sleep(0.05)
-                ctypes.windll.user32.SendMessageW(button_hwnd, WM_LBUTTONUP, 0, 0)
-                time.sleep(0.1)
-                self.logger.debug(f"Direct button message sent")
-                return True
-            except Exception as e:
-                self.logger.debug(f"Direct button message failed: {e}")
-            
-            # Method 4: Try PostMessage instead of SendMessage
-            try:
-                ctypes.windll.user32.PostMessageW(button_hwnd, BM_CLICK, 0, 0)
-                time.sleep(0.2)
-                self.logger.debug(f"PostMessage BM_CLICK sent")
-                return True
-            except Exception as e:
-                self.logger.debug(f"PostMessage failed: {e}")
-            
-            return False
-            
-        except Exception as e:
-            self.logger.error(f"Error in enhanced button click: {e}")
-            return False
+                self.logger.debug("Click with %s failed: %s", method, e)
+        return False
     
-    def _click_standard_dialog_button_with_retry(self, hwnd: int) -> bool:
+    def _mouse_click(self, button_hwnd: int) -> bool:
         """
-        Try to click standard dialog buttons with retry
-        Returns True if successful
+        Click the middle of a button with the real mouse cursor
+        Returns False if the button position can't be read
         """
-        if not WINDOWS_AVAILABLE:
+        bounds = self.backend.get_window_rect(button_hwnd)
+        if bounds is None:
             return False
+        
+        left, top, right, bottom = bounds
+        center_x = (left + right) // 2
+        center_y = (top + bottom) // 2
+        
+        self.logger.debug("Clicking at position (%d, %d)", center_x, center_y)
+        
+        # There is only one cursor - don't let two workers fight over it
+        with self._mouse_lock:
+            # เก็บตำแหน่งเมาส์เดิม
+            old_x, old_y = self.backend.get_cursor_pos()
             
-        try:
-            # Try IDNO multiple times with different methods
-            for i in range(2):
-                try:
-                    # Method 1: SendMessage
-                    result = ctypes.windll.user32.SendMessageW(hwnd, WM_COMMAND, IDNO, 0)
-                    time.sleep(0.2)
-                    if result is not None:
-                        return True
-                except Exception:
-                    pass
-                
-                try:
-                    # Method 2: PostMessage
-                    ctypes.windll.user32.PostMessageW(hwnd, WM_COMMAND, IDNO, 0)
-                    time.sleep(0.2)
-                    return True
-                except Exception:
-                    pass
+            # Set cursor position
+            self.backend.set_cursor_pos(center_x, center_y)
             
-            return False
+            # Multiple click attempts
+            for i in range(2):  # คลิก 2 ครั้งเผื่อครั้งแรกไม่ติด
+                self.backend.mouse_event(0x0002)  # MOUSEEVENTF_LEFTDOWN
+                self.backend.mouse_event(0x0004)  # MOUSEEVENTF_LEFTUP
             
-        except Exception as e:
-            self.logger.debug(f"Standard dialog approach failed: {e}")
-            return False
+            # Injected input is processed asynchronously - let it reach the button
+            # before the cursor moves away (dismissal itself is confirmed by polling)
+            time.sleep(MOUSE_SETTLE_SECONDS)
+            
+            # คืนตำแหน่งเมาส์เดิม
+            self.backend.set_cursor_pos(old_x, old_y)
+        return True
+    
+    def _get_class_name(self, hwnd: int) -> str:
+        try:
+            return self.backend.get_class_name(hwnd)
+        except Exception:
+            return ""
     
     def _popup_still_exists(self, hwnd: int) -> bool:
         """
         Check if popup window still exists and is visible
         """
-        if not WINDOWS_AVAILABLE:
-            return False
-            
         try:
             # ตรวจสอบว่าหน้าต่างยังมองเห็นได้หรือไม่
-            return bool(ctypes.windll.user32.IsWindowVisible(hwnd) and 
-                       ctypes.windll.user32.IsWindow(hwnd))
+            return self.backend.is_window_visible(hwnd) and self.backend.is_window(hwnd)
         except Exception:
             return False
     
@@ -307,6 +804,28 @@ class PopupBlocker:
         self.logger.info(f"Popups detected: {self.stats['popups_detected']}")
         self.logger.info(f"Buttons clicked: {self.stats['buttons_clicked']}")
         self.logger.info(f"Errors encountered: {self.stats['errors']}")
+        self.logger.info(f"Button searches avoided (IDNO lookup): {self.stats['button_searches_avoided']}")
+        self.logger.info(f"Learned click methods: {len(self.strategies)} applications")
+        if self.stats['backoff_skipped'] or self.stats['given_up']:
+            self.logger.info(f"Failed popups: {self.stats['backoff_skipped']} detections skipped, "
+                             f"{self.stats['given_up']} given up on")
+        
+        if self.stats['click_timeouts']:
+            timeouts = ", ".join(f"{target}: {count}" for target, count in
+                                 sorted(self.stats['click_timeouts'].items(), key=lambda item: -item[1]))
+            self.logger.info(f"Click timeouts / hung windows: {timeouts}")
+        
+        phases = self.metrics.phase_seconds.summary()
+        if phases:
+            timings = ", ".join(f"{phase} {total / count * 1000:.2f}ms" for phase, (count, total) in
+                                sorted(phases.items()) if count)
+            self.logger.info(f"Average phase time: {timings}")
+        
+        cache_stats = self.detector.get_cache_stats()
+        self.logger.info(f"Classification cache: {cache_stats['hits']} hits, "
+                         f"{cache_stats['misses']} misses ({cache_stats['hit_rate'] * 100:.1f}% hit rate)")
+        layout_stats = self.context.layout_cache.get_stats()
+        self.logger.info(f"Dialog layout cache: {layout_stats['hits']} hits, {layout_stats['misses']} misses")
         
         if self.stats['popups_detected'] > 0:
             success_rate = (self.stats['buttons_clicked'] / self.stats['popups_detected']) * 100
@@ -0,0 +1,274 @@
+"""
+Non-blocking popup handling: each popup is a small timer-driven state machine
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import time
+
+# Popup task states
+DETECTED = 'detected'
+CLICKING = 'clicking'
+VERIFYING = 'verifying'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class PopupTask:
+    """One popup being dismissed: detected -> clicking -> verifying -> done/failed"""
+
+    def __init__(self, hwnd: int, window_title: str, now: float):
+        self.hwnd = hwnd
+        self.window_title = window_title
+        self.state = DETECTED
+        self.attempt = 0
+        self.next_due = now
+        self.started_at = now
+        self.finished_at: Optional[float] = None
+        # Button that was clicked by the current attempt (None for the standard dialog path)
+        self.button_hwnd: Optional[int] = None
+        # Future of a click running on a worker thread
+        self.pending = None
+        # Owning process name, and how the last successful click was made
+        self.process = ""
+        self.method: Optional[str] = None
+        # Per-application rule that matched the window (None = built-in handling)
+        self.rule = None
+        # Window class, click method used by the current attempt and every method tried so far
+        self.window_class = ""
+        self.click_method: Optional[str] = None
+        self.tried_methods: List[str] = []
+        # Confirming the last click: when it was made, when to give up on it,
+        # and the current wait between checks
+        self.clicked_at: Optional[float] = None
+        self.verify_deadline = 0.0
+        self.verify_wait = 0.0
+        # Seconds from the successful click until the popup was confirmed gone
+        self.close_seconds: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (DONE, FAILED)
+
+    def __repr__(self):
+        return f"PopupTask(hwnd={self.hwnd}, state={self.state}, attempt={self.attempt})"
+
+
+class PopupHandlerScheduler:
+    """
+    Drives many PopupTasks at once without sleeping.
+    step() advances every task whose deadline has passed; the caller keeps
+    scanning in between and uses time_until_next() to decide how long it may wait.
+
+    click(task) performs one click attempt and returns True if something was
+    clicked. It may instead return a Future (the click runs elsewhere and the
+    task waits for it) or None if the click can't be started yet, in which
+    case it is retried later without using up an attempt.
+    is_dismissed(task) returns True once the popup is gone. After a click it
+    is checked after verify_interval, then at doubling intervals (at most
+    verify_max_interval apart) until verify_timeout has passed; only then does
+    the click count as failed. wake() checks a popup right away, e.g. when
+    a window event says it was destroyed or hidden.
+    """
+
+    def __init__(self, click: Callable[[PopupTask], Any],
+                 is_dismissed: Callable[[PopupTask], bool],
+                 max_attempts: int = 3, verify_timeout: float = 2.0, verify_interval: float = 0.005,
+                 verify_max_interval: float = 0.1, retry_delay: float = 0.3,
+                 poll_interval: float = 0.02, clock: Callable[[], float] = time.monotonic):
+        self.click = click
+        self.is_dismissed = is_dismissed
+        self.max_attempts = max_attempts
+        self.verify_timeout = verify_timeout
+        self.verify_interval = verify_interval
+        self.verify_max_interval = max(verify_interval, verify_max_interval)
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self.tasks: Dict[int, PopupTask] = {}
+
+    def add(self, hwnd: int, window_title: str) -> Optional[PopupTask]:
+        """Start handling a popup. Returns None if it is already being handled"""
+        if hwnd in self.tasks:
+            return None
+        task = PopupTask(hwnd, window_title, self.clock())
+        self.tasks[hwnd] = task
+        return task
+
+    def step(self) -> List[PopupTask]:
+        """Advance all due tasks. Returns the tasks that finished during this step"""
+        now = self.clock()
+        finished = []
+        for task in [t for t in self.tasks.values() if t.next_due <= now]:
+            self._advance(task, now)
+            if task.finished:
+                task.finished_at = self.clock()
+                del self.tasks[task.hwnd]
+                finished.append(task)
+        return finished
+
+    def wake(self, hwnd: int):
+        """Check a popup that is waiting for its click to take effect at the next step"""
+        task = self.tasks.get(hwnd)
+        if task is not None and task.state == VERIFYING:
+            task.next_due = min(task.next_due, self.clock())
+
+    def time_until_next(self) -> Optional[float]:
+        """Seconds until the next task is due (0 if overdue), or None if idle"""
+        if not self.tasks:
+            return None
+        next_due = min(task.next_due for task in self.tasks.values())
+        return max(0.0, next_due - self.clock())
+
+    def run_until_finished(self, task: PopupTask, sleep: Callable[[float], None] = time.sleep):
+        """Block until one task is finished (other tasks keep being advanced too)"""
+        while not task.finished:
+            wait = self.time_until_next()
+            if wait:
+                sleep(wait)
+            self.step()
+
+    def _advance(self, task: PopupTask, now: float):
+        """Run one state transition"""
+        if task.state in (DETECTED, CLICKING):
+            if task.pending is None:
+                task.attempt += 1
+                task.state = CLICKING
+                task.button_hwnd = None
+                result = self.click(task)
+                if result is None:
+                    # Couldn't start the click now (e.g. the target is busy)
+                    task.attempt -= 1
+                    task.next_due = now + self.retry_delay
+                    return
+                if hasattr(result, 'done'):
+                    task.pending = result
+                    task.next_due = now + self.poll_interval
+                    return
+                clicked = bool(result)
+            else:
+                if not task.pending.done():
+                    task.next_due = now + self.poll_interval
+                    return
+                try:
+                    clicked = bool(task.pending.result())
+                except Exception:
+                    clicked = False
+                task.pending = None
+
+            if clicked:
+                # Most windows are gone within milliseconds - start checking almost at once
+                task.state = VERIFYING
+                task.clicked_at = now
+                task.verify_deadline = now + self.verify_timeout
+                task.verify_wait = self.verify_interval
+                task.next_due = now + self.verify_interval
+            elif task.attempt < self.max_attempts:
+                task.next_due = now + self.retry_delay
+            else:
+                task.state = FAILED
+
+        elif task.state == VERIFYING:
+            if self.is_dismissed(task):
+                task.state = DONE
+                task.close_seconds = self.clock() - task.clicked_at
+            elif now < task.verify_deadline:
+                # Still there - back off and look again, up to the deadline
+                task.verify_wait = min(task.verify_wait * 2, self.verify_max_interval)
+                task.next_due = min(now + task.verify_wait, task.verify_deadline)
+            elif task.attempt < self.max_attempts:
+                task.state = CLICKING
+                task.next_due = now
+            else:
+                task.state = FAILED
+
+    def __contains__(self, hwnd: int) -> bool:
+        return hwnd in self.tasks
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+
+class FailureBackoff:
+    """
+    Memory of popups that could not be dismissed, so they aren't clicked
+    again every cycle. Failures are counted per HWND and per (process,
+    title) - the latter catches an application that keeps re-creating the
+    same popup. Each failure doubles the wait before the next try, from
+    base_delay up to max_delay; after max_failures the popup is left alone.
+    The HWND entry goes when the window closes; (process, title) entries
+    expire `expiry` seconds after their last failure.
+    """
+
+    def __init__(self, base_delay: float = 5.0, max_delay: float = 300.0, max_failures: int = 5,
+                 expiry: float = 3600.0, max_entries: int = 1024,
+                 clock: Callable[[], float] = time.monotonic):
+        self.base_delay = base_delay
+        self.max_delay = max(base_delay, max_delay)
+        self.max_failures = max_failures
+        self.expiry = expiry
+        self.max_entries = max_entries
+        self.clock = clock
+        # key -> [failures, retry_at, last_failure]; keys are HWNDs or (process, title)
+        self.entries: Dict[Any, list] = {}
+
+    def allowed(self, hwnd: int, process: str, window_title: str) -> bool:
+        """True if the popup may be clicked now"""
+        if not self.entries:
+            return True
+        now = self.clock()
+        for key in (hwnd, (process, window_title)):
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            if not isinstance(key, int) and now - entry[2] > self.expiry:
+                del self.entries[key]
+                continue
+            if now < entry[1]:
+                return False
+        return True
+
+    def record_failure(self, hwnd: int, process: str, window_title: str) -> Optional[float]:
+        """
+        Note a popup that survived every attempt
+        Returns seconds until it may be tried again, or None if it won't be
+        """
+        now = self.clock()
+        failures = 0
+        for key in (hwnd, (process, window_title)):
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = [0, now, now]
+            entry[0] += 1
+            entry[2] = now
+            failures = max(failures, entry[0])
+        if failures >= self.max_failures:
+            retry_at = float('inf')
+        else:
+            retry_at = now + min(self.max_delay, self.base_delay * 2 ** (failures - 1))
+        for key in (hwnd, (process, window_title)):
+            self.entries[key][1] = retry_at
+        self._trim()
+        return None if retry_at == float('inf') else retry_at - now
+
+    def record_success(self, hwnd: int, process: str, window_title: str):
+        self.entries.pop(hwnd, None)
+        self.entries.pop((process, window_title), None)
+
+    def forget(self, hwnd: int):
+        """The window closed"""
+        self.entries.pop(hwnd, None)
+
+    def due(self) -> List[int]:
+        """HWNDs whose wait is over, to be tried again without waiting for the window to change"""
+        now = self.clock()
+        return [key for key, entry in self.entries.items() if isinstance(key, int) and entry[1] <= now]
+
+    def _trim(self):
+        if len(self.entries) <= self.max_entries:
+            return
+        # Drop the entries whose last failure is oldest
+        for key, _ in sorted(self.entries.items(), key=lambda item: item[1][2])[:len(self.entries) - self.max_entries]:
+            del self.entries[key]
+
+    def __len__(self) -> int:
+        return len(self.entries)
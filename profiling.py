@@ -0,0 +1,139 @@
+"""
+Opt-in profiling of scan cycles: cProfile (.pstats) and sampled stacks
+(.collapsed, for flame graph tools) written next to the log file
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Optional
+import cProfile
+import os
+import sys
+import threading
+import time
+
+# Profiling modes
+CYCLES = 'cycles'  # profile the next N scans, then stop
+SAMPLE = 'sample'  # keep profiling one scan in every K
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval while active"""
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._thread_id: Optional[int] = None
+        self._active = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def begin(self, thread_id: int):
+        """Start sampling thread_id (normally the caller's thread)"""
+        self._thread_id = thread_id
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+        self._active.set()
+
+    def end(self):
+        self._active.clear()
+
+    def close(self):
+        self._stopped = True
+        self._active.set()
+
+    def write(self, path: str):
+        """Write 'frame;frame;frame count' lines"""
+        with self._lock:
+            stacks = self.stacks.most_common()
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks:
+                f.write(f"{stack} {count}\n")
+
+    def _run(self):
+        while True:
+            self._active.wait()
+            if self._stopped:
+                return
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                with self._lock:
+                    self.stacks[';'.join(reversed(names))] += 1
+            time.sleep(self.interval)
+
+
+class CycleProfiler:
+    """
+    Profiles selected scan cycles.
+    CYCLES mode profiles `cycles` consecutive scans, writes the output and
+    reports itself finished; SAMPLE mode profiles one scan in every `every`
+    and rewrites the output after each profiled scan.
+    """
+
+    def __init__(self, output_dir: str, mode: str = CYCLES, cycles: int = 10, every: int = 50,
+                 sample_stacks: bool = True):
+        self.mode = mode
+        self.cycles = max(1, cycles)
+        self.every = max(1, every)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        base = os.path.join(output_dir, f"popup_blocker_profile_{stamp}")
+        suffix = 1
+        while os.path.exists(base + '.pstats'):  # several profiles started in the same second
+            suffix += 1
+            base = os.path.join(output_dir, f"popup_blocker_profile_{stamp}_{suffix}")
+        self.pstats_path = base + '.pstats'
+        self.collapsed_path = base + '.collapsed'
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler() if sample_stacks else None
+        self.seen = 0
+        self.profiled = 0
+        self.finished = False
+
+    def run(self, fn: Callable, *args):
+        """Call fn(*args), profiling it if this cycle is selected"""
+        self.seen += 1
+        if self.finished or (self.mode == SAMPLE and (self.seen - 1) % self.every):
+            return fn(*args)
+
+        if self.sampler is not None:
+            self.sampler.begin(threading.get_ident())
+        self.profile.enable()
+        try:
+            return fn(*args)
+        finally:
+            self.profile.disable()
+            if self.sampler is not None:
+                self.sampler.end()
+            self.profiled += 1
+            if self.mode == SAMPLE:
+                self.write()
+            elif self.profiled >= self.cycles:
+                self.finish()
+
+    def write(self):
+        """Write what has been collected so far"""
+        self.profile.dump_stats(self.pstats_path)
+        if self.sampler is not None:
+            self.sampler.write(self.collapsed_path)
+
+    def finish(self):
+        """Write the output and stop profiling"""
+        if self.finished:
+            return
+        self.finished = True
+        if self.profiled:
+            self.write()
+        if self.sampler is not None:
+            self.sampler.close()
+
+
+def output_dir_for(log_file: Optional[str]) -> str:
+    """Profiles go next to the log file (or the working directory without one)"""
+    return os.path.dirname(os.path.abspath(log_file)) if log_file else os.getcwd()
@@ -0,0 +1,228 @@
+"""
+Per-application popup rules loaded from a JSON file and compiled into a
+lookup indexed by process name and window class
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import os
+import re
+
+# Rule actions
+CLICK_NO = 'click_no'            # click the 'No' button (the default handling)
+CLICK_CONTROL = 'click_control'  # click the control with control_id
+CLOSE = 'close'                  # send WM_CLOSE
+IGNORE = 'ignore'                # never treat the window as a popup
+ACTIONS = (CLICK_NO, CLICK_CONTROL, CLOSE, IGNORE)
+
+# Settings a rule file may override in its "defaults" section
+DEFAULT_KEYS = ('target_buttons', 'popup_classes', 'popup_title_keywords',
+                'min_popup_size', 'max_popup_size', 'ignored_processes')
+
+# Title patterns per bucket before a combined pre-filter pattern is worth building
+PREFILTER_THRESHOLD = 4
+
+
+class RuleError(ValueError):
+    """A rule file that can't be used"""
+
+
+class Rule:
+    """
+    One rule: optional process / class (exact, case-insensitive) and title
+    regex, and the action to take for windows that match all of them
+    """
+
+    def __init__(self, name: str, action: str, process: Optional[str] = None,
+                 class_name: Optional[str] = None, title: Optional[str] = None,
+                 control_id: Optional[int] = None, buttons: Optional[List[str]] = None,
+                 order: int = 0):
+        if action not in ACTIONS:
+            raise RuleError(f"rule '{name}': unknown action '{action}' (expected one of {', '.join(ACTIONS)})")
+        if action == CLICK_CONTROL and not isinstance(control_id, int):
+            raise RuleError(f"rule '{name}': action '{CLICK_CONTROL}' needs an integer control_id")
+        self.name = name
+        self.action = action
+        self.process = process.lower() if process else None
+        self.class_name = class_name.lower() if class_name else None
+        self.title = title
+        try:
+            self.title_pattern = re.compile(title, re.IGNORECASE) if title else None
+        except re.error as e:
+            raise RuleError(f"rule '{name}': bad title regex: {e}") from e
+        self.control_id = control_id
+        self.buttons = buttons
+        self.order = order
+
+    @classmethod
+    def from_dict(cls, data: dict, order: int) -> 'Rule':
+        if not isinstance(data, dict):
+            raise RuleError(f"rule #{order + 1} must be an object")
+        unknown = set(data) - {'name', 'action', 'process', 'class', 'title', 'control_id', 'buttons'}
+        if unknown:
+            raise RuleError(f"rule #{order + 1}: unknown field(s) {', '.join(sorted(unknown))}")
+        return cls(name=data.get('name') or f"rule #{order + 1}",
+                   action=data.get('action', CLICK_NO),
+                   process=data.get('process'),
+                   class_name=data.get('class'),
+                   title=data.get('title'),
+                   control_id=data.get('control_id'),
+                   buttons=data.get('buttons'),
+                   order=order)
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, action={self.action})"
+
+
+class _Bucket:
+    """Rules sharing one (process, class) key, in file order"""
+
+    def __init__(self):
+        self.rules: List[Rule] = []
+        # Rules without a title pattern match immediately; the first one ends the search
+        self.catch_all: Optional[Rule] = None
+        # Alternation of every title pattern: a window matching none of them is rejected in one search.
+        # Only built when no pattern has groups - joining them renumbers groups, which breaks backreferences
+        self.prefilter = None
+
+    def add(self, rule: Rule):
+        self.rules.append(rule)
+
+    def compile(self):
+        self.rules.sort(key=lambda rule: rule.order)
+        self.catch_all = next((rule for rule in self.rules if rule.title_pattern is None), None)
+        titled = [rule for rule in self.rules if rule.title_pattern is not None]
+        if len(titled) >= PREFILTER_THRESHOLD and all(rule.title_pattern.groups == 0 for rule in titled):
+            try:
+                self.prefilter = re.compile('|'.join(f'(?:{rule.title})' for rule in titled), re.IGNORECASE)
+            except re.error:
+                self.prefilter = None  # e.g. a pattern with inline flags - check them one by one
+
+    def first_match(self, title: str) -> Optional[Rule]:
+        if self.prefilter is not None and not self.prefilter.search(title):
+            return self.catch_all
+        for rule in self.rules:
+            if rule.title_pattern is None or rule.title_pattern.search(title):
+                return rule
+        return None
+
+
+class RuleEngine:
+    """
+    Compiled rules. evaluate() looks at no more than four buckets -
+    (process, class), (process, any), (any, class), (any, any) - so its cost
+    doesn't grow with rules for other applications. The earliest matching
+    rule in file order wins.
+    """
+
+    def __init__(self, rules: Iterable[Rule] = ()):
+        self.rules = list(rules)
+        self.buckets: Dict[Tuple[Optional[str], Optional[str]], _Bucket] = {}
+        for rule in self.rules:
+            key = (rule.process, rule.class_name)
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = _Bucket()
+            bucket.add(rule)
+        for bucket in self.buckets.values():
+            bucket.compile()
+        # Which processes/classes have rules at all, to skip pointless bucket lookups
+        self.processes = frozenset(rule.process for rule in self.rules if rule.process)
+        self.classes = frozenset(rule.class_name for rule in self.rules if rule.class_name)
+
+    def evaluate(self, process_name: str, class_name: str, title: str) -> Optional[Rule]:
+        """The rule that applies to a window, or None if no rule matches"""
+        if not self.buckets:
+            return None
+        process = process_name.lower() if process_name else None
+        window_class = class_name.lower() if class_name else None
+        if process not in self.processes:
+            process = None
+        if window_class not in self.classes:
+            window_class = None
+
+        if process is None:
+            keys = ((None, window_class), (None, None)) if window_class else ((None, None),)
+        elif window_class is None:
+            keys = ((process, None), (None, None))
+        else:
+            keys = ((process, window_class), (process, None), (None, window_class), (None, None))
+
+        best = None
+        for key in keys:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                continue
+            rule = bucket.first_match(title)
+            if rule is not None and (best is None or rule.order < best.order):
+                best = rule
+        return best
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+
+class RuleSet:
+    """The parsed contents of a rule file: setting overrides plus rules"""
+
+    def __init__(self, defaults: Optional[dict] = None, rules: Optional[List[Rule]] = None):
+        self.defaults = defaults or {}
+        self.rules = rules or []
+
+    def apply_defaults(self, config):
+        """Copy the file's setting overrides onto a Config"""
+        for key, value in self.defaults.items():
+            if key in ('min_popup_size', 'max_popup_size'):
+                value = tuple(value)
+            setattr(config, key, value)
+
+    def build_engine(self, ignored_processes: Iterable[str] = ()) -> RuleEngine:
+        """
+        Compile the file's rules, preceded by an ignore rule per ignored process
+        The ignore list always wins: no file rule can make those processes clickable
+        """
+        ignored = sorted(set(ignored_processes))
+        rules = [Rule(f"ignore {process}", IGNORE, process=process, order=order - len(ignored))
+                 for order, process in enumerate(ignored)]
+        return RuleEngine(rules + self.rules)
+
+
+def parse_rules(data: dict) -> RuleSet:
+    """Validate rule file contents; raises RuleError"""
+    if not isinstance(data, dict):
+        raise RuleError("rule file must contain a JSON object")
+    defaults = data.get('defaults', {})
+    if not isinstance(defaults, dict):
+        raise RuleError("'defaults' must be an object")
+    unknown = set(defaults) - set(DEFAULT_KEYS)
+    if unknown:
+        raise RuleError(f"unknown default(s) {', '.join(sorted(unknown))}")
+    for key in ('min_popup_size', 'max_popup_size'):
+        if key in defaults:
+            size = defaults[key]
+            if not (isinstance(size, list) and len(size) == 2 and all(isinstance(n, int) for n in size)):
+                raise RuleError(f"'{key}' must be [width, height]")
+    for key in ('target_buttons', 'popup_classes', 'popup_title_keywords', 'ignored_processes'):
+        if key in defaults and not (isinstance(defaults[key], list)
+                                    and all(isinstance(item, str) for item in defaults[key])):
+            raise RuleError(f"'{key}' must be a list of strings")
+
+    rules = data.get('rules', [])
+    if not isinstance(rules, list):
+        raise RuleError("'rules' must be a list")
+    return RuleSet(defaults, [Rule.from_dict(rule, order) for order, rule in enumerate(rules)])
+
+
+def load_rules(path: Optional[str]) -> RuleSet:
+    """
+    Read a rule file
+    A missing file gives an empty rule set; an invalid one raises RuleError
+    """
+    if not path or not os.path.exists(path):
+        return RuleSet()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RuleError(f"can't read {path}: {e}") from e
+    return parse_rules(data)
@@ -0,0 +1,131 @@
+"""
+Shared runtime context - config, logger, matchers and caches built once per process
+"""
+
+import copy
+import threading
+import time
+from typing import Optional, Tuple
+
+from config import Config, ConfigError
+from logger import Logger
+from detection_cache import ClassificationCache, ControlLayoutCache, ProcessNameCache
+from matchers import KeywordMatcher
+from metrics import MetricsRegistry
+from journal import EventJournal
+from rules import RuleEngine, RuleError, RuleSet, load_rules
+
+
+class ConfigSnapshot:
+    """
+    A config together with everything compiled from it. Built completely
+    before it is used, so a running blocker can switch to a new one in one step.
+    """
+
+    def __init__(self, config: Config, rule_set: RuleSet, overridden: Tuple[str, ...] = ()):
+        self.config = config
+        # Settings the rule file's defaults set but the settings file replaced
+        self.overridden = overridden
+        # Class and title keyword lists compiled once
+        self.class_matcher = KeywordMatcher(config.popup_classes)
+        self.title_matcher = KeywordMatcher(config.popup_title_keywords)
+        self.ignored_processes = frozenset(p.lower() for p in config.ignored_processes)
+        # Per-application rules, with ignored processes compiled in as ignore rules
+        self.rules: RuleEngine = rule_set.build_engine(self.ignored_processes)
+
+
+def load_snapshot(base: Config) -> ConfigSnapshot:
+    """
+    Apply the rule file's defaults and then the settings file to a copy of base,
+    so a setting in both files takes the settings file's value
+    Raises ConfigError or RuleError (and leaves base alone) if either can't be used
+    """
+    config = copy.deepcopy(base)
+    settings = config.read_settings(config.config_file)
+    rule_set = load_rules(config.rules_file)
+    rule_set.apply_defaults(config)
+    for key, value in settings.items():
+        setattr(config, key, value)
+    overridden = tuple(sorted(set(settings) & set(rule_set.defaults)))
+    return ConfigSnapshot(config, rule_set, overridden)
+
+
+class RuntimeContext:
+    """
+    Everything the blocker components share.
+    Building this parses the environment once and opens the log file once;
+    PopupBlocker and WindowDetector take it instead of creating their own.
+    """
+
+    def __init__(self, config: Optional[Config] = None, logger: Optional[Logger] = None):
+        start = time.perf_counter()
+
+        # Settings from the environment (or the caller); reloads start again from these
+        self.base_config = config or Config()
+        self.logger = logger or Logger(self.base_config)
+
+        # Verdicts for windows that haven't changed
+        self.classification_cache = ClassificationCache()
+
+        # Settings file and rule file on top, with matchers and rules compiled from the result
+        try:
+            snapshot = load_snapshot(self.base_config)
+        except (ConfigError, RuleError) as e:
+            self.logger.error(f"Error loading settings or rules, using built-in settings: {e}")
+            snapshot = ConfigSnapshot(copy.deepcopy(self.base_config), RuleSet())
+        self.apply_snapshot(snapshot)
+
+        # Process names by PID, and the child controls of dialogs being handled
+        self.process_cache = ProcessNameCache(self.config.process_cache_size,
+                                              self.config.process_cache_ttl)
+        self.layout_cache = ControlLayoutCache()
+        
+        # Phase timings and counters for the metrics endpoint
+        self.metrics = MetricsRegistry()
+        
+        # Structured record of detections, clicks and outcomes (None if disabled)
+        self.journal: Optional[EventJournal] = None
+        if self.config.journal_dir:
+            try:
+                self.journal = EventJournal(self.config.journal_dir, self.config.journal_segment_bytes,
+                                            self.config.journal_max_segments)
+            except Exception as e:
+                self.logger.error(f"Error opening event journal: {e}")
+
+        self.build_seconds = time.perf_counter() - start
+
+    def apply_snapshot(self, snapshot: ConfigSnapshot):
+        """
+        Switch to a new config snapshot (from the scanning thread, between cycles)
+        Cached verdicts were made under the old settings, so they are dropped
+        """
+        self.snapshot = snapshot
+        self.config = snapshot.config
+        self.class_matcher = snapshot.class_matcher
+        self.title_matcher = snapshot.title_matcher
+        self.ignored_processes = snapshot.ignored_processes
+        self.rules = snapshot.rules
+        self.classification_cache.clear()
+        for key in snapshot.overridden:
+            self.logger.warning(f"'{key}' is set in both {self.config.config_file} and "
+                                f"{self.config.rules_file} - using the value from {self.config.config_file}")
+
+    def get_startup_stats(self) -> dict:
+        """How long the context took to build and how often the log file was opened"""
+        return {
+            'build_seconds': self.build_seconds,
+            'log_file_opens': self.logger.writer.file_opens,
+        }
+
+
+_shared_context: Optional[RuntimeContext] = None
+_shared_lock = threading.Lock()
+
+
+def get_runtime() -> RuntimeContext:
+    """Get the process-wide runtime context, creating it on first use"""
+    global _shared_context
+    with _shared_lock:
+        if _shared_context is None:
+            _shared_context = RuntimeContext()
+        return _shared_context
@@ -0,0 +1,57 @@
+"""
+Adaptive scan interval: scan often while popups are showing up, rarely when idle
+"""
+
+from typing import Callable, Optional
+import time
+
+
+class AdaptiveScanScheduler:
+    """
+    Decides when the next full scan is due.
+    After a detection or a failed dismissal the interval drops to the floor;
+    every scan that finds nothing multiplies it by backoff, up to the ceiling.
+    """
+
+    def __init__(self, floor: float, ceiling: float, initial: Optional[float] = None,
+                 backoff: float = 2.0, clock: Callable[[], float] = time.monotonic):
+        self.floor = max(0.0, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.backoff = max(1.0, backoff)
+        self.clock = clock
+        self.interval = self._clamp(initial if initial is not None else self.floor)
+        self.next_due = self.clock()  # first scan right away
+
+    def due(self) -> bool:
+        """Check if a scan should run now"""
+        return self.clock() >= self.next_due
+
+    def time_until_due(self) -> float:
+        """Seconds until the next scan (0 if due)"""
+        return max(0.0, self.next_due - self.clock())
+
+    def record_scan(self, found: int, failures: int = 0) -> float:
+        """
+        Schedule the next scan based on what the scan that just ran found
+        Returns the new interval
+        """
+        if found or failures:
+            self.interval = self.floor
+        else:
+            self.interval = self._clamp(self.interval * self.backoff)
+        self.next_due = self.clock() + self.interval
+        return self.interval
+
+    def burst(self):
+        """Something happened outside a scan (event detection, failed dismissal) - scan again soon"""
+        self.interval = self.floor
+        self.next_due = min(self.next_due, self.clock() + self.floor)
+
+    def reset(self, initial: Optional[float] = None):
+        """Start over with a scan right away"""
+        if initial is not None:
+            self.interval = self._clamp(initial)
+        self.next_due = self.clock()
+
+    def _clamp(self, interval: float) -> float:
+        return min(self.ceiling, max(self.floor, interval))
@@ -0,0 +1,63 @@
+"""
+Shared test fixtures. The modules live at the top of the repository, so
+make them importable when pytest is started from anywhere
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from logger import Logger
+from runtime import RuntimeContext
+
+
+class FakeClock:
+    """A clock that only moves when told to"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def make_config(directory: str, **settings) -> Config:
+    """A config logging to a scratch directory, with no settings, rule, journal or strategy files"""
+    config = Config()
+    config.log_file = os.path.join(directory, 'test.log')
+    config.debug_mode = False
+    config.detection_mode = 'poll'
+    config.journal_dir = ''
+    config.config_file = ''
+    config.rules_file = ''
+    config.click_strategy_file = ''
+    for key, value in settings.items():
+        setattr(config, key, value)
+    return config
+
+
+def make_context(config: Config) -> RuntimeContext:
+    """A context for config whose logger doesn't write to the console"""
+    logger = Logger(config)
+    logger.writer.console = False
+    return RuntimeContext(config, logger)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def context(tmp_path):
+    """A fresh context (empty caches) with the make_config settings"""
+    context = make_context(make_config(str(tmp_path)))
+    yield context
+    context.logger.close()
@@ -0,0 +1,98 @@
+"""
+Learned click methods: ordering, persistence and learning from real clicks
+"""
+
+import json
+
+import pytest
+
+from click_strategy import (ClickStrategyStore, BUTTON_METHODS, DIALOG_METHODS, DIALOG_COMMAND,
+                            SEND_BM_CLICK, MOUSE_CLICK, POST_BM_CLICK)
+from conftest import make_config, make_context
+from desktop_simulator import DesktopSimulator, DIALOG
+from popup_blocker import PopupBlocker
+
+
+def test_order_learns_per_application():
+    store = ClickStrategyStore()
+    assert store.order('setup.exe', '#32770', DIALOG_METHODS) == list(DIALOG_METHODS)
+
+    for _ in range(3):
+        store.record('setup.exe', '#32770', DIALOG_COMMAND, False)
+    store.record('setup.exe', '#32770', MOUSE_CLICK, True)
+    order = store.order('setup.exe', '#32770', DIALOG_METHODS)
+    assert order[0] == MOUSE_CLICK
+    assert order[-1] == DIALOG_COMMAND
+    assert order[1:-1] == [m for m in DIALOG_METHODS if m not in (MOUSE_CLICK, DIALOG_COMMAND)]
+
+    # Other applications keep the default order
+    assert store.order('setup.exe', 'PopupWindow', BUTTON_METHODS) == list(BUTTON_METHODS)
+    assert store.success_rates('setup.exe', '#32770') == {DIALOG_COMMAND: (0, 3), MOUSE_CLICK: (1, 1)}
+
+
+def test_store_forgets_least_used_application():
+    store = ClickStrategyStore(max_entries=2)
+    store.record('a.exe', '#32770', SEND_BM_CLICK, True)
+    store.record('a.exe', '#32770', SEND_BM_CLICK, True)
+    store.record('b.exe', '#32770', SEND_BM_CLICK, True)
+    store.record('c.exe', '#32770', SEND_BM_CLICK, True)
+    assert len(store) == 2
+    assert store.success_rates('b.exe', '#32770') == {}
+    assert store.success_rates('a.exe', '#32770') == {SEND_BM_CLICK: (2, 2)}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'strategies.json')
+    store = ClickStrategyStore(path)
+    store.save()  # nothing recorded - no file
+    assert not (tmp_path / 'strategies.json').exists()
+
+    store.record('setup.exe', '#32770', POST_BM_CLICK, True)
+    store.record('setup.exe', '#32770', DIALOG_COMMAND, False)
+    store.save()
+    assert not store.dirty
+
+    loaded = ClickStrategyStore(path)
+    loaded.load()
+    assert loaded.entries == store.entries
+    assert loaded.order('setup.exe', '#32770', DIALOG_METHODS)[0] == POST_BM_CLICK
+
+
+def test_load_skips_malformed_entries(tmp_path):
+    path = tmp_path / 'strategies.json'
+    path.write_text(json.dumps({
+        'setup.exe|#32770': {'mouse': [1, 2], 'bm_click': 'x', 'post_bm_click': [3, 1],
+                             'button_messages': [1, 2, 3], 'dialog_command': None},
+        'agent.exe|#32770': [1, 2],
+        'helper.exe|#32770': {'mouse': [-1, 2]},
+    }), encoding='utf-8')
+    store = ClickStrategyStore(str(path))
+    store.load()
+    assert store.entries == {'setup.exe|#32770': {'mouse': [1, 2]}}
+
+    path.write_text('[1, 2]', encoding='utf-8')
+    store.load()
+    assert len(store) == 0
+
+    path.write_text('{"setup.exe|#32770": ', encoding='utf-8')
+    with pytest.raises(ValueError):
+        store.load()
+
+
+def test_blocker_records_and_saves_click_methods(tmp_path):
+    path = str(tmp_path / 'strategies.json')
+    context = make_context(make_config(str(tmp_path), click_strategy_file=path))
+    simulator = DesktopSimulator(window_count=10, popup_ratio=0.0, seed=9)
+    blocker = PopupBlocker(context, backend=simulator)
+    popup = simulator.spawn_popup(kind=DIALOG, hung=False)
+    process = simulator.processes[simulator.get_window_pid(popup)][1]
+
+    assert blocker._handle_popup(popup, simulator.get_window_text(popup))
+    assert blocker.strategies.success_rates(process, '#32770') == {DIALOG_COMMAND: (1, 1)}
+    blocker._save_strategies(force=True)
+    blocker.dispatcher.shutdown()
+    context.logger.close()
+
+    loaded = ClickStrategyStore(path)
+    loaded.load()
+    assert loaded.success_rates(process, '#32770') == {DIALOG_COMMAND: (1, 1)}
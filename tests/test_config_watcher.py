@@ -0,0 +1,105 @@
+"""
+Reloading the settings and rule files while the blocker runs
+"""
+
+import json
+import os
+
+import pytest
+
+from conftest import make_config, make_context
+from desktop_simulator import DesktopSimulator
+from popup_blocker import PopupBlocker
+
+
+def _write(path, data):
+    """Write a file and move its mtime on, so the change shows even on a coarse clock"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(data if isinstance(data, str) else json.dumps(data))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000_000))
+
+
+@pytest.fixture
+def files(tmp_path):
+    """(settings file, rule file) paths in tmp_path; both start out empty"""
+    settings, rules = str(tmp_path / 'settings.json'), str(tmp_path / 'rules.json')
+    _write(settings, {})
+    _write(rules, {})
+    return settings, rules
+
+
+def _make_blocker(tmp_path, files):
+    settings, rules = files
+    config = make_config(str(tmp_path), config_file=settings, rules_file=rules,
+                         check_interval=0.01, min_check_interval=0.01, max_check_interval=0.01)
+    context = make_context(config)
+    return PopupBlocker(context, backend=DesktopSimulator(window_count=10, popup_ratio=0.0, seed=1))
+
+
+def _stop(blocker):
+    blocker.dispatcher.shutdown()
+    blocker.logger.close()
+
+
+def test_changed_settings_apply_between_cycles(tmp_path, files):
+    _write(files[0], {'verify_timeout': 0.5})
+    blocker = _make_blocker(tmp_path, files)
+    old_snapshot = blocker.context.snapshot
+    assert blocker.config.verify_timeout == 0.5
+
+    _write(files[0], {'verify_timeout': 0.75})
+    assert blocker.config_watcher.check()
+    # Nothing changes until the scanning thread takes the snapshot
+    assert blocker.context.snapshot is old_snapshot
+    assert blocker.config.verify_timeout == 0.5
+
+    blocker.run_cycle()
+    assert blocker.context.snapshot is not old_snapshot
+    assert blocker.config.verify_timeout == 0.75
+    assert blocker.handlers.verify_timeout == 0.75
+    assert old_snapshot.config.verify_timeout == 0.5
+    assert blocker.stats['config_reloads'] == 1
+    assert not blocker.config_watcher.check()  # no further change
+    _stop(blocker)
+
+
+@pytest.mark.parametrize('contents', ['{"verify_timeout": ', {'no_such_setting': 1}, {'verify_timeout': 'soon'}])
+def test_bad_settings_file_keeps_current_snapshot(tmp_path, files, contents):
+    blocker = _make_blocker(tmp_path, files)
+    snapshot = blocker.context.snapshot
+
+    _write(files[0], contents)
+    assert not blocker.config_watcher.check()
+    assert blocker.config_watcher.rejected == 1
+    assert blocker.config_watcher.last_error
+    blocker.run_cycle()
+    assert blocker.context.snapshot is snapshot
+    assert blocker.stats['config_reloads'] == 0
+    _stop(blocker)
+
+
+def test_restart_setting_change_is_logged(tmp_path, files):
+    blocker = _make_blocker(tmp_path, files)
+    cursor = blocker.logger.log_buffer.next_seq
+
+    _write(files[0], {'click_workers': blocker.config.click_workers + 3})
+    assert blocker.config_watcher.check()
+    blocker.run_cycle()
+    logs, _ = blocker.logger.get_logs_since(cursor)
+    assert any("Setting 'click_workers' changed" in line for line in logs)
+    assert not any("Setting 'verify_timeout'" in line for line in logs)
+    _stop(blocker)
+
+
+def test_settings_file_beats_rule_file_defaults(tmp_path, files):
+    _write(files[0], {'target_buttons': ['Later']})
+    _write(files[1], {'defaults': {'target_buttons': ['Cancel'], 'popup_title_keywords': ['Nag']}})
+    blocker = _make_blocker(tmp_path, files)
+
+    assert blocker.config.target_buttons == ['Later']
+    assert blocker.config.popup_title_keywords == ['Nag']
+    assert blocker.context.snapshot.overridden == ('target_buttons',)
+    logs, _ = blocker.logger.get_logs_since(0)
+    assert any("'target_buttons' is set in both" in line for line in logs)
+    _stop(blocker)
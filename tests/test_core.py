@@ -0,0 +1,52 @@
+"""
+Runtime context and event-driven detection against the simulated desktop
+"""
+
+import time
+
+from conftest import make_config, make_context
+from desktop_simulator import DesktopSimulator, DIALOG
+from window_events import ScriptedEventSource
+from window_detector import WindowDetector
+from popup_blocker import PopupBlocker
+
+
+# --- RuntimeContext ---
+
+def test_context_opens_log_file_once(context):
+    simulator = DesktopSimulator(window_count=20, seed=1)
+    blocker = PopupBlocker(context, backend=simulator)
+    WindowDetector(context, simulator)
+    blocker.logger.info("one more line")
+    blocker.logger.flush()
+    blocker.dispatcher.shutdown()
+
+    stats = context.get_startup_stats()
+    assert stats['log_file_opens'] == 1
+    assert blocker.detector.context is context
+    assert stats['build_seconds'] > 0
+
+
+# --- event-driven detection ---
+
+def test_popup_dismissed_from_event_without_sweep(tmp_path):
+    context = make_context(make_config(str(tmp_path), detection_mode='event'))
+    simulator = DesktopSimulator(window_count=100, popup_ratio=0.0, seed=5)
+    popup = simulator.spawn_popup(kind=DIALOG, notify=False)
+    source = ScriptedEventSource([(0.05, popup)])
+    blocker = PopupBlocker(context, backend=simulator, event_source=source)
+
+    blocker.start_event_source()
+    assert blocker.events_active
+    # No sweep for the length of the test: only the scripted event can find the popup
+    blocker.scan_scheduler.next_due = time.monotonic() + 60
+    deadline = time.monotonic() + 5
+    while simulator.is_window(popup) and time.monotonic() < deadline:
+        blocker.run_cycle()
+    source.stop()
+    blocker.dispatcher.shutdown()
+    context.logger.close()
+
+    assert not simulator.is_window(popup)
+    assert blocker.stats['popups_detected'] == 1
+    assert context.metrics.windows_scanned.summary() == {}
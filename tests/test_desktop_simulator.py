@@ -0,0 +1,75 @@
+"""
+How the simulated desktop answers the messages the blocker sends, and the
+blocker dismissing its popups
+"""
+
+from desktop_simulator import (DesktopSimulator, DIALOG, CUSTOM, STUBBORN, WM_CLOSE, WM_COMMAND,
+                               BM_CLICK, MOUSEEVENTF_LEFTUP, IDNO)
+from popup_blocker import PopupBlocker
+
+
+def _button(simulator, popup, text):
+    return next(child for child in simulator.enum_child_windows(popup)
+                if simulator.get_window_text(child) == text)
+
+
+def test_dialog_answers_command_and_button_click():
+    simulator = DesktopSimulator(window_count=10, popup_ratio=0.0, seed=1)
+    by_command = simulator.spawn_popup(kind=DIALOG, hung=False)
+    by_click = simulator.spawn_popup(kind=DIALOG, hung=False)
+
+    simulator.send_message_timeout(by_command, WM_COMMAND, IDNO, 0, 0, 100)
+    simulator.post_message(_button(simulator, by_click, 'No'), BM_CLICK, 0, 0)
+
+    assert not simulator.is_window(by_command)
+    assert not simulator.is_window(by_click)
+    assert simulator.get_stats()['answers'] == {'No': 2}
+
+
+def test_custom_popup_only_answers_its_buttons():
+    simulator = DesktopSimulator(window_count=10, popup_ratio=0.0, seed=2)
+    popup = simulator.spawn_popup(kind=CUSTOM, hung=False)
+    no = _button(simulator, popup, 'No')
+    assert simulator.get_dlg_ctrl_id(no) == 0
+
+    simulator.send_message_timeout(popup, WM_COMMAND, IDNO, 0, 0, 100)
+    assert simulator.is_window(popup)
+
+    left, top, right, bottom = simulator.get_window_rect(no)
+    simulator.set_cursor_pos((left + right) // 2, (top + bottom) // 2)
+    simulator.mouse_event(MOUSEEVENTF_LEFTUP)
+    assert not simulator.is_window(popup)
+
+
+def test_stubborn_popup_ignores_everything():
+    simulator = DesktopSimulator(window_count=10, popup_ratio=0.0, seed=3)
+    popup = simulator.spawn_popup(kind=STUBBORN, hung=False)
+
+    simulator.send_message_timeout(popup, WM_COMMAND, IDNO, 0, 0, 100)
+    simulator.post_message(_button(simulator, popup, 'No'), BM_CLICK, 0, 0)
+    simulator.post_message(popup, WM_CLOSE, 0, 0)
+
+    assert simulator.open_popups() == [popup]
+    assert simulator.get_stats()['answers'] == {}
+
+
+def test_hung_popup_never_reads_its_queue():
+    simulator = DesktopSimulator(window_count=10, popup_ratio=0.0, seed=4)
+    popup = simulator.spawn_popup(kind=DIALOG, hung=True)
+
+    assert simulator.send_message_timeout(popup, WM_COMMAND, IDNO, 0, 0, 100) is None
+    assert simulator.post_message(popup, WM_COMMAND, IDNO, 0)
+    assert simulator.is_window(popup)
+
+
+def test_blocker_dismisses_simulated_popups(context):
+    simulator = DesktopSimulator(window_count=100, popup_ratio=0.0, seed=8)
+    blocker = PopupBlocker(context, backend=simulator)
+    blocker.handlers.verify_timeout = 0.1  # the stubborn popup waits this out on every attempt
+    dialog = simulator.spawn_popup(kind=DIALOG)
+    stubborn = simulator.spawn_popup(kind=STUBBORN)
+
+    assert blocker._handle_popup(dialog, simulator.get_window_text(dialog))
+    assert not simulator.is_window(dialog)
+    assert not blocker._handle_popup(stubborn, simulator.get_window_text(stubborn))
+    blocker.dispatcher.shutdown()
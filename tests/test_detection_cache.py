@@ -0,0 +1,109 @@
+"""
+Classification, process-name and dialog-layout caches, on their own and
+inside WindowDetector on the simulated desktop
+"""
+
+from desktop_simulator import DesktopSimulator, DIALOG
+from detection_cache import ClassificationCache, ProcessNameCache
+from window_detector import WindowDetector
+
+
+# --- ClassificationCache ---
+
+def test_classification_cache_counts_hits_misses_and_evictions():
+    cache = ClassificationCache()
+    assert cache.get(1, ('a',)) is None
+    cache.put(1, ('a',), True, 'Confirm')
+    assert cache.get(1, ('a',)) == (True, 'Confirm')
+    # A changed fingerprint throws the verdict away
+    assert cache.get(1, ('b',)) is None
+    cache.put(2, ('x',), False, '')
+    cache.retain({3})
+
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['entries']) == (1, 2, 2, 0)
+    assert stats['hit_rate'] == 1 / 3
+
+
+def test_detector_reclassifies_only_changed_windows(context):
+    simulator = DesktopSimulator(window_count=200, popup_ratio=0.05, seed=11)
+    detector = WindowDetector(context, simulator)
+    cache = context.classification_cache
+    hwnds = simulator.enum_windows()
+    popup = simulator.spawn_popup(kind=DIALOG, title='Confirm Save')
+    hwnds.append(popup)
+
+    verdicts = [detector._is_popup_window(hwnd) for hwnd in hwnds]
+    misses = cache.misses
+    assert [detector._is_popup_window(hwnd) for hwnd in hwnds] == verdicts
+    assert cache.misses == misses
+    assert cache.hits >= len(hwnds)
+
+    # A new title (different length) changes the fingerprint
+    simulator.windows[popup].title = 'Save changes to the document?'
+    assert detector._is_popup_window(popup)
+    assert cache.misses == misses + 1
+
+
+# --- ProcessNameCache ---
+
+def test_process_cache_expires_and_evicts_least_recent(clock):
+    cache = ProcessNameCache(max_entries=2, ttl=10.0, clock=clock)
+    cache.put(100, 1, 'setup.exe')
+    cache.put(200, 2, 'agent.exe')
+    assert cache.get(100) == 'setup.exe'
+    cache.put(300, 3, 'helper.exe')  # 200 is the least recently used
+    assert cache.get(200) is None
+    assert cache.evictions == 1
+
+    clock.advance(11.0)
+    assert cache.get(100) is None  # expired, but its creation time is kept
+    assert cache.creation_time(100) == 1
+    assert cache.revalidate(100, 1) == 'setup.exe'
+    assert cache.get(100) == 'setup.exe'
+    # A different creation time means the PID now belongs to another process
+    clock.advance(11.0)
+    assert cache.revalidate(100, 99) is None
+    assert cache.creation_time(100) is None
+
+
+def test_detector_notices_reused_pid_before_ttl(context):
+    simulator = DesktopSimulator(window_count=0, seed=1)
+    detector = WindowDetector(context, simulator)
+    popup = simulator.spawn_popup(kind=DIALOG)
+    pid = simulator.get_window_pid(popup)
+    assert detector._is_popup_window(popup)
+
+    # The PID is reused by an ignored process well within the cache TTL
+    simulator.processes[pid] = (123456, 'explorer.exe')
+    context.classification_cache.clear()
+    assert not detector._is_popup_window(popup)
+    assert detector.get_window_process_name(popup) == 'explorer.exe'
+
+    # ...and by an application again
+    simulator.processes[pid] = (654321, 'setup.exe')
+    context.classification_cache.clear()
+    assert detector._is_popup_window(popup)
+    assert detector.get_window_process_name(popup) == 'setup.exe'
+
+
+# --- ControlLayoutCache ---
+
+def test_button_added_after_lookup_is_found(context):
+    simulator = DesktopSimulator(window_count=0, seed=2)
+    detector = WindowDetector(context, simulator)
+    popup = simulator.spawn_popup(kind=DIALOG, hung=False)
+    window = simulator.windows[popup]
+    buttons, window.children = window.children, []
+
+    # The dialog draws its buttons after it first shows up
+    assert detector.find_button_by_text(popup, ['No']) is None
+    window.children = buttons
+    no_button = detector.find_button_by_text(popup, ['No'])
+    assert simulator.get_window_text(no_button) == 'No'
+
+    # A button relabelled while the dialog is open
+    simulator.windows[buttons[0]].title = 'Later'
+    assert detector.find_button_by_text(popup, ['Later']) == buttons[0]
+    assert detector.find_button_by_text(popup, ['No']) == no_button
+    assert context.layout_cache.get_stats()['hits'] > 0
@@ -0,0 +1,42 @@
+"""
+Event journal segments and retention
+"""
+
+import os
+
+from journal import EventJournal, JournalReader, DETECTED
+
+
+def _files(directory):
+    return sorted(os.listdir(directory))
+
+
+def test_journal_keeps_only_newest_segments(tmp_path):
+    directory = str(tmp_path)
+    journal = EventJournal(directory, segment_max_bytes=200, max_segments=3)
+    for i in range(40):
+        journal.record(DETECTED, h=i, p='setup.exe', w='Confirm Save')
+    journal.close()
+
+    assert journal.segment_number > 3
+    newest = journal.segment_number
+    kept = [f"segment-{n:06d}" for n in range(newest - 2, newest + 1)]
+    assert [name for name in _files(directory) if name.endswith('.jsonl')] == [f"{name}.jsonl" for name in kept]
+    assert all(name[:-len('.idx')] in kept for name in _files(directory) if name.endswith('.idx'))
+    handles = [record['h'] for record in JournalReader(directory).events()]
+    assert handles == list(range(handles[0], 40))
+
+    # Starting again opens a new segment and drops the oldest one
+    EventJournal(directory, segment_max_bytes=200, max_segments=3).close()
+    assert f"{kept[0]}.jsonl" not in _files(directory)
+    assert f"{kept[0]}.idx" not in _files(directory)
+
+
+def test_journal_without_limit_keeps_everything(tmp_path):
+    directory = str(tmp_path)
+    journal = EventJournal(directory, segment_max_bytes=200)
+    for i in range(40):
+        journal.record(DETECTED, h=i, p='setup.exe', w='Confirm Save')
+    journal.close()
+
+    assert [record['h'] for record in JournalReader(directory).events()] == list(range(40))
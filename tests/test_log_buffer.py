@@ -0,0 +1,57 @@
+"""
+In-memory log store: cursor reads across wrap-around, and Logger's
+formatted view of it
+"""
+
+from conftest import make_config
+from log_buffer import LogRingBuffer
+from logger import Logger, INFO
+
+
+def test_cursor_reads_only_new_records():
+    buffer = LogRingBuffer(capacity=8)
+    for i in range(5):
+        buffer.append(float(i), INFO, f"m{i}")
+
+    records, cursor = buffer.read_since(0, limit=3)
+    assert [r[3] for r in records] == ['m0', 'm1', 'm2']
+    records, cursor = buffer.read_since(cursor)
+    assert [r[3] for r in records] == ['m3', 'm4']
+    assert buffer.read_since(cursor) == ([], cursor)
+
+    buffer.append(5.0, INFO, 'm5')
+    records, cursor = buffer.read_since(cursor)
+    assert [r[3] for r in records] == ['m5']
+    assert cursor == buffer.next_seq == 6
+
+
+def test_overwritten_records_are_skipped():
+    buffer = LogRingBuffer(capacity=4)
+    for i in range(10):
+        buffer.append(float(i), INFO, f"m{i}")
+
+    assert len(buffer) == 4
+    records, cursor = buffer.read_since(2)
+    assert [r[3] for r in records] == ['m6', 'm7', 'm8', 'm9']
+    assert [r[0] for r in records] == [6, 7, 8, 9]
+    assert [r[3] for r in buffer.recent(2)] == ['m8', 'm9']
+
+    buffer.clear()
+    assert buffer.read_since(0) == ([], 10)
+    assert buffer.recent(0) == []
+
+
+def test_logger_entries_since_cursor(tmp_path):
+    logger = Logger(make_config(str(tmp_path), max_log_entries=3))
+    logger.writer.console = False
+    logger.info("first %s", 1)
+    entries, cursor = logger.get_logs_since(0)
+    assert len(entries) == 1 and entries[0].endswith("INFO: first 1")
+
+    for i in range(5):
+        logger.info(f"more {i}")
+    entries, cursor = logger.get_logs_since(cursor)
+    # Only the last max_log_entries are still in memory
+    assert [entry.split(": ", 1)[1] for entry in entries] == ['more 2', 'more 3', 'more 4']
+    assert logger.get_logs_since(cursor) == ([], cursor)
+    logger.close()
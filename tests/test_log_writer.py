@@ -0,0 +1,75 @@
+"""
+Batched background log writing and size-based rotation
+"""
+
+import gzip
+import os
+
+import log_writer
+from log_writer import AsyncLogWriter
+
+
+def _writer(path, **kwargs) -> AsyncLogWriter:
+    kwargs.setdefault('console', False)
+    return AsyncLogWriter(str(path), **kwargs)
+
+
+def test_writes_every_line_in_order(tmp_path):
+    path = tmp_path / 'app.log'
+    writer = _writer(path, batch_size=7, flush_interval=10.0)
+    for i in range(100):
+        writer.write(f"line {i}")
+    assert writer.flush()
+    writer.close()
+
+    assert path.read_text(encoding='utf-8').splitlines() == [f"line {i}" for i in range(100)]
+    assert writer.file_opens == 1
+
+
+def test_formatter_runs_on_writer_thread(tmp_path):
+    path = tmp_path / 'app.log'
+    writer = _writer(path, formatter=lambda record: f"<{record[0]}:{record[1]}>")
+    writer.write(('INFO', 'hello'))
+    writer.write("plain")
+    writer.close()
+    assert path.read_text(encoding='utf-8').splitlines() == ["<INFO:hello>", "plain"]
+
+
+def test_rotates_to_gzip_archives(tmp_path):
+    path = tmp_path / 'app.log'
+    writer = _writer(path, max_bytes=200, backup_count=2, batch_size=1)
+    for i in range(60):
+        writer.write(f"line {i:04d} " + "x" * 20)
+        writer.flush()
+    writer.close()
+
+    assert writer.rotations >= 3
+    assert os.path.exists(f"{path}.1.gz") and os.path.exists(f"{path}.2.gz")
+    assert not os.path.exists(f"{path}.3.gz")
+    with gzip.open(f"{path}.1.gz", 'rt', encoding='utf-8') as f:
+        archived = f.read().splitlines()
+    current = path.read_text(encoding='utf-8').splitlines()
+    # The newest archive ends where the current file starts
+    assert int(archived[-1].split()[1]) + 1 == int(current[0].split()[1])
+    assert current[-1].startswith("line 0059")
+
+
+def test_failed_rotation_keeps_logging(tmp_path, monkeypatch):
+    def broken_open(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(log_writer.gzip, 'open', broken_open)
+
+    path = tmp_path / 'app.log'
+    writer = _writer(path, max_bytes=100, backup_count=1, batch_size=1)
+    for i in range(20):
+        writer.write(f"line {i:04d} " + "x" * 20)
+        writer.flush()
+    writer.close()
+
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert lines[-1].startswith("line 0019")
+    assert len(lines) == 20
+    assert writer.rotations == 0
+    # Retried once the file grew by max_bytes again, not on every batch
+    assert 1 <= writer.rotation_failures <= 6
+    assert writer.dropped_errors == 0
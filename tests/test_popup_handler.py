@@ -0,0 +1,157 @@
+"""
+PopupHandlerScheduler and FailureBackoff driven by a fake clock
+"""
+
+from concurrent.futures import Future
+
+import pytest
+
+from popup_handler import PopupHandlerScheduler, FailureBackoff, DONE, FAILED, VERIFYING
+
+
+def _make_scheduler(clock, dismissed_after=None, max_attempts=3):
+    """A scheduler whose clicks always land; the popup goes away after dismissed_after checks"""
+    checks = []
+    clicks = []
+
+    def click(task):
+        clicks.append(clock())
+        return True
+
+    def is_dismissed(task):
+        checks.append(clock())
+        return dismissed_after is not None and len(checks) >= dismissed_after
+
+    scheduler = PopupHandlerScheduler(click, is_dismissed, max_attempts=max_attempts, verify_timeout=1.0,
+                                      verify_interval=0.01, verify_max_interval=0.08,
+                                      retry_delay=0.5, clock=clock)
+    return scheduler, clicks, checks
+
+
+def _run(scheduler, clock, limit=1000):
+    """Step until idle, jumping the clock straight to each deadline"""
+    finished = []
+    for _ in range(limit):
+        wait = scheduler.time_until_next()
+        if wait is None:
+            return finished
+        clock.advance(wait)
+        finished.extend(scheduler.step())
+    raise AssertionError("scheduler never went idle")
+
+
+def test_handler_checks_with_backoff_until_dismissed(clock):
+    scheduler, clicks, checks = _make_scheduler(clock, dismissed_after=4)
+    task = scheduler.add(1, 'Confirm')
+    assert scheduler.add(1, 'Confirm') is None
+
+    finished = _run(scheduler, clock)
+
+    assert finished == [task]
+    assert task.state == DONE
+    assert task.attempt == 1
+    assert len(clicks) == 1
+    # Checks 10 ms after the click, then 20, 40 and 80 ms apart
+    gaps = [round(b - a, 3) for a, b in zip([clicks[0]] + checks, checks)]
+    assert gaps == [0.01, 0.02, 0.04, 0.08]
+    assert task.close_seconds == pytest.approx(0.15)
+
+
+def test_handler_gives_up_after_max_attempts(clock):
+    scheduler, clicks, checks = _make_scheduler(clock, dismissed_after=None, max_attempts=2)
+    task = scheduler.add(1, 'Confirm')
+    started = clock()
+
+    _run(scheduler, clock)
+
+    assert task.state == FAILED
+    assert len(clicks) == 2
+    # Each attempt waits out the whole verify timeout before the next one
+    assert clicks[1] - clicks[0] == pytest.approx(1.0)
+    assert clock() - started == pytest.approx(2.0)
+
+
+def test_handler_waits_for_busy_target_and_pending_click(clock):
+    """A click that can't start yet costs no attempt; a Future is polled until done"""
+    future = Future()
+    results = [None, future]
+    scheduler = PopupHandlerScheduler(lambda task: results.pop(0), lambda task: True,
+                                      max_attempts=1, retry_delay=0.5, poll_interval=0.02, clock=clock)
+    task = scheduler.add(1, 'Confirm')
+
+    scheduler.step()
+    assert task.attempt == 0
+    assert scheduler.time_until_next() == pytest.approx(0.5)
+    clock.advance(0.5)
+    scheduler.step()
+    assert task.attempt == 1 and task.pending is future
+
+    clock.advance(0.02)
+    assert scheduler.step() == []
+    future.set_result(True)
+    finished = _run(scheduler, clock)
+    assert finished == [task] and task.state == DONE
+
+
+def test_handler_wake_checks_at_once(clock):
+    scheduler, clicks, checks = _make_scheduler(clock, dismissed_after=1)
+    task = scheduler.add(1, 'Confirm')
+    scheduler.step()
+    assert task.state == VERIFYING
+    assert scheduler.time_until_next() == pytest.approx(0.01)
+
+    scheduler.wake(1)
+    assert scheduler.time_until_next() == 0
+    assert scheduler.step() == [task]
+    assert task.state == DONE
+
+
+# --- FailureBackoff ---
+
+def test_backoff_doubles_up_to_limit_then_gives_up(clock):
+    backoff = FailureBackoff(base_delay=5.0, max_delay=12.0, max_failures=4, clock=clock)
+    assert backoff.allowed(100, 'setup.exe', 'Confirm Save')
+
+    assert backoff.record_failure(100, 'setup.exe', 'Confirm Save') == 5.0
+    assert not backoff.allowed(100, 'setup.exe', 'Confirm Save')
+    assert backoff.due() == []
+    clock.advance(5.0)
+    assert backoff.allowed(100, 'setup.exe', 'Confirm Save')
+    assert backoff.due() == [100]
+
+    assert backoff.record_failure(100, 'setup.exe', 'Confirm Save') == 10.0
+    assert backoff.record_failure(100, 'setup.exe', 'Confirm Save') == 12.0
+    assert backoff.record_failure(100, 'setup.exe', 'Confirm Save') is None
+    clock.advance(1e6)
+    assert not backoff.allowed(100, 'setup.exe', 'Confirm Save')
+    assert backoff.due() == []
+
+
+def test_backoff_follows_recreated_popups_until_expiry(clock):
+    backoff = FailureBackoff(base_delay=5.0, expiry=60.0, clock=clock)
+    backoff.record_failure(100, 'setup.exe', 'Confirm Save')
+    backoff.forget(100)
+
+    # The application shows the same popup again in a new window
+    assert not backoff.allowed(104, 'setup.exe', 'Confirm Save')
+    assert backoff.allowed(104, 'setup.exe', 'Warning')
+    assert backoff.record_failure(104, 'setup.exe', 'Confirm Save') == 10.0
+
+    clock.advance(61.0)
+    backoff.forget(104)
+    assert backoff.allowed(108, 'setup.exe', 'Confirm Save')
+    assert len(backoff) == 0
+
+
+def test_backoff_success_and_trim(clock):
+    backoff = FailureBackoff(max_entries=4, clock=clock)
+    backoff.record_failure(100, 'setup.exe', 'Confirm Save')
+    backoff.record_success(100, 'setup.exe', 'Confirm Save')
+    assert len(backoff) == 0
+    assert backoff.allowed(100, 'setup.exe', 'Confirm Save')
+
+    for hwnd in (200, 204, 208):
+        clock.advance(1.0)
+        backoff.record_failure(hwnd, 'agent.exe', f'Alert {hwnd}')
+    assert len(backoff) == 4
+    assert 200 not in backoff.entries and ('agent.exe', 'Alert 200') not in backoff.entries
@@ -0,0 +1,51 @@
+"""
+Rule evaluation order, the ignore list and the title pre-filter
+"""
+
+from rules import RuleSet, Rule, RuleEngine, parse_rules, CLICK_NO, CLICK_CONTROL, CLOSE, IGNORE
+
+
+def test_earliest_rule_in_file_wins_across_buckets():
+    rule_set = parse_rules({'rules': [
+        {'name': 'close warnings', 'action': 'close', 'title': 'warning'},
+        {'name': 'setup dialogs', 'action': 'click_control', 'control_id': 2,
+         'process': 'setup.exe', 'class': '#32770'},
+        {'name': 'setup anything', 'action': 'ignore', 'process': 'Setup.exe'},
+    ]})
+    engine = rule_set.build_engine()
+
+    assert engine.evaluate('SETUP.EXE', '#32770', 'Warning').name == 'close warnings'
+    assert engine.evaluate('setup.exe', '#32770', 'Install').action == CLICK_CONTROL
+    assert engine.evaluate('setup.exe', 'PopupWindow', 'Install').action == IGNORE
+    assert engine.evaluate('notepad.exe', 'Notepad', 'notes.txt') is None
+
+
+def test_ignore_list_beats_broad_rules():
+    rule_set = RuleSet(rules=[Rule('click everything', CLICK_NO, order=0)])
+    engine = rule_set.build_engine(['updater.exe', 'helper.exe'])
+
+    assert engine.evaluate('updater.exe', '#32770', 'Update Notification').action == IGNORE
+    assert engine.evaluate('agent.exe', '#32770', 'Update Notification').action == CLICK_NO
+
+
+def test_prefilter_rejects_titles_without_changing_results():
+    rules = [Rule(f'close {word}', CLOSE, title=word, order=order)
+             for order, word in enumerate(('update', 'warning', 'alert', 'confirm'))]
+    engine = RuleEngine(rules + [Rule('fallback', CLICK_NO, order=len(rules))])
+    bucket = engine.buckets[(None, None)]
+
+    assert bucket.prefilter is not None
+    assert engine.evaluate('agent.exe', '#32770', 'Confirm Save').name == 'close confirm'
+    assert engine.evaluate('agent.exe', '#32770', 'Message from webpage').name == 'fallback'
+
+
+def test_backreferences_match_without_prefilter():
+    rules = [Rule('updates', CLOSE, title=r'(update) available', order=0),
+             Rule('repeated word', CLICK_NO, title=r'\b(\w+) or \1\b', order=1),
+             Rule('warnings', CLOSE, title='warning', order=2),
+             Rule('alerts', CLOSE, title='alert', order=3)]
+    engine = RuleEngine(rules)
+
+    assert engine.buckets[(None, None)].prefilter is None
+    assert engine.evaluate('agent.exe', '#32770', 'Save or save?').name == 'repeated word'
+    assert engine.evaluate('agent.exe', '#32770', 'Save or discard?') is None
@@ -0,0 +1,36 @@
+"""
+Adaptive scan interval driven by a fake clock, and the limits Config gives it
+"""
+
+import pytest
+
+from config import Config
+from scan_scheduler import AdaptiveScanScheduler
+
+
+def test_scan_interval_backs_off_and_bursts(clock):
+    scheduler = AdaptiveScanScheduler(floor=0.5, ceiling=4.0, clock=clock)
+    assert scheduler.due()
+
+    intervals = [scheduler.record_scan(0) for _ in range(5)]
+    assert intervals == [1.0, 2.0, 4.0, 4.0, 4.0]
+    assert not scheduler.due()
+    clock.advance(4.0)
+    assert scheduler.due()
+
+    assert scheduler.record_scan(1) == 0.5
+    scheduler.record_scan(0)
+    scheduler.burst()
+    assert scheduler.interval == 0.5
+    assert scheduler.time_until_due() == pytest.approx(0.5)
+
+    assert scheduler.record_scan(0, failures=1) == 0.5
+
+
+def test_max_interval_defaults_to_check_interval(monkeypatch):
+    monkeypatch.setenv('CHECK_INTERVAL', '1.5')
+    monkeypatch.delenv('MAX_CHECK_INTERVAL', raising=False)
+    assert Config().max_check_interval == 1.5
+
+    monkeypatch.setenv('MAX_CHECK_INTERVAL', '10')
+    assert Config().max_check_interval == 10.0
@@ -0,0 +1,28 @@
+"""
+Change scanning against the simulated desktop
+"""
+
+from desktop_simulator import DesktopSimulator, DIALOG
+from window_detector import WindowDetector
+
+
+def test_scan_changes_reports_only_differences(context):
+    simulator = DesktopSimulator(window_count=300, popup_ratio=0.05, stubborn_ratio=0.0, seed=7)
+    detector = WindowDetector(context, simulator)
+
+    first = detector.scan_changes()
+    assert sorted(hwnd for hwnd, _ in first.new_popups) == sorted(simulator.open_popups())
+
+    second = detector.scan_changes()
+    assert not second
+    assert second.new_popups == [] and second.closed_popups == []
+
+    popup = simulator.spawn_popup(kind=DIALOG, title='Confirm Save')
+    third = detector.scan_changes()
+    assert third.added == [popup]
+    assert third.new_popups == [(popup, 'Confirm Save')]
+
+    simulator.close(popup)
+    fourth = detector.scan_changes()
+    assert fourth.removed == [popup]
+    assert fourth.closed_popups == [popup]
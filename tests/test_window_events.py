@@ -0,0 +1,45 @@
+"""
+Window event delivery: the candidate queue and the WinEvent callback
+(run against the simulated desktop as its backend)
+"""
+
+from desktop_simulator import DesktopSimulator, DIALOG
+from window_events import (CandidateQueue, WinEventHookSource, EVENT_OBJECT_DESTROY, EVENT_OBJECT_HIDE,
+                           EVENT_OBJECT_NAMECHANGE, EVENT_OBJECT_SHOW, OBJID_WINDOW, CHILDID_SELF)
+
+
+def test_queue_returns_each_window_once():
+    queue = CandidateQueue()
+    for hwnd in (1, 2, 1, 3, 2):
+        queue.put(hwnd)
+    assert queue.drain(0) == [1, 2, 3]
+    assert queue.drain(0) == []
+
+
+def _source():
+    simulator = DesktopSimulator(window_count=0, seed=1)
+    source = WinEventHookSource(simulator)
+    source.queue = CandidateQueue()
+    return simulator, source
+
+
+def test_control_events_queue_the_dialog():
+    simulator, source = _source()
+    popup = simulator.spawn_popup(kind=DIALOG)
+    button = simulator.windows[popup].children[-1]
+
+    source._on_event(0, EVENT_OBJECT_NAMECHANGE, button, OBJID_WINDOW, CHILDID_SELF, 0, 0)
+    source._on_event(0, EVENT_OBJECT_SHOW, popup, 5, CHILDID_SELF, 0, 0)  # not a window object
+    assert source.queue.drain(0) == [popup]
+
+
+def test_destroy_and_hide_events_are_delivered():
+    simulator, source = _source()
+    hidden = simulator.spawn_popup(kind=DIALOG)
+    destroyed = simulator.spawn_popup(kind=DIALOG)
+    simulator.close(destroyed)
+
+    source._on_event(0, EVENT_OBJECT_HIDE, hidden, OBJID_WINDOW, CHILDID_SELF, 0, 0)
+    # A destroyed window has no ancestor any more - it is queued as it is
+    source._on_event(0, EVENT_OBJECT_DESTROY, destroyed, OBJID_WINDOW, CHILDID_SELF, 0, 0)
+    assert source.queue.drain(0) == [hidden, destroyed]
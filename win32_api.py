@@ -0,0 +1,276 @@
+"""
+Thin, allocation-light wrapper around the user32/kernel32 calls the blocker uses.
+Prototypes are declared once, text/rect buffers are reused per thread and the
+enumeration callback is created once instead of on every scan.
+"""
+
+from typing import List, Optional, Tuple
+import threading
+
+import ctypes
+import ctypes.wintypes as wt
+
+from window_backend import WindowBackend
+from window_events import WinEventHookSource
+
+# WINFUNCTYPE only exists on Windows; CFUNCTYPE lets the layer run over a fake DLL elsewhere
+_FUNCTYPE = getattr(ctypes, 'WINFUNCTYPE', ctypes.CFUNCTYPE)
+WNDENUMPROC = _FUNCTYPE(wt.BOOL, wt.HWND, wt.LPARAM)
+
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+GWL_STYLE = -16
+TEXT_BUFFER_SIZE = 512
+CLASS_BUFFER_SIZE = 256
+PATH_BUFFER_SIZE = 260
+
+# name: (restype, argtypes)
+_USER32_PROTOTYPES = {
+    'EnumWindows': (wt.BOOL, [WNDENUMPROC, wt.LPARAM]),
+    'EnumChildWindows': (wt.BOOL, [wt.HWND, WNDENUMPROC, wt.LPARAM]),
+    'GetWindowTextW': (ctypes.c_int, [wt.HWND, wt.LPWSTR, ctypes.c_int]),
+    'GetWindowTextLengthW': (ctypes.c_int, [wt.HWND]),
+    'GetClassNameW': (ctypes.c_int, [wt.HWND, wt.LPWSTR, ctypes.c_int]),
+    'GetWindowRect': (wt.BOOL, [wt.HWND, ctypes.POINTER(wt.RECT)]),
+    'GetWindowLongW': (wt.LONG, [wt.HWND, ctypes.c_int]),
+    'GetWindowThreadProcessId': (wt.DWORD, [wt.HWND, ctypes.POINTER(wt.DWORD)]),
+    'IsWindow': (wt.BOOL, [wt.HWND]),
+    'IsWindowVisible': (wt.BOOL, [wt.HWND]),
+    'IsWindowEnabled': (wt.BOOL, [wt.HWND]),
+    'IsHungAppWindow': (wt.BOOL, [wt.HWND]),
+    'GetAncestor': (wt.HWND, [wt.HWND, wt.UINT]),
+    'GetDlgItem': (wt.HWND, [wt.HWND, ctypes.c_int]),
+    'GetDlgCtrlID': (ctypes.c_int, [wt.HWND]),
+    'SendMessageTimeoutW': (wt.LPARAM, [wt.HWND, wt.UINT, wt.WPARAM, wt.LPARAM, wt.UINT, wt.UINT,
+                                        ctypes.POINTER(ctypes.c_size_t)]),
+    'PostMessageW': (wt.BOOL, [wt.HWND, wt.UINT, wt.WPARAM, wt.LPARAM]),
+    'GetCursorPos': (wt.BOOL, [ctypes.POINTER(wt.POINT)]),
+    'SetCursorPos': (wt.BOOL, [ctypes.c_int, ctypes.c_int]),
+    'mouse_event': (None, [wt.DWORD, wt.DWORD, wt.DWORD, wt.DWORD, ctypes.c_size_t]),
+}
+
+_KERNEL32_PROTOTYPES = {
+    'OpenProcess': (wt.HANDLE, [wt.DWORD, wt.BOOL, wt.DWORD]),
+    'CloseHandle': (wt.BOOL, [wt.HANDLE]),
+    'QueryFullProcessImageNameW': (wt.BOOL, [wt.HANDLE, wt.DWORD, wt.LPWSTR, ctypes.POINTER(wt.DWORD)]),
+    'GetProcessTimes': (wt.BOOL, [wt.HANDLE] + [ctypes.POINTER(wt.FILETIME)] * 4),
+}
+
+
+def _declare(library, prototypes: dict):
+    """Set restype/argtypes once so ctypes doesn't guess conversions on every call"""
+    for name, (restype, argtypes) in prototypes.items():
+        function = getattr(library, name)
+        function.restype = restype
+        function.argtypes = argtypes
+
+
+class _ThreadBuffers(threading.local):
+    """Scratch buffers, one set per thread (click workers call in concurrently)"""
+
+    def __init__(self):
+        self.text = ctypes.create_unicode_buffer(TEXT_BUFFER_SIZE)
+        self.class_name = ctypes.create_unicode_buffer(CLASS_BUFFER_SIZE)
+        self.path = ctypes.create_unicode_buffer(PATH_BUFFER_SIZE)
+        self.rect = wt.RECT()
+        self.point = wt.POINT()
+        self.dword = wt.DWORD()
+        self.result = ctypes.c_size_t()
+        self.filetimes = [wt.FILETIME() for _ in range(4)]
+        self.collected: List[int] = []
+
+
+class Win32Api(WindowBackend):
+    """
+    WindowBackend over the real user32/kernel32.
+    Pass user32/kernel32 objects to run over something other than the real DLLs.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, user32=None, kernel32=None):
+        # Private DLL handles, so our prototypes don't change ctypes.windll for other code
+        self.user32 = user32 if user32 is not None else ctypes.WinDLL('user32')
+        self.kernel32 = kernel32 if kernel32 is not None else ctypes.WinDLL('kernel32')
+        _declare(self.user32, _USER32_PROTOTYPES)
+        _declare(self.kernel32, _KERNEL32_PROTOTYPES)
+
+        # Bound functions looked up once
+        u, k = self.user32, self.kernel32
+        self._EnumWindows = u.EnumWindows
+        self._EnumChildWindows = u.EnumChildWindows
+        self._GetWindowTextW = u.GetWindowTextW
+        self._GetWindowTextLengthW = u.GetWindowTextLengthW
+        self._GetClassNameW = u.GetClassNameW
+        self._GetWindowRect = u.GetWindowRect
+        self._GetWindowLongW = u.GetWindowLongW
+        self._GetWindowThreadProcessId = u.GetWindowThreadProcessId
+        self._IsWindow = u.IsWindow
+        self._IsWindowVisible = u.IsWindowVisible
+        self._IsWindowEnabled = u.IsWindowEnabled
+        self._IsHungAppWindow = u.IsHungAppWindow
+        self._GetAncestor = u.GetAncestor
+        self._GetDlgItem = u.GetDlgItem
+        self._GetDlgCtrlID = u.GetDlgCtrlID
+        self._SendMessageTimeoutW = u.SendMessageTimeoutW
+        self._PostMessageW = u.PostMessageW
+        self._GetCursorPos = u.GetCursorPos
+        self._SetCursorPos = u.SetCursorPos
+        self._mouse_event = u.mouse_event
+        self._OpenProcess = k.OpenProcess
+        self._CloseHandle = k.CloseHandle
+        self._QueryFullProcessImageNameW = k.QueryFullProcessImageNameW
+        self._GetProcessTimes = k.GetProcessTimes
+
+        self._buffers = _ThreadBuffers()
+
+        # One callback for every enumeration; it appends to the calling thread's list
+        self._enum_proc = WNDENUMPROC(self._collect_hwnd)
+
+    @classmethod
+    def default(cls) -> 'Win32Api':
+        """The shared instance over the real DLLs"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    # --- enumeration ---
+
+    def _collect_hwnd(self, hwnd, lparam):
+        self._buffers.collected.append(hwnd)
+        return True
+
+    def enum_windows(self) -> List[int]:
+        """All top-level windows, in Z order"""
+        buffers = self._buffers
+        buffers.collected = hwnds = []
+        self._EnumWindows(self._enum_proc, 0)
+        buffers.collected = []
+        return hwnds
+
+    def enum_child_windows(self, parent_hwnd: int) -> List[int]:
+        """All descendants of a window"""
+        buffers = self._buffers
+        buffers.collected = hwnds = []
+        self._EnumChildWindows(parent_hwnd, self._enum_proc, 0)
+        buffers.collected = []
+        return hwnds
+
+    # --- window properties ---
+
+    def get_window_text(self, hwnd: int) -> str:
+        """Window title / control text"""
+        buffer = self._buffers.text
+        length = self._GetWindowTextW(hwnd, buffer, TEXT_BUFFER_SIZE)
+        if length >= TEXT_BUFFER_SIZE - 1:
+            # Rare long title - fall back to an exact-size buffer
+            size = self._GetWindowTextLengthW(hwnd) + 1
+            buffer = ctypes.create_unicode_buffer(size)
+            self._GetWindowTextW(hwnd, buffer, size)
+        return buffer.value
+
+    def get_window_text_length(self, hwnd: int) -> int:
+        return self._GetWindowTextLengthW(hwnd)
+
+    def get_class_name(self, hwnd: int) -> str:
+        buffer = self._buffers.class_name
+        self._GetClassNameW(hwnd, buffer, CLASS_BUFFER_SIZE)
+        return buffer.value
+
+    def get_window_rect(self, hwnd: int) -> Optional[Tuple[int, int, int, int]]:
+        """(left, top, right, bottom), or None if it can't be read"""
+        rect = self._buffers.rect
+        if self._GetWindowRect(hwnd, ctypes.byref(rect)):
+            return rect.left, rect.top, rect.right, rect.bottom
+        return None
+
+    def get_window_style(self, hwnd: int) -> int:
+        return self._GetWindowLongW(hwnd, GWL_STYLE)
+
+    def get_window_pid(self, hwnd: int) -> int:
+        pid = self._buffers.dword
+        pid.value = 0
+        self._GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        return pid.value
+
+    def is_window(self, hwnd: int) -> bool:
+        return bool(self._IsWindow(hwnd))
+
+    def is_window_visible(self, hwnd: int) -> bool:
+        return bool(self._IsWindowVisible(hwnd))
+
+    def is_window_enabled(self, hwnd: int) -> bool:
+        return bool(self._IsWindowEnabled(hwnd))
+
+    def is_hung(self, hwnd: int) -> bool:
+        return bool(self._IsHungAppWindow(hwnd))
+
+    def get_ancestor(self, hwnd: int, flags: int) -> Optional[int]:
+        return self._GetAncestor(hwnd, flags) or None
+
+    def get_dlg_item(self, hwnd: int, control_id: int) -> Optional[int]:
+        return self._GetDlgItem(hwnd, control_id) or None
+
+    def get_dlg_ctrl_id(self, hwnd: int) -> int:
+        return self._GetDlgCtrlID(hwnd)
+
+    # --- messages and input ---
+
+    def send_message_timeout(self, hwnd: int, msg: int, wparam: int, lparam: int,
+                             flags: int, timeout_ms: int) -> Optional[int]:
+        """Returns the message result, or None if the send failed or timed out"""
+        result = self._buffers.result
+        if self._SendMessageTimeoutW(hwnd, msg, wparam, lparam, flags, timeout_ms, ctypes.byref(result)):
+            return result.value
+        return None
+
+    def post_message(self, hwnd: int, msg: int, wparam: int, lparam: int) -> bool:
+        return bool(self._PostMessageW(hwnd, msg, wparam, lparam))
+
+    def get_cursor_pos(self) -> Tuple[int, int]:
+        point = self._buffers.point
+        self._GetCursorPos(ctypes.byref(point))
+        return point.x, point.y
+
+    def set_cursor_pos(self, x: int, y: int):
+        self._SetCursorPos(x, y)
+
+    def mouse_event(self, flags: int):
+        self._mouse_event(flags, 0, 0, 0, 0)
+
+    # --- processes ---
+
+    def query_process(self, pid: int, known_creation_time: Optional[int] = None) -> Optional[Tuple[int, Optional[str]]]:
+        """
+        Read a process's creation time and executable path with one handle
+        Returns (creation_time, image_path); image_path is None when the creation
+        time equals known_creation_time (same process, path already known).
+        Returns None if the process can't be opened.
+        """
+        handle = self._OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return None
+        try:
+            buffers = self._buffers
+            creation, exit_time, kernel, user = buffers.filetimes
+            creation_time = 0
+            if self._GetProcessTimes(handle, ctypes.byref(creation), ctypes.byref(exit_time),
+                                     ctypes.byref(kernel), ctypes.byref(user)):
+                creation_time = (creation.dwHighDateTime << 32) | creation.dwLowDateTime
+
+            if known_creation_time is not None and creation_time == known_creation_time:
+                return creation_time, None
+
+            size = buffers.dword
+            size.value = PATH_BUFFER_SIZE
+            if self._QueryFullProcessImageNameW(handle, 0, buffers.path, ctypes.byref(size)):
+                return creation_time, buffers.path.value
+            return creation_time, ""
+        finally:
+            self._CloseHandle(handle)
+
+    # --- events ---
+
+    def create_event_source(self):
+        return WinEventHookSource(self)
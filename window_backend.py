@@ -0,0 +1,110 @@
+"""
+Window-system backend interface used by the detector and the blocker
+"""
+
+from typing import List, Optional, Tuple
+
+
+class WindowBackend:
+    """
+    Everything WindowDetector and PopupBlocker need from the window system.
+    win32_api.Win32Api talks to the real user32/kernel32;
+    desktop_simulator.DesktopSimulator keeps a synthetic desktop in memory.
+    HWNDs and PIDs are plain ints; 0 / None means "no window".
+    """
+
+    # --- enumeration ---
+
+    def enum_windows(self) -> List[int]:
+        """All top-level windows, in Z order (topmost first)"""
+        raise NotImplementedError
+
+    def enum_child_windows(self, parent_hwnd: int) -> List[int]:
+        """All descendants of a window"""
+        raise NotImplementedError
+
+    # --- window properties ---
+
+    def get_window_text(self, hwnd: int) -> str:
+        """Window title / control text"""
+        raise NotImplementedError
+
+    def get_window_text_length(self, hwnd: int) -> int:
+        raise NotImplementedError
+
+    def get_class_name(self, hwnd: int) -> str:
+        raise NotImplementedError
+
+    def get_window_rect(self, hwnd: int) -> Optional[Tuple[int, int, int, int]]:
+        """(left, top, right, bottom), or None if it can't be read"""
+        raise NotImplementedError
+
+    def get_window_style(self, hwnd: int) -> int:
+        """GWL_STYLE bits"""
+        raise NotImplementedError
+
+    def get_window_pid(self, hwnd: int) -> int:
+        raise NotImplementedError
+
+    def is_window(self, hwnd: int) -> bool:
+        raise NotImplementedError
+
+    def is_window_visible(self, hwnd: int) -> bool:
+        raise NotImplementedError
+
+    def is_window_enabled(self, hwnd: int) -> bool:
+        raise NotImplementedError
+
+    def is_hung(self, hwnd: int) -> bool:
+        """True if the window's UI thread has stopped processing messages"""
+        raise NotImplementedError
+
+    def get_ancestor(self, hwnd: int, flags: int) -> Optional[int]:
+        raise NotImplementedError
+
+    def get_dlg_item(self, hwnd: int, control_id: int) -> Optional[int]:
+        """Child control with the given ID, or None"""
+        raise NotImplementedError
+
+    def get_dlg_ctrl_id(self, hwnd: int) -> int:
+        raise NotImplementedError
+
+    # --- messages and input ---
+
+    def send_message_timeout(self, hwnd: int, msg: int, wparam: int, lparam: int,
+                             flags: int, timeout_ms: int) -> Optional[int]:
+        """Returns the message result, or None if the send failed or timed out"""
+        raise NotImplementedError
+
+    def post_message(self, hwnd: int, msg: int, wparam: int, lparam: int) -> bool:
+        raise NotImplementedError
+
+    def get_cursor_pos(self) -> Tuple[int, int]:
+        raise NotImplementedError
+
+    def set_cursor_pos(self, x: int, y: int):
+        raise NotImplementedError
+
+    def mouse_event(self, flags: int):
+        """Synthesize a mouse button event at the current cursor position"""
+        raise NotImplementedError
+
+    # --- processes ---
+
+    def query_process(self, pid: int, known_creation_time: Optional[int] = None) -> Optional[Tuple[int, Optional[str]]]:
+        """
+        Read a process's creation time and executable path
+        Returns (creation_time, image_path); image_path is None when the creation
+        time equals known_creation_time (same process, path already known).
+        Returns None if the process can't be opened.
+        """
+        raise NotImplementedError
+
+    # --- events ---
+
+    def create_event_source(self):
+        """
+        A WindowEventSource reporting new/changed windows on this backend,
+        or None if the backend can only be polled
+        """
+        return None
@@ -2,240 +2,434 @@
 Window detection and manipulation utilities
 """
 
-from typing import List, Tuple, Optional
-import time
-import sys
-import os
+from typing import Dict, List, Tuple, Optional
+from time import perf_counter
 
-from config import Config
-from logger import Logger
+from runtime import RuntimeContext, get_runtime
+from detection_cache import (ChildControl, ControlLayout, Fingerprint, WindowDelta, WindowSnapshot,
+                             normalize_control_text)
+from rules import IGNORE, Rule
 
 # Only import Windows-specific modules when available
 try:
     import ctypes
-    import ctypes.wintypes
-    WINDOWS_AVAILABLE = True
-    
-    # Windows API constants
-    GW_HWNDNEXT = 2
-    GWL_STYLE = -16
-    WS_VISIBLE = 0x10000000
-    WS_POPUP = 0x80000000
-    WS_DLGFRAME = 0x00400000
-    
+    from win32_api import Win32Api
+    WINDOWS_AVAILABLE = hasattr(ctypes, 'windll')
 except (ImportError, AttributeError):
     WINDOWS_AVAILABLE = False
-    GW_HWNDNEXT = 2
-    GWL_STYLE = -16
-    WS_VISIBLE = 0x10000000
-    WS_POPUP = 0x80000000
-    WS_DLGFRAME = 0x00400000
+
+from window_backend import WindowBackend
+
+# Windows API constants
+GW_HWNDNEXT = 2
+GWL_STYLE = -16
+WS_VISIBLE = 0x10000000
+WS_POPUP = 0x80000000
+WS_DLGFRAME = 0x00400000
+
+
+def _text_matches(text: str, targets: List[str]) -> bool:
+    """Normalized button text contains, or is contained in, one of the normalized targets"""
+    # Buttons without text (icons) never match
+    return bool(text) and any(target in text or text in target for target in targets)
+
 
 class WindowDetector:
-    def __init__(self):
-        # Check if Windows is available
-        if not WINDOWS_AVAILABLE:
+    def __init__(self, context: Optional[RuntimeContext] = None, backend: Optional[WindowBackend] = None):
+        # Check if Windows is available (any other backend works everywhere)
+        if backend is None and not WINDOWS_AVAILABLE:
             raise RuntimeError("This program only works on Windows")
             
-        self.config = Config()
-        self.logger = Logger()
-        
-        # Define Windows API functions
-        self.user32 = ctypes.windll.user32
-        self.kernel32 = ctypes.windll.kernel32
-        
-        # Function prototypes
-        self.EnumWindows = self.user32.EnumWindows
-        self.EnumChildWindows = self.user32.EnumChildWindows
-        self.GetWindowTextW = self.user32.GetWindowTextW
-        self.GetClassNameW = self.user32.GetClassNameW
-        self.GetWindowRect = self.user32.GetWindowRect
-        self.IsWindowVisible = self.user32.IsWindowVisible
-        self.GetWindowLongW = self.user32.GetWindowLongW
-        self.GetWindowThreadProcessId = self.user32.GetWindowThreadProcessId
+        self.context = context or get_runtime()
+        self.config = self.context.config
+        self.logger = self.context.logger
+        
+        # Window system access - the real Win32 API unless told otherwise
+        self.backend = backend or Win32Api.default()
+        
+        # Caches and compiled matchers are shared through the runtime context
+        self.classification_cache = self.context.classification_cache
+        self.process_cache = self.context.process_cache
+        self.layout_cache = self.context.layout_cache
+        self.rules = self.context.rules
+        self.class_matcher = self.context.class_matcher
+        self.title_matcher = self.context.title_matcher
+        self.metrics = self.context.metrics
+        
+        # Last scan's windows, so each scan only classifies what is new or changed
+        self.snapshot = WindowSnapshot()
+        # hwnd -> window_title of the popups currently on screen
+        self.popups: Dict[int, str] = {}
+    
+    def reload(self):
+        """
+        Pick up the context's current config, matchers and rules
+        Every window is classified again by the next scan
+        """
+        self.config = self.context.config
+        self.class_matcher = self.context.class_matcher
+        self.title_matcher = self.context.title_matcher
+        self.rules = self.context.rules
+        self.snapshot = WindowSnapshot()
     
     def find_popup_windows(self) -> List[Tuple[int, str]]:
         """
         Find all popup/notification windows
         Returns list of (hwnd, window_title) tuples
         """
-        if not WINDOWS_AVAILABLE:
-            return []
-            
-        popup_windows = []
+        self.scan_changes()
+        return list(self.popups.items())
+
+    def scan_changes(self) -> WindowDelta:
+        """
+        Scan the desktop and classify only windows that appeared or changed
+        since the previous scan
+        Returns the delta, with new/updated/closed popups filled in
+        """
+        started = perf_counter()
+        try:
+            hwnds = self.backend.enum_windows()
+        except Exception as e:
+            self.logger.error(f"Error enumerating windows: {e}")
+            return WindowDelta([], [], [])
+        
+        current = {}
+        for hwnd in hwnds:
+            try:
+                fingerprint = self._fingerprint(hwnd)
+                if fingerprint is not None:
+                    current[hwnd] = fingerprint
+            except Exception as e:
+                self.logger.debug("Error reading window %s: %s", hwnd, e)
+        
+        delta = self.snapshot.update(current)
+        enumerated = perf_counter()
+        
+        for hwnd in delta.removed:
+            if self.popups.pop(hwnd, None) is not None:
+                delta.closed_popups.append(hwnd)
         
-        def enum_windows_proc(hwnd, lparam):
+        for hwnd in delta.added + delta.changed:
             try:
-                if self._is_popup_window(hwnd):
-                    window_title = self._get_window_text(hwnd)
-                    if window_title:  # Only include windows with titles
-                        popup_windows.append((hwnd, window_title))
-                        self.logger.debug(f"Found popup candidate: {window_title} (HWND: {hwnd})")
+                window_title = self._classify_fingerprinted(hwnd, current[hwnd])
             except Exception as e:
-                self.logger.debug(f"Error processing window {hwnd}: {e}")
-            return True  # Continue enumeration
+                self.logger.debug("Error processing window %s: %s", hwnd, e)
+                window_title = None
+            self._record_popup(hwnd, window_title, delta)
         
-        # Convert Python function to Windows callback
-        enum_proc = ctypes.WINFUNCTYPE(ctypes.c_bool, ctypes.wintypes.HWND, ctypes.wintypes.LPARAM)(enum_windows_proc)
+        # Windows that have gone away don't need cache entries any more
+        self.classification_cache.retain(current)
+        self.layout_cache.retain(current)
         
+        # Classification time includes any process lookups it needed
+        phase_seconds = self.metrics.phase_seconds
+        phase_seconds.observe(enumerated - started, 'enumerate')
+        phase_seconds.observe(perf_counter() - enumerated, 'classify')
+        self.metrics.windows_scanned.observe(len(hwnds))
+        
+        return delta
+
+    def classify_window(self, hwnd: int) -> Optional[str]:
+        """
+        Classify a single top-level window (e.g. one reported by a window event)
+        Returns the window title if it is a popup, None otherwise
+        """
         try:
-            self.EnumWindows(enum_proc, 0)
+            if not self.backend.is_window(hwnd):
+                self.classification_cache.invalidate(hwnd)
+                self.layout_cache.invalidate(hwnd)
+                self.snapshot.record(hwnd, None)
+                self.popups.pop(hwnd, None)
+                return None
+            fingerprint = self._fingerprint(hwnd)
+            self.snapshot.record(hwnd, fingerprint)
+            window_title = self._classify_fingerprinted(hwnd, fingerprint) if fingerprint else None
+            self._record_popup(hwnd, window_title)
+            return window_title
         except Exception as e:
-            self.logger.error(f"Error enumerating windows: {e}")
-        
-        return popup_windows
-    
+            self.logger.debug("Error classifying window %s: %s", hwnd, e)
+            return None
+
+    def _record_popup(self, hwnd: int, window_title: Optional[str], delta: Optional[WindowDelta] = None):
+        """Keep self.popups in step with a fresh verdict, noting the change in delta"""
+        known = hwnd in self.popups
+        if window_title:
+            self.popups[hwnd] = window_title
+            if delta is not None:
+                (delta.updated_popups if known else delta.new_popups).append((hwnd, window_title))
+                self.logger.debug("Found popup candidate: %s (HWND: %s)", window_title, hwnd)
+        elif known:
+            del self.popups[hwnd]
+            if delta is not None:
+                delta.closed_popups.append(hwnd)
+
+    def get_cache_stats(self) -> dict:
+        """Classification cache counters (hits, misses, evictions, entries)"""
+        return self.classification_cache.get_stats()
+
     def _is_popup_window(self, hwnd: int) -> bool:
         """
         Check if a window is likely a popup/notification window
         """
-        if not WINDOWS_AVAILABLE:
-            return False
-            
+        return self._classify(hwnd) is not None
+
+    def _classify(self, hwnd: int) -> Optional[str]:
+        """
+        Classify a window, using the cached verdict when the window hasn't changed
+        Returns the window title if it is a popup, None otherwise
+        """
         try:
-            # Must be visible
-            if not self.IsWindowVisible(hwnd):
-                return False
-            
-            # Check window style
-            style = self.GetWindowLongW(hwnd, GWL_STYLE)
-            if not (style & WS_VISIBLE):
-                return False
-            
-            # Check if it's a dialog or popup
-            is_dialog = (style & WS_DLGFRAME) != 0
-            is_popup = (style & WS_POPUP) != 0
-            
-            # Get window class
-            class_name = self._get_window_class(hwnd)
-            is_popup_class = any(popup_class.lower() in class_name.lower() 
-                               for popup_class in self.config.popup_classes)
-            
-            # Get window title and check for popup keywords
-            window_title = self._get_window_text(hwnd)
-            has_popup_keywords = any(keyword.lower() in window_title.lower() 
-                                   for keyword in self.config.popup_title_keywords)
-            
-            # Check window size
-            rect = ctypes.wintypes.RECT()
-            if self.GetWindowRect(hwnd, ctypes.byref(rect)):
-                width = rect.right - rect.left
-                height = rect.bottom - rect.top
-                
-                min_w, min_h = self.config.min_popup_size
-                max_w, max_h = self.config.max_popup_size
-                
-                size_ok = (min_w <= width <= max_w) and (min_h <= height <= max_h)
-            else:
-                size_ok = True  # If we can't get size, assume it's ok
-            
-            # Check if window belongs to ignored process
-            if self._is_ignored_process(hwnd):
-                return False
-            
-            # A window is considered a popup if it meets any of these criteria:
-            # 1. It's a dialog with popup keywords in title
-            # 2. It has a popup class name
-            # 3. It's a popup window with reasonable size
-            result = size_ok and (
-                (is_dialog and has_popup_keywords) or
-                is_popup_class or
-                (is_popup and has_popup_keywords)
-            )
-            
-            if result:
-                self.logger.debug(f"Popup detected - Title: '{window_title}', Class: '{class_name}', "
-                                f"Dialog: {is_dialog}, Popup: {is_popup}, Size OK: {size_ok}")
+            fingerprint = self._fingerprint(hwnd)
+            if fingerprint is None:
+                return None
+            return self._classify_fingerprinted(hwnd, fingerprint)
+        except Exception as e:
+            self.logger.debug("Error checking if window %s is popup: %s", hwnd, e)
+            return None
+
+    def _fingerprint(self, hwnd: int) -> Optional[Fingerprint]:
+        """
+        Cheap fingerprint of a visible window: if none of these changed, the verdict hasn't either
+        Returns None for hidden windows
+        """
+        backend = self.backend
+        # Must be visible
+        if not backend.is_window_visible(hwnd):
+            return None
+        
+        # Check window style
+        style = backend.get_window_style(hwnd)
+        if not (style & WS_VISIBLE):
+            return None
+        
+        return style, backend.get_window_text_length(hwnd), backend.get_window_rect(hwnd)
+
+    def _classify_fingerprinted(self, hwnd: int, fingerprint: Fingerprint) -> Optional[str]:
+        """Classify a window whose fingerprint was just read"""
+        cached = self.classification_cache.get(hwnd, fingerprint)
+        if cached is not None:
+            is_popup, window_title = cached
+            return window_title if is_popup else None
+        
+        style, _, bounds = fingerprint
+        is_popup, window_title = self._classify_uncached(hwnd, style, bounds)
+        self.classification_cache.put(hwnd, fingerprint, is_popup, window_title)
+        return window_title if is_popup else None
+
+    def _classify_uncached(self, hwnd: int, style: int,
+                           bounds: Optional[Tuple[int, int, int, int]]) -> Tuple[bool, str]:
+        """
+        Full popup check for a visible window
+        Returns (is_popup, window_title)
+        """
+        # Check if it's a dialog or popup
+        is_dialog = (style & WS_DLGFRAME) != 0
+        is_popup = (style & WS_POPUP) != 0
+        
+        # Get window class
+        class_name = self._get_window_class(hwnd)
+        is_popup_class = self.class_matcher.matches(class_name)
+        
+        # Get window title and check for popup keywords
+        window_title = self._get_window_text(hwnd)
+        has_popup_keywords = self.title_matcher.matches(window_title)
+        
+        # Check window size
+        if bounds is not None:
+            left, top, right, bottom = bounds
+            width = right - left
+            height = bottom - top
             
-            return result
+            min_w, min_h = self.config.min_popup_size
+            max_w, max_h = self.config.max_popup_size
             
-        except Exception as e:
-            self.logger.debug(f"Error checking if window {hwnd} is popup: {e}")
-            return False
+            size_ok = (min_w <= width <= max_w) and (min_h <= height <= max_h)
+        else:
+            size_ok = True  # If we can't get size, assume it's ok
+        
+        # A window is considered a popup if it meets any of these criteria:
+        # 1. It's a dialog with popup keywords in title
+        # 2. It has a popup class name
+        # 3. It's a popup window with reasonable size
+        result = size_ok and (
+            (is_dialog and has_popup_keywords) or
+            is_popup_class or
+            (is_popup and has_popup_keywords)
+        )
+        
+        # A matching rule decides on its own: ignore, or handle the rule's way
+        process_name = self.get_window_process_name(hwnd)
+        rule = self.rules.evaluate(process_name, class_name, window_title)
+        if result or (rule is not None and rule.action != IGNORE):
+            # The cached process name may belong to an earlier process with the same
+            # PID - check the creation time before deciding on a popup (cheap: no path read)
+            current_name = self.get_window_process_name(hwnd, verify=True)
+            if current_name != process_name:
+                rule = self.rules.evaluate(current_name, class_name, window_title)
+        if rule is not None:
+            self.logger.debug("Rule '%s' matched - Title: '%s', Class: '%s', Action: %s",
+                              rule.name, window_title, class_name, rule.action)
+            return rule.action != IGNORE, window_title
+        
+        if result:
+            self.logger.debug("Popup detected - Title: '%s', Class: '%s', Dialog: %s, Popup: %s, Size OK: %s",
+                              window_title, class_name, is_dialog, is_popup, size_ok)
+        
+        return result, window_title
     
     def _get_window_text(self, hwnd: int) -> str:
         """Get window title text"""
-        if not WINDOWS_AVAILABLE:
-            return ""
         try:
-            length = self.user32.GetWindowTextLengthW(hwnd) + 1
-            buffer = ctypes.create_unicode_buffer(length)
-            self.GetWindowTextW(hwnd, buffer, length)
-            return buffer.value
+            return self.backend.get_window_text(hwnd)
         except Exception:
             return ""
     
     def _get_window_class(self, hwnd: int) -> str:
         """Get window class name"""
-        if not WINDOWS_AVAILABLE:
-            return ""
         try:
-            buffer = ctypes.create_unicode_buffer(256)
-            self.GetClassNameW(hwnd, buffer, 256)
-            return buffer.value
+            return self.backend.get_class_name(hwnd)
         except Exception:
             return ""
     
-    def _is_ignored_process(self, hwnd: int) -> bool:
-        """Check if window belongs to an ignored process"""
-        if not WINDOWS_AVAILABLE:
-            return False
+    def rule_for(self, hwnd: int) -> Optional[Rule]:
+        """The rule that applies to a window, or None if the built-in handling does"""
+        if not len(self.rules):
+            return None
+        return self.rules.evaluate(self.get_window_process_name(hwnd),
+                                   self._get_window_class(hwnd), self._get_window_text(hwnd))
+    
+    def get_window_process_name(self, hwnd: int, verify: bool = False) -> str:
+        """
+        Get the lowercased executable name of the process that owns a window
+        verify=True checks a cached name against the process's creation time even
+        before its TTL runs out. Returns an empty string if it can't be determined
+        """
         try:
-            process_id = ctypes.wintypes.DWORD()
-            self.GetWindowThreadProcessId(hwnd, ctypes.byref(process_id))
-            
-            # Get process name
-            hProcess = self.kernel32.OpenProcess(0x1000, False, process_id.value)  # PROCESS_QUERY_LIMITED_INFORMATION
-            if hProcess:
-                try:
-                    buffer = ctypes.create_unicode_buffer(260)
-                    size = ctypes.wintypes.DWORD(260)
-                    if self.kernel32.QueryFullProcessImageNameW(hProcess, 0, buffer, ctypes.byref(size)):
-                        process_path = buffer.value
-                        process_name = process_path.split('\\')[-1].lower()
-                        return process_name in [p.lower() for p in self.config.ignored_processes]
-                finally:
-                    self.kernel32.CloseHandle(hProcess)
+            return self._get_process_name(self.backend.get_window_pid(hwnd), verify)
         except Exception as e:
-            self.logger.debug(f"Error checking process for window {hwnd}: {e}")
+            self.logger.debug("Error checking process for window %s: %s", hwnd, e)
+            return ""
+    
+    def _get_process_name(self, pid: int, verify: bool = False) -> str:
+        """
+        Get the lowercased executable name of a process, e.g. 'explorer.exe'
+        Returns an empty string if the process can't be queried
+        """
+        if not verify:
+            process_name = self.process_cache.get(pid)
+            if process_name is not None:
+                return process_name
         
-        return False
+        started = perf_counter()
+        try:
+            # Creation time tells a reused PID apart from the process we cached,
+            # and skips reading the image path when it's still the same process
+            info = self.backend.query_process(pid, self.process_cache.creation_time(pid))
+            if info is None:
+                return ""
+            creation_time, image_path = info
+            
+            if image_path is None:
+                process_name = self.process_cache.revalidate(pid, creation_time)
+                if process_name is not None:
+                    return process_name
+                info = self.backend.query_process(pid)
+                if info is None:
+                    return ""
+                creation_time, image_path = info
+            
+            if not image_path:
+                return ""
+            process_name = image_path.split('\\')[-1].lower()
+            self.process_cache.put(pid, creation_time, process_name)
+            return process_name
+        finally:
+            self.metrics.phase_seconds.observe(perf_counter() - started, 'process_lookup')
     
     def find_button_by_text(self, parent_hwnd: int, target_texts: List[str]) -> Optional[int]:
         """
         Find a button with specific text within a window
         Returns button HWND if found, None otherwise
         """
-        if not WINDOWS_AVAILABLE:
+        layout = self.get_control_layout(parent_hwnd)
+        if layout is None:
             return None
-            
-        found_button = None
         
-        def enum_child_proc(hwnd, lparam):
-            nonlocal found_button
+        button_hwnd = self._match_button(layout, target_texts)
+        if button_hwnd is None:
+            stale = layout.from_cache
+        else:
+            stale = not self._button_still_matches(button_hwnd, target_texts)
+        if stale:
+            # The cached layout is out of date (the button was destroyed, says
+            # something else, or was added after the layout was read) - read it again
+            self.layout_cache.invalidate(parent_hwnd)
+            layout = self.get_control_layout(parent_hwnd)
+            button_hwnd = self._match_button(layout, target_texts) if layout is not None else None
+        return button_hwnd
+    
+    def get_control_layout(self, parent_hwnd: int) -> Optional[ControlLayout]:
+        """
+        Child controls of a window, enumerated once and then served from the
+        layout cache while the window is unchanged
+        Text is only read for buttons. Returns None if the children can't be enumerated
+        """
+        fingerprint = None
+        try:
+            fingerprint = self._fingerprint(parent_hwnd)
+        except Exception:
+            pass
+        if fingerprint is not None:
+            layout = self.layout_cache.get(parent_hwnd, fingerprint)
+            if layout is not None:
+                layout.from_cache = True
+                return layout
+        
+        try:
+            children = self.backend.enum_child_windows(parent_hwnd)
+        except Exception as e:
+            self.logger.error(f"Error enumerating child windows: {e}")
+            return None
+        
+        controls: List[ChildControl] = []
+        for hwnd in children:
             try:
-                # Check if it's a button
                 class_name = self._get_window_class(hwnd)
-                if 'button' in class_name.lower():
-                    button_text = self._get_window_text(hwnd)
-                    
-                    # Check if button text matches any target text
-                    for target in target_texts:
-                        if target.lower() in button_text.lower() or button_text.lower() in target.lower():
-                            self.logger.debug(f"Found matching button: '{button_text}' (HWND: {hwnd})")
-                            found_button = hwnd
-                            return False  # Stop enumeration
-                            
+                text = self._get_window_text(hwnd) if 'button' in class_name.lower() else ""
+                controls.append((hwnd, class_name, normalize_control_text(text),
+                                 self.backend.get_dlg_ctrl_id(hwnd)))
             except Exception as e:
-                self.logger.debug(f"Error processing child window {hwnd}: {e}")
-            return True  # Continue enumeration
-        
-        # Convert Python function to Windows callback
-        enum_proc = ctypes.WINFUNCTYPE(ctypes.c_bool, ctypes.wintypes.HWND, ctypes.wintypes.LPARAM)(enum_child_proc)
+                self.logger.debug("Error processing child window %s: %s", hwnd, e)
         
+        layout = ControlLayout(controls)
+        # Hidden windows aren't cached - there is no fingerprint to tell when they change
+        if fingerprint is not None:
+            self.layout_cache.put(parent_hwnd, fingerprint, layout)
+        return layout
+    
+    def _button_still_matches(self, button_hwnd: int, target_texts: List[str]) -> bool:
+        """Re-read one cached button: it must still exist and still carry a target text"""
         try:
-            self.EnumChildWindows(parent_hwnd, enum_proc, 0)
-        except Exception as e:
-            self.logger.error(f"Error enumerating child windows: {e}")
+            if not self.backend.is_window(button_hwnd):
+                return False
+            text = normalize_control_text(self._get_window_text(button_hwnd))
+        except Exception:
+            return False
+        return _text_matches(text, [normalize_control_text(target) for target in target_texts])
+    
+    def _match_button(self, layout: ControlLayout, target_texts: List[str]) -> Optional[int]:
+        """First button whose text contains, or is contained in, one of the target texts"""
+        key = tuple(target_texts)
+        button_hwnd = layout.matches.get(key)
+        if button_hwnd is not None:
+            return button_hwnd
         
-        return found_button
\ No newline at end of file
+        targets = [normalize_control_text(target) for target in target_texts]
+        for hwnd, class_name, text, _ in layout.controls:
+            if 'button' not in class_name.lower():
+                continue
+            if _text_matches(text, targets):
+                self.logger.debug("Found matching button: '%s' (HWND: %s)", text, hwnd)
+                layout.matches[key] = hwnd
+                return hwnd
+        return None
@@ -0,0 +1,246 @@
+"""
+Window event sources for event-driven popup detection
+"""
+
+from typing import List, Optional, Sequence, Tuple
+import threading
+import time
+
+from window_backend import WindowBackend
+
+# Only import Windows-specific modules when available
+try:
+    import ctypes
+    import ctypes.wintypes
+    WINDOWS_AVAILABLE = hasattr(ctypes, 'windll')
+except (ImportError, AttributeError):
+    WINDOWS_AVAILABLE = False
+
+# WinEvent constants
+EVENT_OBJECT_CREATE = 0x8000
+EVENT_OBJECT_DESTROY = 0x8001
+EVENT_OBJECT_SHOW = 0x8002
+EVENT_OBJECT_HIDE = 0x8003
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+CHILDID_SELF = 0
+GA_ROOT = 2
+WM_QUIT = 0x0012
+
+
+class CandidateQueue:
+    """
+    Thread-safe queue of window handles waiting to be classified.
+    A handle that is queued several times before it is drained is only returned once.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = {}  # dict keeps insertion order and removes duplicates
+        self._woken = False
+
+    def put(self, hwnd: int):
+        """Queue a window handle for classification"""
+        with self._cond:
+            self._pending[hwnd] = None
+            self._cond.notify()
+
+    def drain(self, timeout: float) -> List[int]:
+        """
+        Wait up to timeout seconds for candidates
+        Returns all queued handles (possibly empty)
+        """
+        with self._cond:
+            if not self._pending and not self._woken:
+                self._cond.wait(timeout)
+            self._woken = False
+            hwnds = list(self._pending)
+            self._pending.clear()
+            return hwnds
+
+    def wake(self):
+        """Release a thread blocked in drain() without queuing anything"""
+        with self._cond:
+            self._woken = True
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+
+class WindowEventSource:
+    """
+    Interface for anything that reports windows which may have become popups.
+    Implementations push top-level HWNDs into a CandidateQueue.
+    """
+
+    def start(self, queue: CandidateQueue) -> bool:
+        """Start delivering events. Returns False if the source is unavailable"""
+        raise NotImplementedError
+
+    def stop(self):
+        """Stop delivering events"""
+        raise NotImplementedError
+
+
+def _load_hook_functions():
+    """
+    Private user32/kernel32 handles with the hook functions declared, so the
+    prototypes don't change ctypes.windll for other code (as in win32_api)
+    Returns (user32, kernel32, WINEVENTPROC)
+    """
+    wt = ctypes.wintypes
+    WINEVENTPROC = ctypes.WINFUNCTYPE(None, wt.HANDLE, wt.DWORD, wt.HWND, wt.LONG, wt.LONG,
+                                      wt.DWORD, wt.DWORD)
+    user32 = ctypes.WinDLL('user32', use_last_error=True)
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    prototypes = (
+        (user32.SetWinEventHook, wt.HANDLE, [wt.DWORD, wt.DWORD, wt.HMODULE, WINEVENTPROC,
+                                             wt.DWORD, wt.DWORD, wt.DWORD]),
+        (user32.UnhookWinEvent, wt.BOOL, [wt.HANDLE]),
+        (user32.GetMessageW, wt.BOOL, [ctypes.POINTER(wt.MSG), wt.HWND, wt.UINT, wt.UINT]),
+        (user32.TranslateMessage, wt.BOOL, [ctypes.POINTER(wt.MSG)]),
+        (user32.DispatchMessageW, wt.LPARAM, [ctypes.POINTER(wt.MSG)]),
+        (user32.PostThreadMessageW, wt.BOOL, [wt.DWORD, wt.UINT, wt.WPARAM, wt.LPARAM]),
+        (kernel32.GetCurrentThreadId, wt.DWORD, []),
+    )
+    for function, restype, argtypes in prototypes:
+        function.restype = restype
+        function.argtypes = argtypes
+    return user32, kernel32, WINEVENTPROC
+
+
+class WinEventHookSource(WindowEventSource):
+    """
+    Window create/destroy/show/hide/name-change events from SetWinEventHook.
+    The backend maps a control's event to its top-level window.
+    """
+
+    def __init__(self, backend: WindowBackend):
+        self.backend = backend
+        # Loaded on start (Windows only)
+        self.user32 = None
+        self.kernel32 = None
+        self._WINEVENTPROC = None
+        self.queue: Optional[CandidateQueue] = None
+        self.thread = None
+        self._thread_id = 0
+        self._hooks = []
+        self._callback = None
+        self._ready = threading.Event()
+        self._started = False
+
+    def start(self, queue: CandidateQueue) -> bool:
+        if not WINDOWS_AVAILABLE:
+            return False
+
+        if self.user32 is None:
+            self.user32, self.kernel32, self._WINEVENTPROC = _load_hook_functions()
+        self.queue = queue
+        self._ready.clear()
+        self.thread = threading.Thread(target=self._hook_loop, daemon=True)
+        self.thread.start()
+
+        # รอให้ hook ติดตั้งเสร็จก่อน
+        self._ready.wait(timeout=2)
+        return self._started
+
+    def stop(self):
+        if self.thread and self._thread_id:
+            self.user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+            self.thread.join(timeout=1)
+        self.thread = None
+        self._thread_id = 0
+
+    def _hook_loop(self):
+        """Install the hooks and pump messages (hooks fire on this thread)"""
+        user32 = self.user32
+        try:
+            self._thread_id = self.kernel32.GetCurrentThreadId()
+
+            # Keep a reference so the callback isn't garbage collected
+            self._callback = self._WINEVENTPROC(self._on_event)
+
+            flags = WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS
+            # Create/show find new popups; destroy/hide confirm a clicked one is gone
+            for event_min, event_max in ((EVENT_OBJECT_CREATE, EVENT_OBJECT_HIDE),
+                                         (EVENT_OBJECT_NAMECHANGE, EVENT_OBJECT_NAMECHANGE)):
+                hook = user32.SetWinEventHook(event_min, event_max, None, self._callback, 0, 0, flags)
+                if hook:
+                    self._hooks.append(hook)
+
+            self._started = bool(self._hooks)
+        finally:
+            self._ready.set()
+
+        if not self._started:
+            return
+
+        try:
+            msg = ctypes.wintypes.MSG()
+            while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            for hook in self._hooks:
+                user32.UnhookWinEvent(hook)
+            self._hooks = []
+            self._started = False
+
+    def _on_event(self, hook, event, hwnd, id_object, id_child, event_thread, event_time):
+        """WinEvent callback - keep this cheap, classification happens elsewhere"""
+        if not hwnd:
+            return
+        if id_object != OBJID_WINDOW or id_child != CHILDID_SELF:
+            return
+        try:
+            # Name changes on a dialog's controls should re-check the dialog itself.
+            # A destroyed window has no ancestor any more and is queued as it is -
+            # classify_window drops it and the handler waiting on it is woken
+            root = self.backend.get_ancestor(hwnd, GA_ROOT)
+            self.queue.put(root or hwnd)
+        except Exception:
+            pass
+
+
+class ScriptedEventSource(WindowEventSource):
+    """
+    Replays a fixed script of (delay_seconds, hwnd) events.
+    Useful for driving event-driven detection without Windows.
+    """
+
+    def __init__(self, script: Sequence[Tuple[float, int]] = ()):
+        self.script = list(script)
+        self.queue: Optional[CandidateQueue] = None
+        self.thread = None
+        self.running = False
+
+    def start(self, queue: CandidateQueue) -> bool:
+        self.queue = queue
+        self.running = True
+        if self.script:
+            self.thread = threading.Thread(target=self._replay, daemon=True)
+            self.thread.start()
+        return True
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1)
+        self.thread = None
+
+    def emit(self, hwnd: int):
+        """Deliver an event immediately"""
+        if self.running and self.queue is not None:
+            self.queue.put(hwnd)
+
+    def _replay(self):
+        for delay, hwnd in self.script:
+            if not self.running:
+                return
+            if delay > 0:
+                time.sleep(delay)
+            self.emit(hwnd)